@@ -1,11 +1,13 @@
-import os
 import json
 import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
 import streamlit as st
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+
+from caching import LRUCache
+from credential_store import LOGIN_TTL_SECONDS, get_credential_store
+from static_assets import emit_page_script
 
 SCOPES = [
     'openid',
@@ -13,49 +15,150 @@ SCOPES = [
     'https://www.googleapis.com/auth/userinfo.profile'
 ]
 
+# Discovery client is credential-free and shared; each request brings its own auth
+_oauth2_service = None
+_oauth2_service_lock = threading.Lock()
+
+# Userinfo lookups keyed by a hash of the access token, valid until the token expires
+_user_info_cache = LRUCache(max_entries=1024)
+
+def _get_oauth2_service():
+    """Build the OAuth2 API client once from the bundled static discovery document"""
+    global _oauth2_service
+    if _oauth2_service is None:
+        with _oauth2_service_lock:
+            if _oauth2_service is None:
+                # Deferred: the API client stack is only needed once someone signs in
+                import httplib2
+                from googleapiclient.discovery import build
+                
+                _oauth2_service = build(
+                    'oauth2', 'v2',
+                    http=httplib2.Http(),
+                    static_discovery=True,
+                    cache_discovery=False
+                )
+    return _oauth2_service
+
+def fetch_user_info(creds):
+    """Return the Google profile for creds, hitting the network at most once per token"""
+    cache_key = hashlib.sha256(creds.token.encode()).hexdigest()
+    cached = _user_info_cache.get(cache_key)
+    if cached is not None:
+        user_info, expires_at = cached
+        if datetime.utcnow() < expires_at:
+            return user_info
+        _user_info_cache.pop(cache_key)
+    
+    import httplib2
+    import google_auth_httplib2
+    
+    # A fresh authorized transport per call: httplib2 connections are not thread-safe
+    authorized_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+    user_info = _get_oauth2_service().userinfo().get().execute(http=authorized_http)
+    
+    # Credentials.expiry is naive UTC; tokens without one are rechecked hourly
+    expires_at = creds.expiry or datetime.utcnow() + timedelta(hours=1)
+    _user_info_cache.put(cache_key, (user_info, expires_at))
+    return user_info
+
+def _session_user(user_info, creds):
+    return {
+        "name": user_info.get("name"),
+        "email": user_info.get("email"),
+        "picture": user_info.get("picture"),
+        "token": creds.token
+    }
+
+# The login handle lives in a first-party cookie, never in the URL where it
+# would end up in browser history and in every copied link
+LOGIN_COOKIE = "chatjee_login"
+
+def _login_cookie_script(handle, max_age):
+    value = json.dumps(f"{LOGIN_COOKIE}={handle}; Max-Age={max_age}; Path=/; SameSite=Strict")
+    return (
+        "<script>\n"
+        f"const cookie = {value};\n"
+        "window.parent.document.cookie = cookie + "
+        "(window.parent.location.protocol === 'https:' ? '; Secure' : '');\n"
+        "</script>\n"
+    )
+
+def _set_login_cookie(handle):
+    # Re-emitted on every run of this session: the same markup keeps one iframe,
+    # and a rerun right after login cannot drop the script before it has run
+    st.session_state["login_cookie_script"] = _login_cookie_script(handle, LOGIN_TTL_SECONDS)
+
+def _clear_login_cookie():
+    st.session_state["login_cookie_script"] = _login_cookie_script("", 0)
+
+def _emit_login_cookie():
+    script = st.session_state.get("login_cookie_script")
+    if script:
+        emit_page_script(script)
+
+def _browser_login_handle():
+    """This browser's login handle from its cookie, read from the session's initial request"""
+    context = getattr(st, "context", None)
+    cookies = getattr(context, "cookies", None)
+    if not cookies:
+        return None
+    return cookies.get(LOGIN_COOKIE) or None
+
+def _restore_login():
+    """Resume a previous login from the browser's login handle, if any"""
+    store = get_credential_store(SCOPES)
+    handle = _browser_login_handle()
+    if not handle:
+        return None
+    
+    user_key = store.resolve_login(handle)
+    creds = store.get_valid(user_key) if user_key else None
+    if not creds:
+        store.revoke_login(handle)
+        _clear_login_cookie()
+        return None
+    
+    try:
+        user_info = fetch_user_info(creds)
+    except Exception:
+        st.warning("⚠️ Token expired or invalid, please login again.")
+        store.revoke_login(handle)
+        store.delete(user_key)
+        _clear_login_cookie()
+        return None
+    
+    # Restart the cookie's lifetime once per browser session
+    if "login_cookie_script" not in st.session_state:
+        _set_login_cookie(handle)
+    st.session_state["login_handle"] = handle
+    st.session_state["credentials"] = _session_user(user_info, creds)
+    return st.session_state["credentials"]
+
+def _forget_login(handle=None):
+    """Revoke this browser's login handle and delete its cookie"""
+    handle = handle or _browser_login_handle()
+    if handle:
+        get_credential_store(SCOPES).revoke_login(handle)
+    _clear_login_cookie()
+    _emit_login_cookie()
+
 def authenticate_user_manual():
+    _emit_login_cookie()
+    
     # ✅ Already logged in with token
     if "credentials" in st.session_state:
         return st.session_state["credentials"]
     
-    # ✅ Try loading saved token from file
-    if os.path.exists("token.json"):
-        try:
-            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-            
-            # Check if token needs refresh
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                    # Save refreshed token
-                    with open("token.json", "w") as token_file:
-                        token_file.write(creds.to_json())
-                except Exception as e:
-                    st.warning("⚠️ Token refresh failed, please login again.")
-                    os.remove("token.json")
-                    return None
-            
-            if creds and creds.valid:
-                try:
-                    service = build('oauth2', 'v2', credentials=creds)
-                    user_info = service.userinfo().get().execute()
-                    st.session_state["credentials"] = {
-                        "name": user_info.get("name"),
-                        "email": user_info.get("email"),
-                        "picture": user_info.get("picture"),
-                        "token": creds.token
-                    }
-                    return st.session_state["credentials"]
-                except Exception as e:
-                    st.warning("⚠️ Token expired or invalid, please login again.")
-                    os.remove("token.json")
-            else:
-                # Token invalid, remove file
-                os.remove("token.json")
-        except Exception as e:
-            st.warning(f"⚠️ Error loading token: {e}")
-            if os.path.exists("token.json"):
-                os.remove("token.json")
+    # ✅ Try resuming this browser's saved login
+    try:
+        user = _restore_login()
+        if user:
+            _emit_login_cookie()
+            return user
+    except Exception as e:
+        st.warning(f"⚠️ Error loading token: {e}")
+    _emit_login_cookie()
     
     # ✅ OAuth flow - only if not already authenticated
     try:
@@ -67,16 +170,17 @@ def authenticate_user_manual():
         st.error("❌ Invalid JSON in Google OAuth credentials.")
         return None
     
-    # Create temp credentials file
-    with open("temp_credentials.json", "w") as f:
-        json.dump(credentials_dict, f)
-    
     try:
-        flow = InstalledAppFlow.from_client_secrets_file(
-            "temp_credentials.json",
-            SCOPES,
-            redirect_uri="urn:ietf:wg:oauth:2.0:oob"
-        )
+        # Keep one flow per session so the code is exchanged by the flow that issued it
+        if "oauth_flow" not in st.session_state:
+            from google_auth_oauthlib.flow import InstalledAppFlow
+            
+            st.session_state["oauth_flow"] = InstalledAppFlow.from_client_config(
+                credentials_dict,
+                SCOPES,
+                redirect_uri="urn:ietf:wg:oauth:2.0:oob"
+            )
+        flow = st.session_state["oauth_flow"]
         
         # 🔐 Login UI container to prevent duplication
         auth_container = st.container()
@@ -94,25 +198,20 @@ def authenticate_user_manual():
                     flow.fetch_token(code=code)
                     creds = flow.credentials
                     
-                    # Save token to file for future use
-                    with open("token.json", "w") as token_file:
-                        token_file.write(creds.to_json())
-                    
                     # Get user info
-                    service = build('oauth2', 'v2', credentials=creds)
-                    user_info = service.userinfo().get().execute()
+                    user_info = fetch_user_info(creds)
                     
-                    # Save in session
-                    st.session_state["credentials"] = {
-                        "name": user_info.get("name"),
-                        "email": user_info.get("email"),
-                        "picture": user_info.get("picture"),
-                        "token": creds.token
-                    }
+                    # Save token for this user and remember the login in this browser
+                    store = get_credential_store(SCOPES)
+                    user_key = user_info.get("email") or user_info.get("id")
+                    store.save(user_key, creds)
+                    handle = store.create_login(user_key)
+                    _set_login_cookie(handle)
+                    st.session_state["login_handle"] = handle
                     
-                    # Clean up temp file
-                    if os.path.exists("temp_credentials.json"):
-                        os.remove("temp_credentials.json")
+                    # Save in session
+                    st.session_state["credentials"] = _session_user(user_info, creds)
+                    del st.session_state["oauth_flow"]
                     
                     # Clear the auth container and rerun
                     auth_container.empty()
@@ -122,15 +221,11 @@ def authenticate_user_manual():
                     
                 except Exception as e:
                     st.error(f"❌ Authentication failed: {e}")
-                    # Clean up on error
-                    if os.path.exists("temp_credentials.json"):
-                        os.remove("temp_credentials.json")
+                    st.session_state.pop("oauth_flow", None)
                     return None
     
     except Exception as e:
         st.error(f"❌ OAuth setup failed: {e}")
-        if os.path.exists("temp_credentials.json"):
-            os.remove("temp_credentials.json")
         return None
     
     return None
@@ -138,18 +233,15 @@ def authenticate_user_manual():
 def logout_user():
     """Fixed logout function with proper session state clearing"""
     try:
+        handle = st.session_state.get("login_handle")
+        
         # Remove from session state - clear ALL keys to ensure clean logout
         keys_to_remove = list(st.session_state.keys())
         for key in keys_to_remove:
             del st.session_state[key]
         
-        # Remove token file
-        if os.path.exists("token.json"):
-            os.remove("token.json")
-            
-        # Remove temp credentials if exists
-        if os.path.exists("temp_credentials.json"):
-            os.remove("temp_credentials.json")
+        # Revoke this browser's saved login
+        _forget_login(handle)
         
         st.success("✅ Logged out successfully! Redirecting...")
         time.sleep(1)
@@ -170,17 +262,16 @@ def logout_user():
 def force_logout():
     """Alternative logout function with more aggressive clearing"""
     try:
+        handle = st.session_state.get("login_handle")
+        
         # Clear session state
         st.session_state.clear()
         
-        # Remove files
-        files_to_remove = ["token.json", "temp_credentials.json"]
-        for file in files_to_remove:
-            try:
-                if os.path.exists(file):
-                    os.remove(file)
-            except Exception as e:
-                st.warning(f"Could not remove {file}: {e}")
+        # Revoke saved login
+        try:
+            _forget_login(handle)
+        except Exception as e:
+            st.warning(f"Could not revoke saved login: {e}")
         
         # Show success and refresh
         st.success("✅ Logout successful!")
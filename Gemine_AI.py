@@ -1,5 +1,18 @@
 import google.generativeai as genai
 import os
+import time
+import logging
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Connection settings, tunable per deployment
+DEFAULT_MODEL_NAME = os.getenv("CHATJEE_MODEL", "models/gemini-1.5-pro")
+# "grpc" keeps one multiplexed channel open; "rest" reuses a pooled HTTP session
+TRANSPORT = os.getenv("CHATJEE_GEMINI_TRANSPORT", "grpc")
+REQUEST_TIMEOUT = float(os.getenv("CHATJEE_GEMINI_TIMEOUT", "60"))
+API_ENDPOINT = os.getenv("CHATJEE_GEMINI_ENDPOINT")
 
 def get_api_key():
     """
@@ -17,16 +30,138 @@ def get_api_key():
         print(f"Error loading Streamlit secret: {e}")
         return None
 
-# Configure Gemini API
-api_key = get_api_key()
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("models/gemini-1.5-pro")
-else:
-    model = None
-    print("❌ API key not found. Set GEMINI_API_KEY in Streamlit secrets or .env file.")
+class _RecordedStream:
+    """A streaming response that records its call once the stream is exhausted, fails or is abandoned"""
+
+    def __init__(self, response, record):
+        self._response = response
+        self._record = record
+        self._recorded = False
+
+    def __iter__(self):
+        failed = False
+        try:
+            for chunk in self._response:
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not self._recorded:
+                self._recorded = True
+                self._record(failed)
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+class ManagedModel:
+    """A GenerativeModel bound to the shared client, with default timeouts and call stats"""
+
+    def __init__(self, model_name, request_timeout):
+        self.model_name = model_name
+        self.request_timeout = request_timeout
+        self._model = genai.GenerativeModel(model_name)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def _with_timeout(self, kwargs):
+        request_options = dict(kwargs.pop("request_options", None) or {})
+        # Callers may shorten the timeout (to what is left of a retry deadline), never lengthen it
+        request_options["timeout"] = min(request_options.get("timeout", self.request_timeout), self.request_timeout)
+        kwargs["request_options"] = request_options
+        return kwargs
+
+    def _record(self, started, failed):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(failed)
+            self.total_seconds += time.perf_counter() - started
+
+    def generate_content(self, contents, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._model.generate_content(contents, **self._with_timeout(kwargs))
+        except Exception:
+            self._record(started, failed=True)
+            raise
+        if kwargs.get("stream"):
+            # Chunks arrive while the caller iterates; time the whole stream
+            return _RecordedStream(response, lambda failed: self._record(started, failed=failed))
+        self._record(started, failed=False)
+        return response
+
+    def count_tokens(self, contents, **kwargs):
+        return self._model.count_tokens(contents, **self._with_timeout(kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_seconds": self.total_seconds / self.calls if self.calls else 0.0,
+            }
+
+class GeminiClient:
+    """Owns the process-wide Gemini configuration and one model per model name.
+
+    genai.configure() resets the SDK's cached service clients, so it is called
+    exactly once here; every model then shares the same underlying channel.
+    """
+
+    def __init__(self, api_key, transport=TRANSPORT, request_timeout=REQUEST_TIMEOUT,
+                 api_endpoint=API_ENDPOINT):
+        client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+        genai.configure(api_key=api_key, transport=transport, client_options=client_options)
+        self.transport = transport
+        self.request_timeout = request_timeout
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name=None):
+        model_name = model_name or DEFAULT_MODEL_NAME
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = ManagedModel(model_name, self.request_timeout)
+            return self._models[model_name]
+
+    def describe(self):
+        with self._lock:
+            models = dict(self._models)
+        return {
+            "transport": self.transport,
+            "timeout": self.request_timeout,
+            "models": {name: model.stats() for name, model in models.items()},
+        }
+
+def _build_client():
+    api_key = get_api_key()
+    if not api_key:
+        print("❌ API key not found. Set GEMINI_API_KEY in Streamlit secrets or .env file.")
+        return None
+    return GeminiClient(api_key)
+
+# One client per process: a Streamlit resource when running under Streamlit
+try:
+    import streamlit as _st
+    get_client = _st.cache_resource(show_spinner=False)(_build_client)
+except ImportError:
+    get_client = lru_cache(maxsize=None)(_build_client)
+
+def get_model(model_name=None):
+    """Shared model for model_name (default CHATJEE_MODEL), or None without an API key"""
+    client = get_client()
+    return client.get_model(model_name) if client else None
+
+def __getattr__(name):
+    # Backwards compatible `from Gemine_AI import model`, resolved lazily
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def chat_with_gemini():
+    model = get_model()
     if not model:
         print("❌ Gemini model is not configured.")
         return
@@ -53,7 +188,7 @@ def chat_with_gemini():
             print("Check your internet connection and Gemini API access.")
 
 if __name__ == "__main__":
-    if model:
+    if get_model():
         chat_with_gemini()
     else:
         print("""
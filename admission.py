@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Align these with the Gemini quota of the deployment's API key
+DEFAULT_MAX_CONCURRENT = int(os.getenv("CHATJEE_GEMINI_MAX_CONCURRENT", "8"))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("CHATJEE_GEMINI_RPM", "60"))
+DEFAULT_BURST = int(os.getenv("CHATJEE_GEMINI_BURST", "10"))
+DEFAULT_QUEUE_TIMEOUT = float(os.getenv("CHATJEE_QUEUE_TIMEOUT", "120"))
+
+# Called with the 1-based queue position whenever it changes
+QueueCallback = Callable[[int], None]
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a request waited longer than the queue timeout"""
+
+
+class TokenBucket:
+    """Classic token bucket; callers must hold the controller's lock"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _Ticket:
+    __slots__ = ("user_id", "granted")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.granted = False
+
+
+class AdmissionController:
+    """Shared gate in front of the model API.
+
+    Bounds in-flight requests with a concurrency limit, paces them with a
+    token bucket sized to the API quota, and serves waiting users round-robin
+    so one student firing many questions cannot starve the rest of the class.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 burst: int = DEFAULT_BURST,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._cond = threading.Condition()
+        # user -> waiting tickets; dict order is the round-robin rotation
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self.active = 0
+
+    @contextmanager
+    def admit(self, user_id: str, on_wait: Optional[QueueCallback] = None,
+              timeout: Optional[float] = None):
+        self.acquire(user_id, on_wait, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, user_id: str, on_wait: Optional[QueueCallback] = None,
+                timeout: Optional[float] = None) -> None:
+        ticket = _Ticket(user_id)
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        last_position = None
+
+        with self._cond:
+            self._queues.setdefault(user_id, deque()).append(ticket)
+            try:
+                while True:
+                    self._dispatch()
+                    if ticket.granted:
+                        return
+
+                    position = self._position(ticket)
+                    if on_wait and position != last_position:
+                        last_position = position
+                        # Never run UI callbacks while holding the lock
+                        self._cond.release()
+                        try:
+                            on_wait(position)
+                        finally:
+                            self._cond.acquire()
+                        continue
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise AdmissionTimeout(f"Waited more than {timeout:g}s for a model slot")
+                    wait_for = remaining
+                    if self.active < self.max_concurrent:
+                        # Only the rate limit is holding us back: wake when a token is due
+                        wait_for = min(remaining, max(self._bucket.seconds_until_token(), 0.01))
+                    self._cond.wait(wait_for)
+            except BaseException:
+                # Timeouts, and Streamlit's RerunException / StopException raised
+                # from on_wait, must not leave the ticket queued or the slot taken
+                if ticket.granted:
+                    self._release_slot()
+                else:
+                    self._withdraw(ticket)
+                raise
+
+    def release(self) -> None:
+        with self._cond:
+            self._release_slot()
+
+    def pause(self, user_id: str, seconds: float, timeout: float) -> bool:
+        """Give an admitted call's slot to others for seconds (a retry backoff),
+        then queue for it again, taking a rate token as any admission does.
+
+        Returns False if the slot did not come back within timeout; the call
+        is then counted as admitted anyway, so its own release() stays
+        balanced, and it should give up.
+        """
+        self.release()
+        time.sleep(seconds)
+        try:
+            self.acquire(user_id, timeout=max(timeout, 0.0))
+            return True
+        except AdmissionTimeout:
+            with self._cond:
+                self.active += 1
+            return False
+
+    def take_token(self, timeout: float = 0.0) -> bool:
+        """Take a rate-limit token for extra traffic of an admitted call (a retry
+        or hedge), waiting up to timeout seconds; False if none came in time"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._bucket.try_take():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, max(self._bucket.seconds_until_token(), 0.01)))
+            return True
+
+    def _release_slot(self) -> None:
+        self.active -= 1
+        self._dispatch()
+        self._cond.notify_all()
+
+    @property
+    def waiting(self) -> int:
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _dispatch(self) -> None:
+        granted = False
+        while self._queues and self.active < self.max_concurrent and self._bucket.try_take():
+            user_id, queue = next(iter(self._queues.items()))
+            queue.popleft().granted = True
+            self.active += 1
+            granted = True
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+        if granted:
+            self._cond.notify_all()
+
+    def _position(self, ticket: _Ticket) -> int:
+        """1-based position in round-robin service order"""
+        users = list(self._queues)
+        own_rank = users.index(ticket.user_id)
+        own_index = self._queues[ticket.user_id].index(ticket)
+        ahead = 0
+        for rank, user_id in enumerate(users):
+            if user_id == ticket.user_id:
+                ahead += own_index
+            else:
+                # Users earlier in the rotation get one extra turn ahead of us
+                ahead += min(len(self._queues[user_id]), own_index + (1 if rank < own_rank else 0))
+        return ahead + 1
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        if not queue:
+            del self._queues[ticket.user_id]
+        self._cond.notify_all()
+
+
+_admission_controller = None
+_admission_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller shared by every Streamlit session"""
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_controller_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController()
+    return _admission_controller
@@ -1,30 +1,86 @@
+from startup_profiler import log_report_once, phase
 import streamlit as st
-from PyPDF2 import PdfReader
-import hashlib
+import importlib.util
+import hmac
 import time
 import os
-import re
-from typing import Dict, List, Optional
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
 
 from AUTHENTICATOR import authenticate_user_manual
+from admission import AdmissionTimeout, get_admission_controller
+from batch_solver import BatchSolver, DetectedQuestion, detect_questions, export_markdown
+from chat_render import HISTORY_PAGE_SIZE, message_html, render_chat_history, typing_indicator_html
+from corpus import CORPUS_DEFAULT_ON, CORPUS_PATH, get_corpus, preload_corpus
+from static_assets import inject_assets
+from ingestion import DONE, IngestionJob, get_ingestion_queue, summarize_jobs
+from material_library import MaterialSet, get_material_library
+import metrics
+from model_router import get_model_router
+from pdf_cache import get_pdf_cache, hash_pdf_bytes
+from prompt_builder import PromptBuilder, estimate_tokens, model_token_counter
+from resilience import CircuitOpenError, get_resilient_caller
+from response_formatter import ResponseFormatter, format_response
+from response_cache import NO_MATERIALS, get_response_cache
+from session_store import SESSION_WINDOW_MESSAGES, get_session_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import your Gemini AI module with better error handling
-try:
-    from Gemine_AI import model
-    GEMINI_AVAILABLE = True
-    logger.info("Gemini AI module loaded successfully")
-except ImportError as e:
-    logger.error(f"Failed to import Gemini AI: {e}")
-    GEMINI_AVAILABLE = False
-except Exception as e:
-    logger.error(f"Unexpected error importing Gemini AI: {e}")
-    GEMINI_AVAILABLE = False
+# How much uploaded material is pasted into each prompt
+RETRIEVAL_TOP_K = int(os.getenv("CHATJEE_RETRIEVAL_TOP_K", "6"))
+RETRIEVAL_MAX_CHARS = int(os.getenv("CHATJEE_RETRIEVAL_MAX_CHARS", "6000"))
+# And how much of the preloaded reference corpus, placed after the uploads
+CORPUS_TOP_K = int(os.getenv("CHATJEE_CORPUS_TOP_K", "4"))
+CORPUS_MAX_CHARS = int(os.getenv("CHATJEE_CORPUS_MAX_CHARS", "4000"))
+
+# Minimum seconds between redraws of a streaming answer
+STREAM_RENDER_INTERVAL = float(os.getenv("CHATJEE_STREAM_RENDER_INTERVAL", "0.05"))
+
+# Seconds between background ingestion status refreshes
+INGESTION_POLL_SECONDS = float(os.getenv("CHATJEE_INGESTION_POLL_SECONDS", "1.0"))
+
+# Open the app with ?admin and enter this token to see the operator metrics page
+ADMIN_TOKEN = os.getenv("CHATJEE_ADMIN_TOKEN", "")
+
+def _module_available(name: str) -> bool:
+    """Check that a module can be imported without actually importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+# The Gemini SDK is slow to import, so it is only loaded when the first answer is needed
+GEMINI_AVAILABLE = _module_available("Gemine_AI") and _module_available("google.generativeai")
+
+GEMINI_UNAVAILABLE_MESSAGE = """❌ **Gemini AI module not available**
+                
+Please ensure that:
+1. The `Gemine_AI.py` file is in the same directory
+2. The Gemini API is properly configured
+3. You have a valid API key
+
+You can still use this interface once you fix the AI module."""
+
+def load_gemini_model(model_name: Optional[str] = None):
+    """Import your Gemini AI module on first use, with better error handling"""
+    try:
+        first_load = "Gemine_AI" not in sys.modules
+        with phase("load Gemini module"):
+            from Gemine_AI import get_model
+        model = get_model(model_name)
+        if first_load:
+            logger.info("Gemini AI module loaded successfully")
+        return model
+    except ImportError as e:
+        logger.error(f"Failed to import Gemini AI: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error importing Gemini AI: {e}")
+    return None
 
 # Page configuration
 st.set_page_config(
@@ -39,524 +95,32 @@ st.set_page_config(
     }
 )
 
-# Enhanced CSS styling with animations and better responsiveness
-st.markdown("""
-<style>
-    /* Hide Streamlit default elements */
-    #MainMenu {visibility: hidden;}
-    .stDeployButton {display: none;}
-    footer {visibility: hidden;}
-    
-    
-    /* Custom fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    /* Main app styling */
-    .stApp {
-        background: linear-gradient(135deg, #0f0f23 0%, #1a1a2e 100%);
-        color: #ffffff;
-        font-family: 'Inter', sans-serif;
-    }
-    
-    /* Animated background */
-    .stApp::before {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: 
-            radial-gradient(circle at 20% 80%, rgba(120, 119, 198, 0.1) 0%, transparent 50%),
-            radial-gradient(circle at 80% 20%, rgba(16, 163, 127, 0.1) 0%, transparent 50%);
-        pointer-events: none;
-        z-index: -1;
-    }
-        /* Hide main menu during authentication */
-.stApp[data-auth="false"] #MainMenu {
-    visibility: hidden !important;
-}
-
-/* Show loading state during auth transition */
-.auth-loading {
-    display: flex;
-    justify-content: center;
-    align-items: center;
-    height: 200px;
-    font-size: 1.2rem;
-    color: #10a37f;
-}
-    
-    /* Chat container with glassmorphism effect */
-    .chat-container {
-        background: rgba(26, 26, 46, 0.8);
-        backdrop-filter: blur(10px);
-        border-radius: 16px;
-        padding: 0;
-        margin: 0;
-        min-height: 60vh;
-        max-height: 70vh;
-        overflow-y: auto;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-        scrollbar-width: thin;
-        scrollbar-color: #444 transparent;
-    }
-    
-    .chat-container::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    .chat-container::-webkit-scrollbar-track {
-        background: transparent;
-    }
-    
-    .chat-container::-webkit-scrollbar-thumb {
-        background: linear-gradient(45deg, #10a37f, #667eea);
-        border-radius: 4px;
-    }
-    
-    .chat-container::-webkit-scrollbar-thumb:hover {
-        background: linear-gradient(45deg, #0d8b63, #5a6fd8);
-    }
-    
-    /* Enhanced message styling */
-    .message {
-        padding: 1.5rem;
-        margin: 0;
-        border-bottom: 1px solid rgba(255, 255, 255, 0.05);
-        display: flex;
-        align-items: flex-start;
-        gap: 16px;
-        transition: all 0.3s ease;
-        position: relative;
-    }
-    
-    .message:hover {
-        background: rgba(255, 255, 255, 0.02);
-    }
-    
-    .message-icon {
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 18px;
-        flex-shrink: 0;
-        margin-top: 4px;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.2);
-    }
-    
-    .user-icon {
-        background: linear-gradient(135deg, #10a37f, #0d8b63);
-        color: white;
-    }
-    
-    .bot-icon {
-        background: linear-gradient(135deg, #667eea, #764ba2);
-        color: white;
-    }
-    
-    .message-content {
-        flex-grow: 1;
-        line-height: 1.7;
-        font-size: 15px;
-        word-wrap: break-word;
-        color: #e0e0e0;
-    }
-    
-    .user-message {
-        background: rgba(45, 45, 72, 0.3);
-    }
-    
-    .bot-message {
-        background: rgba(26, 26, 46, 0.3);
-    }
-    
-    /* Code blocks styling */
-    .message-content pre {
-        background: rgba(15, 15, 35, 0.8);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 8px;
-        padding: 1rem;
-        overflow-x: auto;
-        font-family: 'JetBrains Mono', monospace;
-    }
-    
-    .message-content code {
-        background: rgba(15, 15, 35, 0.6);
-        padding: 2px 6px;
-        border-radius: 4px;
-        font-family: 'JetBrains Mono', monospace;
-        font-size: 13px;
-    }
-    
-    /* Enhanced header with animated gradient */
-    .header {
-        text-align: center;
-        padding: 3rem 1rem 2rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 50%, #10a37f 100%);
-        background-size: 200% 200%;
-        animation: gradientShift 6s ease infinite;
-        border-radius: 0 0 24px 24px;
-        margin-bottom: 2rem;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .header::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: linear-gradient(45deg, transparent, rgba(255, 255, 255, 0.1), transparent);
-        animation: shimmer 3s ease-in-out infinite;
-    }
-    
-    @keyframes gradientShift {
-        0% { background-position: 0% 50%; }
-        50% { background-position: 100% 50%; }
-        100% { background-position: 0% 50%; }
-    }
-    
-    @keyframes shimmer {
-        0% { transform: translateX(-100%); }
-        100% { transform: translateX(100%); }
-    }
-    
-    .header h1 {
-        color: white;
-        margin: 0;
-        font-size: 3rem;
-        font-weight: 700;
-        text-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-        position: relative;
-        z-index: 1;
-    }
-    
-    .header p {
-        color: rgba(255, 255, 255, 0.9);
-        margin: 0.5rem 0 0;
-        font-size: 1.2rem;
-        font-weight: 400;
-        position: relative;
-        z-index: 1;
-    }
-    
-    /* Enhanced input area */
-    .stTextArea textarea {
-        background: rgba(45, 45, 72, 0.8) !important;
-        color: #ffffff !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        border-radius: 16px !important;
-        padding: 16px 60px 16px 20px !important;
-        font-size: 15px !important;
-        line-height: 1.5 !important;
-        resize: none !important;
-        min-height: 60px !important;
-        max-height: 200px !important;
-        backdrop-filter: blur(10px);
-        transition: all 0.3s ease !important;
-        font-family: 'Inter', sans-serif !important;
-    }
-    
-    .stTextArea textarea:focus {
-        border-color: #10a37f !important;
-        outline: none !important;
-        box-shadow: 0 0 0 3px rgba(16, 163, 127, 0.2) !important;
-        background: rgba(45, 45, 72, 0.9) !important;
-    }
-    
-    .stTextArea textarea::placeholder {
-        color: rgba(255, 255, 255, 0.5) !important;
-    }
-    
-    /* Enhanced buttons */
-    .stButton > button {
-        background: linear-gradient(135deg, #10a37f, #0d8b63) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 12px !important;
-        padding: 12px 24px !important;
-        font-weight: 600 !important;
-        font-size: 14px !important;
-        transition: all 0.3s ease !important;
-        box-shadow: 0 4px 12px rgba(16, 163, 127, 0.3) !important;
-        text-transform: uppercase !important;
-        letter-spacing: 0.5px !important;
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(135deg, #0d8b63, #10a37f) !important;
-        transform: translateY(-2px) !important;
-        box-shadow: 0 6px 16px rgba(16, 163, 127, 0.4) !important;
-    }
-    
-    .stButton > button:active {
-        transform: translateY(0) !important;
-    }
-    
-    /* Enhanced PDF upload area */
-    .stFileUploader {
-        background: rgba(45, 45, 72, 0.3) !important;
-        border: 2px dashed rgba(255, 255, 255, 0.2) !important;
-        border-radius: 16px !important;
-        padding: 2rem !important;
-        text-align: center !important;
-        transition: all 0.3s ease !important;
-        backdrop-filter: blur(5px) !important;
-    }
-    
-    .stFileUploader:hover {
-        border-color: #10a37f !important;
-        background: rgba(45, 45, 72, 0.5) !important;
-    }
-    
-    .stFileUploader label {
-        color: #ffffff !important;
-        font-weight: 500 !important;
-    }
-    
-    /* Status messages */
-    .stSuccess {
-        background: rgba(26, 46, 26, 0.8) !important;
-        border: 1px solid rgba(16, 163, 127, 0.3) !important;
-        border-radius: 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    .stError {
-        background: rgba(46, 26, 26, 0.8) !important;
-        border: 1px solid rgba(239, 68, 68, 0.3) !important;
-        border-radius: 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    .stWarning {
-        background: rgba(46, 39, 26, 0.8) !important;
-        border: 1px solid rgba(245, 158, 11, 0.3) !important;
-        border-radius: 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    .stInfo {
-        background: rgba(26, 39, 46, 0.8) !important;
-        border: 1px solid rgba(59, 130, 246, 0.3) !important;
-        border-radius: 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    /* Enhanced welcome message */
-    .welcome-message {
-        text-align: center;
-        padding: 3rem 2rem;
-        color: #ccc;
-        position: relative;
-    }
-    
-    .welcome-message h2 {
-        color: #ffffff;
-        margin-bottom: 1rem;
-        font-size: 2rem;
-        font-weight: 600;
-    }
-    
-    .welcome-message p {
-        font-size: 1.1rem;
-        line-height: 1.6;
-        margin-bottom: 1rem;
-    }
-    
-    /* Enhanced sample questions */
-    .sample-questions {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(320px, 1fr));
-        gap: 1.5rem;
-        margin-top: 2rem;
-    }
-    
-    .sample-question {
-        background: rgba(45, 45, 72, 0.4);
-        backdrop-filter: blur(5px);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 16px;
-        padding: 1.5rem;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        text-align: left;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .sample-question::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: linear-gradient(135deg, rgba(16, 163, 127, 0.1), rgba(102, 126, 234, 0.1));
-        opacity: 0;
-        transition: opacity 0.3s ease;
-    }
-    
-    .sample-question:hover::before {
-        opacity: 1;
-    }
-    
-    .sample-question:hover {
-        transform: translateY(-4px);
-        box-shadow: 0 8px 24px rgba(0, 0, 0, 0.2);
-        border-color: rgba(16, 163, 127, 0.3);
-    }
-    
-    .sample-question strong {
-        color: #10a37f;
-        font-weight: 600;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .sample-question span {
-        position: relative;
-        z-index: 1;
-    }
-    
-    /* Enhanced typing indicator */
-    .typing-indicator {
-        display: flex;
-        align-items: center;
-        gap: 12px;
-        padding: 1rem;
-        color: #10a37f;
-        font-style: italic;
-        font-weight: 500;
-    }
-    
-    .typing-dots {
-        display: flex;
-        gap: 6px;
-    }
-    
-    .typing-dot {
-        width: 8px;
-        height: 8px;
-        border-radius: 50%;
-        background: linear-gradient(135deg, #10a37f, #0d8b63);
-        animation: typing 1.4s infinite;
-    }
-    
-    .typing-dot:nth-child(2) {
-        animation-delay: 0.2s;
-    }
-    
-    .typing-dot:nth-child(3) {
-        animation-delay: 0.4s;
-    }
-    
-    @keyframes typing {
-        0%, 60%, 100% {
-            transform: translateY(0);
-            opacity: 0.4;
-        }
-        30% {
-            transform: translateY(-8px);
-            opacity: 1;
-        }
-    }
-    
-    /* Enhanced expander */
-    .streamlit-expanderHeader {
-        background: rgba(45, 45, 72, 0.5) !important;
-        border: 1px solid rgba(255, 255, 255, 0.1) !important;
-        border-radius: 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    .streamlit-expanderContent {
-        background: rgba(26, 26, 46, 0.8) !important;
-        border: 1px solid rgba(255, 255, 255, 0.05) !important;
-        border-radius: 0 0 12px 12px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    /* Statistics card */
-    .stats-card {
-        background: rgba(45, 45, 72, 0.4);
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 16px;
-        padding: 1.5rem;
-        margin: 1rem 0;
-        text-align: center;
-    }
-    
-    .stats-card h3 {
-        color: #10a37f;
-        margin: 0 0 0.5rem 0;
-        font-size: 1.5rem;
-        font-weight: 600;
-    }
-    
-    .stats-card p {
-        color: #ccc;
-        margin: 0;
-        font-size: 0.9rem;
-    }
-    
-    /* Mobile responsive */
-    @media (max-width: 768px) {
-        .header h1 {
-            font-size: 2.5rem;
-        }
-        
-        .header p {
-            font-size: 1rem;
-        }
-        
-        .sample-questions {
-            grid-template-columns: 1fr;
-        }
-        
-        .message {
-            padding: 1rem;
-        }
-        
-        .welcome-message {
-            padding: 2rem 1rem;
-        }
-        
-        .welcome-message h2 {
-            font-size: 1.5rem;
-        }
-    }
-    
-    /* Pulse animation for loading */
-    @keyframes pulse {
-        0% { opacity: 1; }
-        50% { opacity: 0.5; }
-        100% { opacity: 1; }
-    }
-    
-    .loading {
-        animation: pulse 1.5s ease-in-out infinite;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Enhanced CSS styling and page scripts live in static/ and are installed once per browser session
+with phase("inject static assets"):
+    inject_assets()
 
 class EnhancedChatJee:
     def __init__(self):
         self.conversation_history = []
-        self.pdf_content = ""
+        self.history_summary = ""
+        self.prompt_builder = PromptBuilder(token_counter=self._select_token_counter())
+        # Uploaded PDFs, shared through the material library with every
+        # other session that uploaded the same file
+        self.documents = MaterialSet()
+        # Ground answers in the preloaded reference corpus as well
+        self.use_corpus = bool(CORPUS_PATH) and CORPUS_DEFAULT_ON
+        self.ingestion_jobs: List[IngestionJob] = []
         self.session_start_time = datetime.now()
         self.total_messages = 0
+        self.cache_hits = 0
         self.pdf_files_processed = 0
+        # Identifies this student to the shared model request queue
+        self.user_id = "anonymous"
+        self._batch_questions: List[DetectedQuestion] = []
+        self._batch_questions_version = None
+        # Background ingestion threads add pages while the script thread reads them
+        self._materials_lock = threading.RLock()
+        self._materials_generation = 0
         
     def validate_pdf_file(self, pdf_file) -> bool:
         """Validate PDF file before processing"""
@@ -580,49 +144,94 @@ class EnhancedChatJee:
             if not self.validate_pdf_file(pdf_file):
                 return ""
             
-            pdf_reader = PdfReader(pdf_file)
-            text = ""
-            
-            if len(pdf_reader.pages) == 0:
-                st.warning("⚠️ PDF appears to be empty or corrupted.")
-                return ""
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-                except Exception as e:
-                    logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
-                    continue
-            
-            if not text.strip():
-                st.warning("⚠️ No text could be extracted from the PDF. It might be image-based.")
-                return ""
-            
-            return text
+            page_texts = self._load_page_texts([pdf_file])[0]
+            return self._format_pdf_text(pdf_file, page_texts)
         except Exception as e:
             logger.error(f"Error reading PDF {pdf_file.name}: {e}")
             st.error(f"❌ Error reading PDF: {str(e)}")
             return ""
     
+    def _load_page_texts(self, pdf_files, progress_callback=None) -> List[Optional[List[str]]]:
+        """Per-page text for each file, parsing only what the shared cache lacks"""
+        pdf_cache = get_pdf_cache()
+        results = [None] * len(pdf_files)
+        misses = []
+        
+        for index, pdf_file in enumerate(pdf_files):
+            pdf_bytes = pdf_file.getvalue()
+            content_hash = hash_pdf_bytes(pdf_bytes)
+            
+            # Same book uploaded by another student? Reuse the parsed pages
+            page_texts = pdf_cache.get(content_hash)
+            if page_texts is not None:
+                logger.info(f"PDF cache hit for {pdf_file.name} ({content_hash[:12]})")
+                results[index] = page_texts
+            else:
+                misses.append((index, content_hash, pdf_bytes))
+        
+        if misses:
+            from pdf_extraction import get_pdf_extractor
+            
+            extracted = get_pdf_extractor().extract_many(
+                [pdf_bytes for _, _, pdf_bytes in misses], progress_callback
+            )
+            for (index, content_hash, _), page_texts in zip(misses, extracted):
+                if page_texts is not None:
+                    pdf_cache.put(content_hash, page_texts)
+                results[index] = page_texts
+        
+        return results
+    
+    def _usable_pages(self, pdf_file, page_texts: Optional[List[str]]) -> List[Tuple[int, str]]:
+        """(1-based page number, text) of pages with text, warning about unusable files"""
+        if page_texts is None:
+            st.warning(f"⚠️ {pdf_file.name} appears to be empty or corrupted.")
+            return []
+        
+        pages = [
+            (page_num + 1, page_text)
+            for page_num, page_text in enumerate(page_texts)
+            if page_text.strip()
+        ]
+        if not pages:
+            st.warning(f"⚠️ No text could be extracted from {pdf_file.name}. It might be image-based.")
+        return pages
+    
+    def _format_pdf_text(self, pdf_file, page_texts: Optional[List[str]]) -> str:
+        """Rebuild the page-marked text block, warning about unusable files"""
+        return "".join(
+            f"\n--- Page {page_num} ---\n{page_text}\n"
+            for page_num, page_text in self._usable_pages(pdf_file, page_texts)
+        )
+    
     def process_pdfs(self, uploaded_files) -> str:
         """Process multiple PDF files with progress tracking"""
-        all_text = ""
         successful_files = 0
+        self.clear_materials()
         
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        for i, file in enumerate(uploaded_files):
-            progress = (i + 1) / len(uploaded_files)
-            progress_bar.progress(progress)
-            status_text.text(f"Processing {file.name}... ({i + 1}/{len(uploaded_files)})")
-            
-            text = self.extract_text_from_pdf(file)
-            if text:
-                all_text += f"\n\n{'='*50}\n📄 Content from {file.name}\n{'='*50}\n{text}"
+        valid_files = [file for file in uploaded_files if self.validate_pdf_file(file)]
+        
+        def report_progress(done_pages: int, total_pages: int):
+            progress_bar.progress(done_pages / total_pages if total_pages else 1.0)
+            status_text.text(f"Extracting pages... ({done_pages}/{total_pages})")
+        
+        status_text.text(f"Reading {len(valid_files)} file(s)...")
+        try:
+            all_page_texts = self._load_page_texts(valid_files, report_progress)
+        except Exception as e:
+            logger.error(f"Error extracting PDFs: {e}")
+            st.error(f"❌ Error reading PDFs: {str(e)}")
+            all_page_texts = [None] * len(valid_files)
+        
+        for file, page_texts in zip(valid_files, all_page_texts):
+            pages = self._usable_pages(file, page_texts)
+            if pages:
                 successful_files += 1
+                status_text.text(f"Indexing {file.name}...")
+                self.documents.add_complete(file.name, hash_pdf_bytes(file.getvalue()), pages)
         
         progress_bar.empty()
         status_text.empty()
@@ -633,33 +242,198 @@ class EnhancedChatJee:
         else:
             st.error("❌ No PDFs could be processed successfully.")
         
-        return all_text
+        return self.pdf_content
+    
+    @property
+    def pdf_content(self) -> str:
+        """All materials as one banner-separated string, built on demand.
+        
+        Kept for callers that want the whole text; the session itself only
+        holds references to shared documents.
+        """
+        return self.documents.render()
+    
+    def ingest_in_background(self, uploaded_files) -> List[IngestionJob]:
+        """Queue PDFs for background extraction; pages become searchable as they finish.
+        
+        Files another session already processed come straight from the
+        material library without being queued.
+        """
+        self.clear_materials()
+        generation = self._materials_generation
+        ingestion_queue = get_ingestion_queue()
+        
+        def pages_handler(content_hash: str):
+            # Bound per file: a job's first pages can arrive before it is in self.ingestion_jobs
+            def on_pages(source: str, pages):
+                self.add_material_pages(source, content_hash, pages, generation=generation)
+            return on_pages
+        
+        def on_done(job: IngestionJob):
+            with self._materials_lock:
+                if job.status == DONE and generation == self._materials_generation:
+                    self.documents.publish(job.file_name)
+        
+        self.ingestion_jobs = []
+        used_names = set()
+        for file in uploaded_files:
+            if not self.validate_pdf_file(file):
+                continue
+            # Read the upload bytes here: UploadedFile objects belong to the script thread
+            pdf_bytes = file.getvalue()
+            content_hash = hash_pdf_bytes(pdf_bytes)
+            name = self._unique_source_name(file.name, used_names)
+            shared = self.documents.attach_shared(name, content_hash)
+            if shared is not None:
+                logger.info(f"Material library hit for {name} ({content_hash[:12]})")
+                self.ingestion_jobs.append(IngestionJob.already_done(name, content_hash, len(shared)))
+                continue
+            self.ingestion_jobs.append(ingestion_queue.submit(
+                name, pdf_bytes, pages_handler(content_hash), on_done=on_done, content_hash=content_hash
+            ))
+        return self.ingestion_jobs
+    
+    @staticmethod
+    def _unique_source_name(name: str, used_names: set) -> str:
+        """name, or "name (2).pdf" etc. when an earlier upload in the batch has it"""
+        stem, ext = os.path.splitext(name)
+        candidate = name
+        copy = 1
+        while candidate in used_names:
+            copy += 1
+            candidate = f"{stem} ({copy}){ext}"
+        used_names.add(candidate)
+        return candidate
+    
+    def add_material_pages(self, source: str, content_hash: str, pages, generation: Optional[int] = None):
+        """Add (page number, text) pairs for a file still being ingested"""
+        with self._materials_lock:
+            # Pages from a job started before the materials were cleared are dropped
+            if generation is not None and generation != self._materials_generation:
+                return
+            self.documents.add_pending_pages(source, content_hash, pages)
     
     def clean_and_format_response(self, response: str) -> str:
         """Clean and format the AI response"""
-        # Remove excessive newlines
-        response = re.sub(r'\n{3,}', '\n\n', response)
+        # Splits prose from code once, then tidies blank-line runs, code fences and math delimiters
+        return format_response(response)
+    
+    @staticmethod
+    def _select_token_counter():
+        """Use the model's tokenizer when configured, else the local estimate"""
+        if os.getenv("CHATJEE_TOKEN_COUNTER", "local") == "model" and GEMINI_AVAILABLE:
+            return model_token_counter(load_gemini_model)
+        return estimate_tokens
+    
+    def clear_history(self):
+        """Forget the conversation and its running summary"""
+        self.conversation_history = []
+        self.history_summary = ""
+    
+    def clear_materials(self):
+        """Forget uploaded study materials and their search index"""
+        with self._materials_lock:
+            self._materials_generation += 1
+            # Hand shared documents back so the library can evict them
+            self.documents.release()
+            self.documents = MaterialSet()
+            self.ingestion_jobs = []
+    
+    def material_refs(self) -> List[Tuple[str, str]]:
+        """(file name, content hash) of every fully loaded PDF, enough to restore it later"""
+        return self.documents.refs()
+    
+    def restore_materials(self, refs: List[Tuple[str, str]]) -> List[str]:
+        """Reattach stored materials from the library or the PDF cache; returns the names no longer available"""
+        self.clear_materials()
+        pdf_cache = get_pdf_cache()
+        missing = []
+        for source, content_hash in refs:
+            if self.documents.attach_shared(source, content_hash) is not None:
+                continue
+            page_texts = pdf_cache.get(content_hash)
+            if page_texts is None:
+                missing.append(source)
+                continue
+            self.documents.add_complete(source, content_hash, [
+                (page_num + 1, page_text)
+                for page_num, page_text in enumerate(page_texts)
+                if page_text.strip()
+            ])
+        self.pdf_files_processed = len(refs) - len(missing)
+        return missing
+    
+    def restore_conversation(self, messages: List[Dict[str, str]], summary: str):
+        """Rebuild the prompt history from stored chat messages"""
+        history = []
+        for question, answer in zip(messages, messages[1:]):
+            if question["role"] == "user" and answer["role"] == "assistant":
+                history.append(f"Student: {question['content']}")
+                history.append(f"Chat Jee: {answer['content']}")
+        self.conversation_history, self.history_summary = self.prompt_builder.compact_history(history, summary)
+    
+    def get_batch_questions(self) -> List[DetectedQuestion]:
+        """Numbered questions found in the uploaded materials, re-scanned only when they change"""
+        with self._materials_lock:
+            if self._batch_questions_version != self.documents.version:
+                self._batch_questions = detect_questions(self.documents.iter_files())
+                self._batch_questions_version = self.documents.version
+            return self._batch_questions
+    
+    def get_materials_fingerprint(self) -> str:
+        """Hash of the loaded materials, recomputed only when they change"""
+        documents = self.documents
+        fingerprint = documents.fingerprint() if documents else NO_MATERIALS
+        corpus = self.active_corpus()
+        if corpus is not None:
+            # Grounded answers are cached apart from ungrounded ones and per corpus build
+            fingerprint = f"{fingerprint}+corpus:{corpus.version}"
+        return fingerprint
+    
+    def active_corpus(self):
+        """The reference corpus if this session grounds answers in it"""
+        return get_corpus() if self.use_corpus else None
+    
+    def _retrieval_query(self, user_input: str, history: Optional[List[str]]) -> str:
+        # Short follow-ups ("and the second one?") lean on the previous question
+        history = self.conversation_history if history is None else history
+        previous_questions = [turn for turn in history if turn.startswith("Student: ")]
+        if len(user_input.split()) < 6 and previous_questions:
+            return f"{previous_questions[-1][len('Student: '):]} {user_input}"
+        return user_input
+    
+    def get_relevant_materials(self, user_input: str, history: Optional[List[str]] = None) -> str:
+        """Pick the chunks of the uploaded materials that matter for this question"""
+        if not self.documents:
+            return ""
         
-        # Format mathematical expressions
-        response = re.sub(r'\*\*(.*?)\*\*', r'**\1**', response)
+        from retrieval import format_retrieved_chunks
+        
+        results = self.documents.search(self._retrieval_query(user_input, history), top_k=RETRIEVAL_TOP_K)
+        return format_retrieved_chunks(results, RETRIEVAL_MAX_CHARS, self.documents.names())
+    
+    def get_corpus_materials(self, user_input: str, history: Optional[List[str]] = None) -> str:
+        """Pick the passages of the reference corpus that matter for this question"""
+        corpus = self.active_corpus()
+        if corpus is None:
+            return ""
         
-        # Format code blocks
-        response = re.sub(r'```(\w+)?\n(.*?)```', r'```\1\n\2\n```', response, flags=re.DOTALL)
+        from retrieval import format_retrieved_chunks
         
-        return response.strip()
+        results = corpus.search(self._retrieval_query(user_input, history), top_k=CORPUS_TOP_K)
+        return format_retrieved_chunks(results, CORPUS_MAX_CHARS, [entry["name"] for entry in corpus.files])
     
-    def get_response(self, user_input: str) -> str:
-        """Get AI response with enhanced error handling"""
+    def get_response(self, user_input: str, on_partial: Optional[Callable[[str], None]] = None,
+                     on_queue: Optional[Callable[[int], None]] = None) -> str:
+        """Get AI response with enhanced error handling
+        
+        When on_partial is given the answer is streamed and on_partial is called
+        with the text received so far each time a chunk arrives. on_queue is
+        called with the queue position while waiting for a model slot.
+        """
         try:
             if not GEMINI_AVAILABLE:
-                return """❌ **Gemini AI module not available**
-                
-Please ensure that:
-1. The `Gemine_AI.py` file is in the same directory
-2. The Gemini API is properly configured
-3. You have a valid API key
-
-You can still use this interface once you fix the AI module."""
+                return GEMINI_UNAVAILABLE_MESSAGE
             
             # Input validation
             if not user_input.strip():
@@ -668,54 +442,129 @@ You can still use this interface once you fix the AI module."""
             if len(user_input) > 5000:
                 return "⚠️ Your message is too long. Please keep it under 5000 characters."
             
-            # Create enhanced context
-            context = f"""You are Chat Jee, an expert AI tutor specialized in JEE (Joint Entrance Examination) preparation.
-
-{"📚 **Available Study Materials:**" + self.pdf_content[:10000] + "..." if self.pdf_content else ""}
-
-**Previous Conversation Context:**
-{chr(10).join(self.conversation_history[-8:])}
-
-**Current Student Question:** {user_input}
-
-**Instructions:**
-- Provide clear, detailed, and step-by-step explanations
-- Use proper formatting with headings, bullet points, and code blocks where appropriate
-- Include relevant examples and practice problems
-- Be encouraging and supportive
-- If solving numerical problems, show all steps clearly
-- For conceptual questions, provide intuitive explanations
-- Reference JEE syllabus and previous year questions when relevant
-
-**Response Format:**
-- Use markdown formatting for better readability
-- Include emojis to make responses more engaging
-- Structure your response with clear sections
-- Provide additional resources or practice suggestions when helpful
-"""
-            
-            # Get response from AI
-            response = model.generate_content(context)
-            bot_reply = response.text.strip()
+            # Identical questions over the same materials are answered from cache
+            response_cache = get_response_cache()
+            materials_fingerprint = self.get_materials_fingerprint()
+            cache_key = response_cache.make_key(user_input, materials_fingerprint, self.conversation_history)
+            cached_reply = response_cache.get(cache_key)
             
-            # Clean and format response
-            bot_reply = self.clean_and_format_response(bot_reply)
+            # Deferred like retrieval: the semantic cache tokenizes with retrieval, which pulls in NumPy
+            from semantic_cache import SEMANTIC_CACHE_ENABLED, get_semantic_cache
             
-            # Update conversation history
-            self.conversation_history.append(f"Student: {user_input}")
-            self.conversation_history.append(f"Chat Jee: {bot_reply}")
+            if cached_reply is None and SEMANTIC_CACHE_ENABLED:
+                # Then differently worded questions that mean the same thing
+                cached_reply = get_semantic_cache().get(user_input, materials_fingerprint)
+                if cached_reply is not None:
+                    logger.info("Semantic cache hit")
+                    response_cache.put(cache_key, cached_reply)
+            if cached_reply is not None:
+                self.cache_hits += 1
+                self._record_exchange(user_input, cached_reply)
+                return cached_reply
             
-            # Keep only last 20 exchanges to manage memory
-            if len(self.conversation_history) > 40:
-                self.conversation_history = self.conversation_history[-40:]
+            bot_reply = self._generate_reply(
+                user_input, self.conversation_history, self.history_summary, on_partial, on_queue
+            )
+            if bot_reply is None:
+                return GEMINI_UNAVAILABLE_MESSAGE
             
-            self.total_messages += 1
+            if bot_reply:
+                response_cache.put(cache_key, bot_reply)
+                if SEMANTIC_CACHE_ENABLED:
+                    get_semantic_cache().put(user_input, materials_fingerprint, bot_reply)
+            self._record_exchange(user_input, bot_reply)
             
             return bot_reply
             
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return f"""❌ **Error generating response**
+            return self._error_reply(e)
+    
+    def _generate_reply(self, user_input: str, history: List[str], summary: str,
+                        on_partial: Optional[Callable[[str], None]] = None,
+                        on_queue: Optional[Callable[[int], None]] = None) -> Optional[str]:
+        """Retrieve materials, build the prompt and ask the routed model; None if it is unavailable"""
+        with metrics.timed(metrics.PROMPT_BUILD_SECONDS):
+            relevant_materials = self.get_relevant_materials(user_input, history)
+            # Corpus excerpts go last so they are the first dropped when the budget is tight
+            corpus_materials = self.get_corpus_materials(user_input, history)
+            
+            # Assemble the prompt within the token budget
+            context = self.prompt_builder.build(
+                user_input,
+                materials="\n\n".join(part for part in (relevant_materials, corpus_materials) if part),
+                history=history,
+                summary=summary,
+            )
+        prompt_tokens = estimate_tokens(context)
+        metrics.PROMPT_TOKENS.observe(prompt_tokens)
+        logger.info(f"Prompt size: ~{prompt_tokens} tokens")
+        
+        # Simple questions go to the fast model, hard ones to the pro model. Only
+        # the student's own uploads count as materials: the corpus is always there
+        router = get_model_router()
+        route = router.route(user_input, has_materials=bool(relevant_materials))
+        logger.info(f"Routing to {route.name} model (score {route.score}: {', '.join(route.reasons) or 'simple'})")
+        
+        model = load_gemini_model(route.model_name)
+        if model is None:
+            return None
+        
+        # Get response from AI once the shared queue admits this request
+        with get_admission_controller().admit(self.user_id, on_wait=on_queue):
+            started = time.perf_counter()
+            try:
+                if on_partial is None:
+                    # Transient 429/503/timeout failures are retried with backoff
+                    response = get_resilient_caller().call(
+                        lambda timeout: model.generate_content(context, request_options={"timeout": timeout}),
+                        user_id=self.user_id,
+                    )
+                    bot_reply = response.text.strip()
+                    metrics.MODEL_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, route=route.name)
+                else:
+                    # Streamed answers are formatted chunk by chunk as they arrive
+                    bot_reply = self._stream_reply(model, context, on_partial, route.name)
+            except Exception:
+                router.record(route, time.perf_counter() - started, context, "", failed=True)
+                raise
+            model_seconds = time.perf_counter() - started
+            metrics.MODEL_TOTAL_SECONDS.observe(model_seconds, route=route.name)
+            router.record(route, model_seconds, context, bot_reply)
+        
+        # Clean and format response
+        if on_partial is None:
+            with metrics.timed(metrics.POSTPROCESS_SECONDS):
+                bot_reply = self.clean_and_format_response(bot_reply)
+        return bot_reply
+    
+    def solve_question(self, question: str) -> str:
+        """Answer one question on its own, leaving the conversation untouched (batch mode)"""
+        try:
+            response_cache = get_response_cache()
+            cache_key = response_cache.make_key(question, self.get_materials_fingerprint(), [])
+            cached_reply = response_cache.get(cache_key)
+            if cached_reply is not None:
+                return cached_reply
+            
+            bot_reply = self._generate_reply(question, history=[], summary="")
+            if bot_reply is None:
+                return GEMINI_UNAVAILABLE_MESSAGE
+            if bot_reply:
+                response_cache.put(cache_key, bot_reply)
+            return bot_reply
+        except Exception as e:
+            return self._error_reply(e)
+    
+    def _error_reply(self, e: Exception) -> str:
+        """User-facing message for a failed model call"""
+        if isinstance(e, CircuitOpenError):
+            logger.warning(f"Skipping model call: {e}")
+            return "⚠️ The AI service is having trouble right now. Please try again in a minute."
+        if isinstance(e, AdmissionTimeout):
+            logger.warning(f"Request from {self.user_id} not admitted: {e}")
+            return "⏳ Chat Jee is helping a lot of students right now. Please wait a moment and send your question again."
+        logger.error(f"Error generating response: {e}")
+        return f"""❌ **Error generating response**
             
 I encountered an error while processing your question: `{str(e)}`
 
@@ -727,14 +576,55 @@ I encountered an error while processing your question: `{str(e)}`
 
 Please try again with a different question."""
     
+    def _record_exchange(self, user_input: str, bot_reply: str):
+        """Append a question/answer pair to the conversation history"""
+        self.conversation_history.append(f"Student: {user_input}")
+        self.conversation_history.append(f"Chat Jee: {bot_reply}")
+        
+        # Fold older exchanges into the running summary to keep prompts small
+        self.conversation_history, self.history_summary = self.prompt_builder.compact_history(
+            self.conversation_history, self.history_summary
+        )
+        
+        self.total_messages += 1
+    
+    def _stream_reply(self, model, context: str, on_partial: Callable[[str], None], route_name: str = "") -> str:
+        """Collect a streamed Gemini answer, reporting partial text as it arrives"""
+        started = time.perf_counter()
+        # Failures before the first chunk are retried; later ones would repeat text
+        chunks = get_resilient_caller().iter_stream(
+            lambda timeout: model.generate_content(context, stream=True, request_options={"timeout": timeout}),
+            user_id=self.user_id,
+        )
+        formatter = ResponseFormatter()
+        received_text = False
+        for chunk in chunks:
+            try:
+                piece = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                continue
+            if piece:
+                if not received_text:
+                    received_text = True
+                    metrics.MODEL_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started, route=route_name)
+                formatter.feed(piece)
+                on_partial(formatter.preview())
+        with metrics.timed(metrics.POSTPROCESS_SECONDS):
+            return formatter.finish()
+    
     def get_session_stats(self) -> Dict:
         """Get session statistics"""
         session_duration = datetime.now() - self.session_start_time
         return {
             "duration": str(session_duration).split('.')[0],
             "messages": self.total_messages,
-            "pdfs_processed": self.pdf_files_processed,
-            "has_materials": bool(self.pdf_content)
+            "cache_hits": self.cache_hits,
+            "pdfs_processed": max(
+                self.pdf_files_processed,
+                sum(1 for job in self.ingestion_jobs if job.status == DONE)
+            ),
+            "has_materials": bool(self.documents)
         }
 
 def create_sample_questions():
@@ -790,7 +680,225 @@ def create_sample_questions():
     
     return questions_html
 
+def poll_fragment(func):
+    """Re-run func on a timer when this Streamlit version supports fragments"""
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if fragment is None:
+        return func
+    return fragment(run_every=INGESTION_POLL_SECONDS)(func)
+
+@poll_fragment
+def render_ingestion_status(chatbot):
+    """Per-file progress for background PDF ingestion"""
+    jobs = chatbot.ingestion_jobs
+    if not jobs:
+        return
+    
+    if all(job.finished for job in jobs):
+        if any(job.status == DONE for job in jobs):
+            st.success("✅ Study materials loaded successfully!")
+            st.info("💡 You can now ask questions about your uploaded materials.")
+        else:
+            st.error("❌ No PDFs could be processed successfully.")
+    else:
+        st.info(f"🔄 Processing study materials: {summarize_jobs(jobs)}. "
+                "You can already ask questions about the pages indexed so far.")
+    
+    for job in jobs:
+        if job.status == DONE:
+            source = " (cached)" if job.from_cache else ""
+            st.caption(f"✅ {job.file_name}: {job.text_pages} page(s) indexed{source}")
+        elif job.finished:
+            st.caption(f"❌ {job.file_name}: {job.error}")
+        else:
+            st.progress(job.progress, text=f"{job.file_name}: {job.pages_done}/{job.pages_total or '?'} pages")
+    
+    # Refresh the whole page once everything has landed so stats and indicators update
+    all_finished = all(job.finished for job in jobs)
+    if all_finished and not st.session_state.get("materials_saved"):
+        st.session_state.materials_saved = True
+        save_session(chatbot)
+    if all_finished and st.session_state.get("ingestion_active"):
+        st.session_state.ingestion_active = False
+        st.rerun()
+    elif not all_finished:
+        st.session_state.ingestion_active = True
+
+def add_message(role: str, content: str):
+    """Show a chat message in this session and append it to the student's stored log"""
+    message = {"role": role, "content": content}
+    user_key = st.session_state.get("session_user")
+    if user_key:
+        try:
+            message["id"] = get_session_store().append_message(user_key, role, content)
+        except Exception as e:
+            logger.warning(f"Could not store chat message: {e}")
+    
+    messages = st.session_state.messages
+    messages.append(message)
+    # Only a recent window stays in memory; older messages are read back on demand
+    keep = max(SESSION_WINDOW_MESSAGES, st.session_state.get("history_visible", 0))
+    if len(messages) > keep and all("id" in old for old in messages[:len(messages) - keep]):
+        del messages[:len(messages) - keep]
+        st.session_state.history_has_earlier = True
+
+def load_earlier_messages():
+    """Prepend the stored messages that came before the loaded window"""
+    user_key = st.session_state.get("session_user")
+    messages = st.session_state.messages
+    if not user_key or not messages or "id" not in messages[0]:
+        st.session_state.history_has_earlier = False
+        return
+    store = get_session_store()
+    earlier = store.recent_messages(user_key, limit=HISTORY_PAGE_SIZE, before_id=messages[0]["id"])
+    st.session_state.messages = earlier + messages
+    st.session_state.history_has_earlier = bool(earlier) and store.has_messages_before(user_key, earlier[0]["id"])
+
+def save_session(chatbot):
+    """Store what is needed to restore this session besides its messages"""
+    user_key = st.session_state.get("session_user")
+    if not user_key:
+        return
+    try:
+        get_session_store().save_state(user_key, chatbot.material_refs(), chatbot.history_summary)
+    except Exception as e:
+        logger.warning(f"Could not store session state: {e}")
+
+def restore_session(chatbot, user_key: str):
+    """Bring back a returning student's recent messages and materials without re-reading PDFs"""
+    try:
+        store = get_session_store()
+        state = store.load_state(user_key)
+        messages = store.recent_messages(user_key)
+        if messages:
+            st.session_state.messages = messages
+            st.session_state.history_has_earlier = store.has_messages_before(user_key, messages[0]["id"])
+        chatbot.restore_conversation(messages, state.summary)
+        
+        missing = chatbot.restore_materials(state.materials) if state.materials else []
+        if len(missing) < len(state.materials):
+            st.session_state.pdf_uploaded = True
+        if messages or state.materials:
+            st.toast("🔄 Restored your previous session")
+        if missing:
+            st.toast(f"📄 Please upload again: {', '.join(missing)}")
+    except Exception as e:
+        logger.warning(f"Could not restore session for {user_key}: {e}")
+
+def register_metric_gauges():
+    """Expose counters kept by other components alongside the latency histograms"""
+    admission = get_admission_controller()
+    metrics.registry.register_gauge(
+        "chatjee_model_requests_in_flight", "Model calls currently admitted",
+        lambda: {(): admission.active},
+    )
+    metrics.registry.register_gauge(
+        "chatjee_model_requests_waiting", "Model calls waiting for admission",
+        lambda: {(): admission.waiting},
+    )
+    
+    def route_stats(field):
+        snapshot = get_model_router().stats.snapshot()
+        return {(("route", route),): stats[field] for route, stats in snapshot.items()}
+    
+    metrics.registry.register_gauge("chatjee_route_requests_total", "Model calls per route", lambda: route_stats("requests"))
+    metrics.registry.register_gauge("chatjee_route_errors_total", "Failed model calls per route", lambda: route_stats("errors"))
+    metrics.registry.register_gauge("chatjee_route_cost_usd_total", "Estimated spend per route", lambda: route_stats("cost_usd"))
+    
+    caller = get_resilient_caller()
+    metrics.registry.register_gauge("chatjee_model_retries_total", "Retried model calls", lambda: {(): caller.retries})
+    metrics.registry.register_gauge("chatjee_model_hedges_total", "Hedged model calls", lambda: {(): caller.hedges})
+    metrics.registry.register_gauge(
+        "chatjee_circuit_open", "1 while the model circuit breaker is open",
+        lambda: {(): int(caller.breaker.state == "open")},
+    )
+    
+    def semantic_cache_stat(field):
+        # Imported on first scrape so NumPy stays off the startup path
+        from semantic_cache import get_semantic_cache
+        return {(): get_semantic_cache().stats[field]}
+    
+    metrics.registry.register_gauge(
+        "chatjee_semantic_cache_hits_total", "Answers served for a reworded question",
+        lambda: semantic_cache_stat("hits"),
+    )
+    metrics.registry.register_gauge(
+        "chatjee_semantic_cache_entries", "Questions held in the semantic cache",
+        lambda: semantic_cache_stat("entries"),
+    )
+    
+    library = get_material_library()
+    metrics.registry.register_gauge(
+        "chatjee_library_documents", "Processed PDFs held in the shared material library",
+        lambda: {(): library.stats["documents"]},
+    )
+    metrics.registry.register_gauge(
+        "chatjee_library_references", "Sessions' references to shared PDFs",
+        lambda: {(): library.stats["references"]},
+    )
+    metrics.registry.register_gauge(
+        "chatjee_library_bytes_saved", "Memory saved by sharing PDFs instead of copying them per session",
+        lambda: {(): library.stats["bytes_saved"]},
+    )
+
+def render_admin_metrics():
+    """Operator view of latency percentiles and the raw Prometheus export"""
+    st.markdown("## 📈 Chat Jee Metrics")
+    rows = metrics.registry.summary()
+    if rows:
+        st.dataframe(
+            [
+                {
+                    "metric": row["metric"],
+                    "labels": row["labels"],
+                    "count": row["count"],
+                    "mean": round(row["mean"], 4),
+                    "p50": round(row["p50"], 4),
+                    "p90": round(row["p90"], 4),
+                    "p99": round(row["p99"], 4),
+                }
+                for row in rows
+            ]
+        )
+    else:
+        st.info("No requests recorded yet.")
+    
+    if "Gemine_AI" in sys.modules:
+        from Gemine_AI import get_client
+        client = get_client()
+        if client:
+            st.markdown("### 🤖 Gemini client")
+            st.json(client.describe())
+    
+    st.markdown("### Prometheus export")
+    st.code(metrics.registry.render_prometheus(), language="text")
+
+def admin_login() -> bool:
+    """Token prompt for the operator page; a correct token is remembered for the browser session"""
+    if st.session_state.get("admin_authenticated"):
+        return True
+    
+    with st.form(key="admin_login"):
+        admin_token = st.text_input("Admin token", type="password")
+        submitted = st.form_submit_button("Open metrics")
+    if submitted:
+        if hmac.compare_digest(admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+            st.session_state.admin_authenticated = True
+            st.rerun()
+        st.error("Wrong admin token.")
+    return False
+
 def main():
+    register_metric_gauges()
+    metrics.start_metrics_server()
+    preload_corpus()
+    
+    # Hidden operator page; ?admin only opens the prompt, so the token never lands in a URL
+    if ADMIN_TOKEN and "admin" in st.query_params:
+        if admin_login():
+            render_admin_metrics()
+        return
+    
     def initialize_session_state():
         """Initialize all session state variables"""
         if 'chatbot' not in st.session_state:
@@ -810,15 +918,24 @@ def main():
     initialize_session_state()
     
     # Handle authentication
-    user_info = authenticate_user_manual()
+    with phase("authentication"):
+        user_info = authenticate_user_manual()
     
     if not user_info:
         # Authentication UI is already shown in authenticate_user_manual()
         # Just stop execution here
+        log_report_once()
         st.stop()
     
     # Mark authentication as complete
     st.session_state.authentication_complete = True
+    st.session_state.chatbot.user_id = user_info.get('email') or user_info.get('name') or "anonymous"
+    
+    # A new browser session of a known student picks up where the last one left off
+    if user_info.get('email') and st.session_state.get("session_user") != user_info['email']:
+        st.session_state.session_user = user_info['email']
+        if not st.session_state.messages:
+            restore_session(st.session_state.chatbot, user_info['email'])
     
     # Show user info in sidebar (clean version)
     with st.sidebar:
@@ -857,18 +974,45 @@ def main():
         with col2:
             st.metric("Session Time", stats["duration"])
             st.metric("Materials", "Yes" if stats["has_materials"] else "No")
+        st.metric("Instant Answers", stats["cache_hits"], help="Answers served from the shared response cache")
+        
+        if CORPUS_PATH:
+            chatbot = st.session_state.chatbot
+            chatbot.use_corpus = st.toggle(
+                "📘 Use reference library",
+                value=chatbot.use_corpus,
+                key="use_corpus",
+                help="Ground answers in the preloaded NCERT/JEE books as well as your uploads",
+            )
+            corpus = chatbot.active_corpus()
+            if corpus is not None:
+                st.caption(f"{corpus.name} · {len(corpus.files)} books · {corpus.manifest['pages']} pages")
+            elif chatbot.use_corpus:
+                st.caption("⚠️ The reference library is unavailable right now.")
         
         st.markdown("---")
         st.markdown("### 🔧 Quick Actions")
         
         if st.button("🗑️ Clear Chat History"):
             st.session_state.messages = []
-            st.session_state.chatbot.conversation_history = []
+            st.session_state.history_has_earlier = False
+            st.session_state.chatbot.clear_history()
+            if st.session_state.get("session_user"):
+                get_session_store().clear_messages(st.session_state.session_user)
             st.success("Chat history cleared!")
             st.rerun()
         
+        if st.session_state.get("batch_export"):
+            st.download_button(
+                "📥 Download Batch Solutions",
+                data=st.session_state.batch_export,
+                file_name="chat_jee_solutions.md",
+                mime="text/markdown",
+            )
+        
         if st.button("📄 Clear PDF Materials"):
-            st.session_state.chatbot.pdf_content = ""
+            st.session_state.chatbot.clear_materials()
+            save_session(st.session_state.chatbot)
             st.session_state.pdf_uploaded = False
             st.success("PDF materials cleared!")
             st.rerun()
@@ -907,26 +1051,39 @@ def main():
                     col_a, col_b = st.columns([2, 1])
                     with col_a:
                         if st.button("🚀 Process PDFs", type="primary", use_container_width=True):
-                            with st.spinner("🔄 Processing your study materials..."):
-                                try:
-                                    pdf_content = st.session_state.chatbot.process_pdfs(uploaded_files)
-                                    if pdf_content:
-                                        st.session_state.chatbot.pdf_content = pdf_content
-                                        st.session_state.pdf_uploaded = True
-                                        time.sleep(1)
-                                        st.rerun()
-                                except Exception as e:
-                                    st.error(f"❌ Error processing PDFs: {str(e)}")
+                            try:
+                                # Extraction runs in the background; chat stays usable meanwhile
+                                jobs = st.session_state.chatbot.ingest_in_background(uploaded_files)
+                                if jobs:
+                                    st.session_state.pdf_uploaded = True
+                                    st.session_state.materials_saved = False
+                                    st.rerun()
+                            except Exception as e:
+                                st.error(f"❌ Error processing PDFs: {str(e)}")
                     
                     with col_b:
                         if st.button("🗑️ Clear", use_container_width=True):
-                            st.session_state.chatbot.pdf_content = ""
+                            st.session_state.chatbot.clear_materials()
+                            save_session(st.session_state.chatbot)
                             st.session_state.pdf_uploaded = False
                             st.rerun()
                 
                 if st.session_state.pdf_uploaded:
-                    st.success("✅ Study materials loaded successfully!")
-                    st.info("💡 You can now ask questions about your uploaded materials.")
+                    render_ingestion_status(st.session_state.chatbot)
+                
+                # Batch mode: answer every question found in an uploaded paper at once
+                if st.session_state.chatbot.documents and not st.session_state.get("ingestion_active"):
+                    batch_questions = st.session_state.chatbot.get_batch_questions()
+                    if batch_questions:
+                        st.caption(f"🧮 Found {len(batch_questions)} numbered question(s) in your materials")
+                        if st.button(
+                            f"⚡ Solve all {len(batch_questions)} questions",
+                            disabled=st.session_state.processing,
+                            use_container_width=True,
+                        ):
+                            add_message("user", f"Solve all {len(batch_questions)} questions from my uploaded materials")
+                            st.session_state.batch_pending = True
+                            st.rerun()
         
         # Chat container
         chat_container = st.container()
@@ -946,38 +1103,37 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Display messages
-            for i, message in enumerate(st.session_state.messages):
-                if message["role"] == "user":
-                    st.markdown(f"""
-                    <div class="message user-message">
-                        <div class="message-icon user-icon">👤</div>
-                        <div class="message-content">{message["content"]}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="message bot-message">
-                        <div class="message-icon bot-icon">🎓</div>
-                        <div class="message-content">{message["content"]}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Display messages (cached per block, older history paginated)
+            with metrics.timed(metrics.RENDER_SECONDS, part="history"):
+                render_chat_history(
+                    st.session_state.messages,
+                    load_earlier=load_earlier_messages if st.session_state.get("history_has_earlier") else None,
+                )
             
-            # Show typing indicator when processing
+            # Show typing indicator when processing; streamed text replaces it
+            response_placeholder = st.empty()
             if st.session_state.processing:
-                st.markdown("""
-                <div class="message bot-message">
-                    <div class="message-icon bot-icon">🎓</div>
-                    <div class="typing-indicator">
-                        Chat Jee is thinking
-                        <div class="typing-dots">
-                            <div class="typing-dot"></div>
-                            <div class="typing-dot"></div>
-                            <div class="typing-dot"></div>
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+                response_placeholder.markdown(typing_indicator_html(), unsafe_allow_html=True)
+            
+            # Batch answers are shown in the chat as each one completes
+            if st.session_state.get("batch_pending"):
+                st.session_state.batch_pending = False
+                batch_questions = st.session_state.chatbot.get_batch_questions()
+                batch_progress = st.progress(0.0, text=f"Solving {len(batch_questions)} questions...")
+                
+                def show_batch_result(result, done: int, total: int):
+                    content = f"**{result.question.label}**\n\n_{result.question.text}_\n\n{result.answer}"
+                    add_message("assistant", content)
+                    st.markdown(message_html("assistant", content), unsafe_allow_html=True)
+                    batch_progress.progress(done / total, text=f"Solved {done}/{total} questions")
+                
+                batch_results = BatchSolver().solve(
+                    batch_questions, st.session_state.chatbot.solve_question, show_batch_result
+                )
+                st.session_state.batch_export = export_markdown(batch_results)
+                save_session(st.session_state.chatbot)
+                batch_progress.empty()
+                st.rerun()
         
         # Input area with enhanced styling
        # Replace the entire input section and shortcut buttons section with this corrected version:
@@ -1013,7 +1169,7 @@ def main():
                 st.error("❌ Cannot send message. Please fix the Gemini AI configuration first.")
             else:
                 # Add user message
-                st.session_state.messages.append({"role": "user", "content": user_input})
+                add_message("user", user_input)
                 
                 # Show processing state and rerun to display it
                 st.session_state.processing = True
@@ -1030,9 +1186,28 @@ def main():
                         break
                 
                 if last_user_message:
-                    # Get AI response
-                    response = st.session_state.chatbot.get_response(last_user_message)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                    last_render = 0.0
+                    
+                    def render_partial(partial_text: str):
+                        # Throttle updates so long answers don't flood the websocket
+                        nonlocal last_render
+                        now = time.monotonic()
+                        if now - last_render < STREAM_RENDER_INTERVAL:
+                            return
+                        last_render = now
+                        with metrics.timed(metrics.RENDER_SECONDS, part="stream"):
+                            response_placeholder.markdown(message_html("assistant", partial_text), unsafe_allow_html=True)
+                    
+                    def render_queue_position(position: int):
+                        label = "Chat Jee is up next" if position == 1 else f"Chat Jee is in line (position {position})"
+                        response_placeholder.markdown(typing_indicator_html(label), unsafe_allow_html=True)
+                    
+                    # Get AI response, streaming it into the bot bubble
+                    response = st.session_state.chatbot.get_response(
+                        last_user_message, on_partial=render_partial, on_queue=render_queue_position
+                    )
+                    add_message("assistant", response)
+                    save_session(st.session_state.chatbot)
                 
                 # Clear processing state
                 st.session_state.processing = False
@@ -1049,7 +1224,7 @@ I encountered an unexpected error: `{str(e)}`
 3. Checking your internet connection
 4. Contacting support if the issue persists"""
                 
-                st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                add_message("assistant", error_msg)
                 logger.error(f"Error in response generation: {e}")
                 
                 # Clear processing state
@@ -1091,7 +1266,7 @@ I encountered an unexpected error: `{str(e)}`
                     st.error("❌ AI module not available")
                 else:
                     # Add user message
-                    st.session_state.messages.append({"role": "user", "content": query})
+                    add_message("user", query)
                     
                     # Show processing state
                     st.session_state.processing = True
@@ -1105,7 +1280,7 @@ I encountered an unexpected error: `{str(e)}`
         else:
             st.error("❌ AI Unavailable")
             
-        if st.session_state.chatbot.pdf_content:
+        if st.session_state.chatbot.documents:
             st.info("📚 Materials Loaded")
         else:
             st.warning("📄 No Materials")
@@ -1119,70 +1294,13 @@ I encountered an unexpected error: `{str(e)}`
     </div>
     """, unsafe_allow_html=True)
     
-    # Auto-scroll JavaScript
-    st.markdown("""
-    <script>
-        // Auto-scroll to bottom function
-        function scrollToBottom() {
-            window.scrollTo({
-                top: document.body.scrollHeight,
-                behavior: 'smooth'
-            });
-        }
-        
-        // Scroll to bottom when new messages appear
-        const observer = new MutationObserver(function(mutations) {
-            mutations.forEach(function(mutation) {
-                if (mutation.type === 'childList' && mutation.addedNodes.length > 0) {
-                    // Check if new message was added
-                    const newNodes = Array.from(mutation.addedNodes);
-                    if (newNodes.some(node => node.classList && node.classList.contains('message'))) {
-                        setTimeout(scrollToBottom, 100);
-                    }
-                }
-            });
-        });
-        
-        // Start observing
-        observer.observe(document.body, {
-            childList: true,
-            subtree: true
-        });
-        
-        // Handle keyboard shortcuts
-        document.addEventListener('keydown', function(e) {
-            // Ctrl+Enter to send message
-            if (e.ctrlKey && e.key === 'Enter') {
-                const sendButton = document.querySelector('button[kind="primary"]');
-                if (sendButton && !sendButton.disabled) {
-                    sendButton.click();
-                }
-            }
-            
-            // Escape to clear input
-            if (e.key === 'Escape') {
-                const textarea = document.querySelector('textarea');
-                if (textarea) {
-                    textarea.value = '';
-                    textarea.focus();
-                }
-            }
-        });
-        
-        // Focus on input when page loads
-        window.addEventListener('load', function() {
-            const textarea = document.querySelector('textarea');
-            if (textarea) {
-                textarea.focus();
-            }
-        });
-    </script>
-    """, unsafe_allow_html=True)
+    log_report_once()
     
 
 if __name__ == "__main__":
     try:
-        main()
+        with phase("main"):
+            main()
     except Exception as e:
         logger.error(f"Critical error in main(): {e}")
         st.error(f"""
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Per-session parallelism; the shared admission controller still caps the process
+BATCH_WORKERS = int(os.getenv("CHATJEE_BATCH_WORKERS", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("CHATJEE_BATCH_MAX_QUESTIONS", "100"))
+MAX_QUESTION_CHARS = int(os.getenv("CHATJEE_BATCH_MAX_QUESTION_CHARS", "1500"))
+MIN_QUESTION_CHARS = 15
+
+# "Q1.", "Q.1", "Question 12:", or a bare "12." / "12)" at the start of a line
+_QUESTION_START = re.compile(
+    r"^[ \t]*(?:(?P<prefixed>Q(?:uestion)?[ \t]*\.?[ \t]*(?P<qnum>\d{1,3})[ \t]*[.):-]?)"
+    r"|(?P<num>\d{1,3})[ \t]*[.)])[ \t]+(?=\S)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+@dataclass
+class DetectedQuestion:
+    number: int
+    text: str
+    source: str
+    page: int
+
+    @property
+    def label(self) -> str:
+        return f"Q{self.number} ({self.source} — Page {self.page})"
+
+
+@dataclass
+class BatchResult:
+    question: DetectedQuestion
+    answer: str
+    seconds: float
+
+
+def _detect_in_text(text: str, source: str, page_starts: List[int], page_numbers: List[int]) -> List[DetectedQuestion]:
+    accepted = []
+    last_number = 0
+    for match in _QUESTION_START.finditer(text):
+        number = int(match.group("qnum") or match.group("num"))
+        if match.group("prefixed"):
+            # An explicit "Q" label is trusted unless it goes backwards mid-section
+            ok = number > last_number or number == 1
+        else:
+            # Bare numbers are easily confused with lists inside a question,
+            # so they must continue the sequence (or restart a long section)
+            ok = number == last_number + 1 or (number == 1 and last_number >= 10)
+        if ok:
+            accepted.append((number, match.start(), match.end()))
+            last_number = number
+
+    questions = []
+    for index, (number, start, body_start) in enumerate(accepted):
+        end = accepted[index + 1][1] if index + 1 < len(accepted) else len(text)
+        body = re.sub(r"\s+", " ", text[body_start:end]).strip()
+        if len(body) < MIN_QUESTION_CHARS:
+            continue
+        if len(body) > MAX_QUESTION_CHARS:
+            body = body[:MAX_QUESTION_CHARS].rsplit(" ", 1)[0] + " …"
+        page = page_numbers[bisect_right(page_starts, start) - 1]
+        questions.append(DetectedQuestion(number, body, source, page))
+    return questions
+
+
+def detect_questions(material_files: Iterable[Tuple[str, Iterable[Tuple[int, str]]]],
+                     limit: int = BATCH_MAX_QUESTIONS) -> List[DetectedQuestion]:
+    """Find numbered questions in the extracted pages of each uploaded file.
+
+    material_files yields (file name, [(page number, text), ...]) with pages
+    in order, as DocumentStore.iter_files() does.
+    """
+    questions = []
+    for source, pages in material_files:
+        parts = []
+        page_starts = []
+        page_numbers = []
+        offset = 0
+        for page_num, page_text in pages:
+            page_starts.append(offset)
+            page_numbers.append(page_num)
+            parts.append(page_text)
+            offset += len(page_text) + 1
+        # Questions may run across a page break, so each file is scanned as one text
+        questions.extend(_detect_in_text("\n".join(parts), source, page_starts, page_numbers))
+        if len(questions) >= limit:
+            break
+    return questions[:limit]
+
+
+class BatchSolver:
+    """Answers many questions concurrently with a bounded thread pool"""
+
+    def __init__(self, max_workers: int = BATCH_WORKERS):
+        self.max_workers = max(1, max_workers)
+
+    def solve(self, questions: List[DetectedQuestion], answer_fn: Callable[[str], str],
+              on_result: Optional[Callable[[BatchResult, int, int], None]] = None) -> List[BatchResult]:
+        """Run answer_fn over every question.
+
+        on_result is called on the calling thread as each answer completes,
+        with the result and the done/total counts. Results come back in
+        question order.
+        """
+        results: List[Optional[BatchResult]] = [None] * len(questions)
+        if not questions:
+            return []
+
+        def solve_one(question: DetectedQuestion) -> BatchResult:
+            started = time.perf_counter()
+            answer = answer_fn(question.text)
+            return BatchResult(question, answer, time.perf_counter() - started)
+
+        pool = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(questions)), thread_name_prefix="chatjee-batch"
+        )
+        try:
+            futures = {pool.submit(solve_one, question): index for index, question in enumerate(questions)}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    question = questions[futures[future]]
+                    result = BatchResult(question, f"❌ Could not answer this question: `{e}`", 0.0)
+                results[futures[future]] = result
+                if on_result:
+                    on_result(result, done, len(questions))
+        finally:
+            # If the run is interrupted (e.g. a Streamlit rerun), drop queued questions
+            pool.shutdown(wait=False, cancel_futures=True)
+        return [result for result in results if result is not None]
+
+
+def export_markdown(results: List[BatchResult], title: str = "Chat Jee — Batch Solutions") -> str:
+    """One Markdown document with every question and its answer"""
+    lines = [f"# {title}", "", f"_Generated {datetime.now():%Y-%m-%d %H:%M}_", ""]
+    for result in results:
+        lines.append(f"## {result.question.label}")
+        lines.append("")
+        lines.append(f"> {result.question.text}")
+        lines.append("")
+        lines.append(result.answer.strip())
+        lines.append("")
+    return "\n".join(lines)
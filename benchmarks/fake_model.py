@@ -0,0 +1,46 @@
+"""Local stand-in for the Gemini model so the pipeline can be timed without a network."""
+
+import time
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _TokenCount:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+class FakeModel:
+    """Returns a canned, markdown-heavy answer after an optional fixed delay"""
+
+    def __init__(self, latency: float = 0.0, chunk_chars: int = 80, answer_paragraphs: int = 6):
+        self.latency = latency
+        self.chunk_chars = chunk_chars
+        self.answer_paragraphs = answer_paragraphs
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        question = prompt.rsplit("**Current Student Question:**", 1)[-1].strip().split("\n")[0]
+        paragraphs = [f"**Answer** to: {question}"]
+        for index in range(self.answer_paragraphs):
+            paragraphs.append(
+                f"Step {index + 1}: apply **Newton's second law** so that $F = ma$ and "
+                f"$$a = \\frac{{F}}{{m}}$$ which gives the result.\n\n\n\n"
+            )
+        paragraphs.append("```python\nprint(9.8 * 2)```")
+        return "\n\n".join(paragraphs)
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._answer(str(contents))
+        if not stream:
+            return _Chunk(text)
+        return iter([_Chunk(text[i:i + self.chunk_chars]) for i in range(0, len(text), self.chunk_chars)])
+
+    def count_tokens(self, contents, **kwargs):
+        return _TokenCount(len(str(contents)) // 4)
@@ -0,0 +1,270 @@
+"""Offline benchmarks for Chat Jee's ingestion and prompt pipeline.
+
+Runs EnhancedChatJee against synthetic PDFs and a local fake model, reports
+latency percentiles, throughput and peak traced memory, and compares the
+results with a saved baseline:
+
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+Baselines are machine specific; record one before a change and compare after.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# No quota to protect and no disk cache to warm: measure the pipeline itself
+os.environ.setdefault("CHATJEE_GEMINI_RPM", "1000000000")
+os.environ.setdefault("CHATJEE_GEMINI_BURST", "1000000")
+os.environ.setdefault("CHATJEE_GEMINI_MAX_CONCURRENT", "64")
+os.environ.pop("CHATJEE_PDF_CACHE_DIR", None)
+os.environ.pop("CHATJEE_PROFILE_STARTUP", None)
+
+from fake_model import FakeModel  # noqa: E402
+from synthetic_pdf import SyntheticUpload, make_pdf  # noqa: E402
+
+DEFAULT_TOLERANCE = 0.20
+# Differences smaller than these are timer and allocator noise, not regressions
+MIN_DELTAS = {"p50_ms": 1.0, "peak_kib": 64.0}
+
+
+@dataclass
+class BenchResult:
+    name: str
+    unit: str
+    units_per_run: int
+    timings: List[float] = field(default_factory=list)
+    peak_bytes: int = 0
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self) -> Dict[str, float]:
+        mean = sum(self.timings) / len(self.timings)
+        return {
+            "unit": self.unit,
+            "runs": len(self.timings),
+            "mean_ms": mean * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "throughput_per_s": self.units_per_run / mean if mean else 0.0,
+            "peak_kib": self.peak_bytes / 1024,
+        }
+
+
+def run_case(name: str, fn: Callable[[], None], iterations: int, unit: str, units_per_run: int,
+             setup: Optional[Callable[[], None]] = None, warmup: int = 1) -> BenchResult:
+    result = BenchResult(name, unit, units_per_run)
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        result.timings.append(time.perf_counter() - start)
+    # Memory is traced in a separate run; tracing would distort the timings
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        result.peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    print(f"  {name}: p50 {result.percentile(50) * 1000:.1f} ms", flush=True)
+    return result
+
+
+def load_app(fake_model: FakeModel):
+    """Import app.py without running the UI and point it at the fake model"""
+    logging.disable(logging.WARNING)
+    import app
+
+    app.GEMINI_AVAILABLE = True
+    app.load_gemini_model = lambda model_name=None: fake_model
+    return app
+
+
+def run_all(page_sizes: List[int], iterations: int) -> List[BenchResult]:
+    fake_model = FakeModel()
+    app = load_app(fake_model)
+    from material_library import get_material_library
+    from pdf_cache import get_pdf_cache
+    from response_cache import get_response_cache
+
+    pdf_cache = get_pdf_cache()
+    material_library = get_material_library()
+    results = []
+    uploads = {pages: SyntheticUpload(f"paper_{pages}p.pdf", make_pdf(pages, seed=pages)) for pages in page_sizes}
+
+    print("PDF extraction")
+    chatbot = app.EnhancedChatJee()
+    for pages, upload in uploads.items():
+        results.append(run_case(
+            f"extract_text_from_pdf[{pages}p]", lambda: chatbot.extract_text_from_pdf(upload),
+            iterations, "pages", pages, setup=pdf_cache.clear,
+        ))
+    largest = uploads[max(page_sizes)]
+    results.append(run_case(
+        f"extract_text_from_pdf_cached[{max(page_sizes)}p]", lambda: chatbot.extract_text_from_pdf(largest),
+        iterations, "pages", max(page_sizes),
+    ))
+    all_uploads = list(uploads.values())
+
+    def cold_start():
+        # The previous run's documents sit in the chatbot and the shared library
+        chatbot.clear_materials()
+        material_library.clear()
+        pdf_cache.clear()
+
+    results.append(run_case(
+        f"process_pdfs[{len(all_uploads)} files]", lambda: chatbot.process_pdfs(all_uploads),
+        iterations, "pages", sum(page_sizes), setup=cold_start,
+    ))
+
+    print("Prompt pipeline")
+    questions = [
+        "Explain the work energy theorem with an example",
+        "Find the acceleration of a block of mass 2 kg on a 30 degree incline",
+        "What is the difference between enthalpy and entropy?",
+        "Solve question 5 from the uploaded paper",
+    ]
+    chatbot.process_pdfs(all_uploads)
+    for turn in range(20):
+        chatbot.conversation_history.append(f"Student: {questions[turn % len(questions)]} (turn {turn})")
+        chatbot.conversation_history.append(f"Chat Jee: {fake_model._answer(questions[turn % len(questions)])}")
+
+    def build_prompts():
+        for question in questions:
+            materials = chatbot.get_relevant_materials(question)
+            chatbot.prompt_builder.build(
+                question, materials=materials,
+                history=chatbot.conversation_history, summary=chatbot.history_summary,
+            )
+
+    results.append(run_case("prompt_build", build_prompts, iterations * 5, "prompts", len(questions)))
+
+    raw_answers = [fake_model._answer(f"**Current Student Question:** {q}") * 3 for q in questions] * 25
+
+    def format_answers():
+        for answer in raw_answers:
+            chatbot.clean_and_format_response(answer)
+
+    results.append(run_case("clean_and_format_response", format_answers, iterations * 5, "responses", len(raw_answers)))
+
+    print("End-to-end turns (fake model)")
+    turn_counter = [0]
+
+    def chat_turn(stream: bool):
+        def run():
+            # A new question each time so the response cache never answers
+            turn_counter[0] += 1
+            question = f"{questions[turn_counter[0] % len(questions)]} (variant {turn_counter[0]})"
+            chatbot.get_response(question, on_partial=(lambda text: None) if stream else None)
+        return run
+
+    get_response_cache().clear()
+    results.append(run_case("get_response", chat_turn(False), iterations * 5, "turns", 1))
+    results.append(run_case("get_response_streaming", chat_turn(True), iterations * 5, "turns", 1))
+
+    from pdf_extraction import get_pdf_extractor
+    get_pdf_extractor().shutdown()
+    return results
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Names of benchmarks whose p50 latency or memory peak grew beyond tolerance"""
+    regressions = []
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for key, min_delta in MIN_DELTAS.items():
+            grew = stats[key] - base[key]
+            if base[key] > 0 and stats[key] > base[key] * (1 + tolerance) and grew > min_delta:
+                regressions.append(f"{name} {key}: {base[key]:.1f} -> {stats[key]:.1f}")
+    return regressions
+
+
+def print_table(current: Dict[str, dict], baseline: Optional[Dict[str, dict]]) -> None:
+    header = f"{'benchmark':<40} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'throughput':>16} {'peak KiB':>10}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print()
+    print(header)
+    print("-" * len(header))
+    for name, stats in current.items():
+        line = (f"{name:<40} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                f"{stats['throughput_per_s']:>10.1f} {stats['unit'] + '/s':<5} {stats['peak_kib']:>10.0f}")
+        if baseline and name in baseline and baseline[name]["p50_ms"]:
+            line += f" {stats['p50_ms'] / baseline[name]['p50_ms'] - 1:>+7.0%}"
+        print(line)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="5,50,200", help="comma-separated synthetic PDF page counts")
+    parser.add_argument("--iterations", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--quick", action="store_true", help="small PDFs and few runs, for a smoke check")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="write these results as a baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a regression is reported")
+    args = parser.parse_args(argv)
+    # A mistyped baseline path must not pass as "no regressions"; only a run
+    # that records a baseline may start without one
+    if args.baseline and not os.path.exists(args.baseline) and not args.save_baseline:
+        parser.error(f"baseline {args.baseline} not found (record one with --save-baseline)")
+
+    page_sizes = [5, 20] if args.quick else [int(p) for p in args.pages.split(",")]
+    iterations = 2 if args.quick else args.iterations
+
+    results = run_all(page_sizes, iterations)
+    current = {result.name: result.summary() for result in results}
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_table(current, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": current,
+            }, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if baseline:
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
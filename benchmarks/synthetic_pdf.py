@@ -0,0 +1,76 @@
+"""Minimal PDF writer for benchmark inputs, so no PDF library is needed to make them."""
+
+import random
+from typing import List
+
+_WORDS = (
+    "force mass acceleration velocity momentum energy work power torque angular "
+    "integral derivative limit function matrix determinant vector probability "
+    "equilibrium enthalpy entropy reaction oxidation reduction molarity isomer "
+    "electron orbital bond lattice charge field current resistance capacitor"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_page_text(page_num: int, lines: int = 40, seed: int = 0) -> List[str]:
+    """Text lines for one page of a fake JEE paper, with numbered questions"""
+    rng = random.Random(seed * 100003 + page_num)
+    result = [f"JEE Practice Paper - Page {page_num + 1}"]
+    question = page_num * 4 + 1
+    for line in range(lines - 1):
+        words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 14)))
+        if line % 10 == 0:
+            result.append(f"{question}. Find the {words} if x = {rng.randint(2, 99)} m/s.")
+            question += 1
+        else:
+            result.append(words.capitalize() + ".")
+    return result
+
+
+def make_pdf(page_count: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """A valid PDF with page_count pages of extractable Helvetica text"""
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page + content stream per page
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page_num in range(page_count):
+        page_id = 4 + 2 * page_num
+        kids.append(f"{page_id} 0 R")
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td"]
+        for text_line in synthetic_page_text(page_num, lines_per_page, seed):
+            commands.append(f"({_escape(text_line)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>".encode()
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return out
+
+
+class SyntheticUpload:
+    """Stands in for Streamlit's UploadedFile (name, size, getvalue)"""
+
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.size = len(data)
+        self._data = data
+
+    def getvalue(self) -> bytes:
+        return self._data
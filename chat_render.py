@@ -0,0 +1,86 @@
+import os
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+# Messages are emitted in fixed blocks so finished blocks stay byte-identical
+# between reruns; Streamlit's forward-message cache then sends them to the
+# browser as a hash reference instead of re-sending the HTML.
+MESSAGE_BLOCK_SIZE = int(os.getenv("CHATJEE_MESSAGE_BLOCK_SIZE", "10"))
+# Messages shown before older history is folded behind a "show earlier" button
+HISTORY_PAGE_SIZE = int(os.getenv("CHATJEE_HISTORY_PAGE_SIZE", "30"))
+
+
+def message_html(role: str, content: str) -> str:
+    """Chat bubble HTML for one message"""
+    if role == "user":
+        return f"""
+<div class="message user-message">
+    <div class="message-icon user-icon">👤</div>
+    <div class="message-content">{content}</div>
+</div>
+"""
+    return f"""
+<div class="message bot-message">
+    <div class="message-icon bot-icon">🎓</div>
+    <div class="message-content">{content}</div>
+</div>
+"""
+
+
+def typing_indicator_html(label: str = "Chat Jee is thinking") -> str:
+    """Bot bubble with the animated typing dots"""
+    return f"""
+<div class="message bot-message">
+    <div class="message-icon bot-icon">🎓</div>
+    <div class="typing-indicator">
+        {label}
+        <div class="typing-dots">
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+        </div>
+    </div>
+</div>
+"""
+
+
+@lru_cache(maxsize=1024)
+def render_block_html(block: Tuple[Tuple[str, str], ...]) -> str:
+    return "\n".join(message_html(role, content) for role, content in block)
+
+
+def visible_start(message_count: int, visible_count: int) -> int:
+    """First message index to show, aligned to a block boundary"""
+    start = max(0, message_count - visible_count)
+    return start - start % MESSAGE_BLOCK_SIZE
+
+
+def render_chat_history(messages: List[Dict[str, str]],
+                        load_earlier: Optional[Callable[[], None]] = None) -> None:
+    """Render the visible window of the conversation as cached HTML blocks.
+
+    load_earlier, when given, fetches older messages than those in memory;
+    it is offered once every loaded message is already visible.
+    """
+    if "history_visible" not in st.session_state:
+        st.session_state.history_visible = HISTORY_PAGE_SIZE
+
+    start = visible_start(len(messages), st.session_state.history_visible)
+    if start > 0:
+        if st.button(f"⬆️ Show earlier messages ({start} hidden)", key="show_earlier_messages"):
+            st.session_state.history_visible += HISTORY_PAGE_SIZE
+            st.rerun()
+    elif load_earlier is not None:
+        if st.button("⬆️ Load earlier messages", key="load_earlier_messages"):
+            load_earlier()
+            st.session_state.history_visible += HISTORY_PAGE_SIZE
+            st.rerun()
+
+    for block_start in range(start, len(messages), MESSAGE_BLOCK_SIZE):
+        block = tuple(
+            (message["role"], message["content"])
+            for message in messages[block_start:block_start + MESSAGE_BLOCK_SIZE]
+        )
+        st.markdown(render_block_html(block), unsafe_allow_html=True)
@@ -0,0 +1,263 @@
+"""Prebuilt reference corpus: NCERT / JEE books indexed once, shared by every session.
+
+Build an artifact from a directory of PDFs, then point the app at it:
+
+    python corpus.py build ./reference_pdfs ./corpus --name "NCERT 11-12"
+    python corpus.py info ./corpus
+    CHATJEE_CORPUS_PATH=./corpus streamlit run app.py
+
+The artifact is a directory holding the page text (a DocumentStore file),
+the BM25 index as flat .npy arrays and a manifest.json written last. At
+runtime both are memory-mapped, so the books cost page cache rather than
+heap and every worker process shares the same pages. Rebuilding replaces
+the directory in one rename and keeps the old one as <dir>.previous.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Callable, List, Optional
+
+from document_store import DocumentStore
+from pdf_cache import hash_pdf_bytes
+
+logger = logging.getLogger(__name__)
+
+# Directory written by "python corpus.py build"; unset means no corpus
+CORPUS_PATH = os.getenv("CHATJEE_CORPUS_PATH")
+# Whether new sessions start with answers grounded in the corpus
+CORPUS_DEFAULT_ON = os.getenv("CHATJEE_CORPUS_DEFAULT", "1") != "0"
+
+# Bumped whenever the artifact layout changes; older artifacts must be rebuilt
+CORPUS_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+PAGES_FILE = "pages.cjdocs"
+
+
+def find_pdfs(source_dir: str) -> List[str]:
+    """PDF files under source_dir, in a stable order"""
+    paths = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+    return paths
+
+
+def corpus_version(files: List[dict]) -> str:
+    """Content hash of the inputs and chunking settings; equal inputs give equal versions"""
+    from retrieval import DEFAULT_CHUNK_CHARS, DEFAULT_CHUNK_OVERLAP
+
+    digest = hashlib.sha256(f"{CORPUS_FORMAT}:{DEFAULT_CHUNK_CHARS}:{DEFAULT_CHUNK_OVERLAP}".encode("ascii"))
+    for entry in sorted(files, key=lambda entry: entry["name"]):
+        digest.update(f"\0{entry['name']}\0{entry['sha256']}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_corpus(source_dir: str, output_dir: str, name: Optional[str] = None,
+                 progress: Callable[[str], None] = print) -> dict:
+    """Extract, chunk and index every PDF under source_dir into output_dir; returns the manifest"""
+    from pdf_extraction import get_pdf_extractor
+    from retrieval import BM25Index, DEFAULT_CHUNK_CHARS, DEFAULT_CHUNK_OVERLAP
+
+    pdf_paths = find_pdfs(source_dir)
+    if not pdf_paths:
+        raise ValueError(f"No PDF files found under {source_dir}")
+
+    started = time.perf_counter()
+    store = DocumentStore()
+    files = []
+    extractor = get_pdf_extractor()
+    try:
+        for number, path in enumerate(pdf_paths, start=1):
+            # Sources are named by their path inside the corpus, e.g. "physics/keph101.pdf"
+            source = os.path.relpath(path, source_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            try:
+                page_texts = extractor.extract(pdf_bytes) or []
+            except Exception as e:
+                logger.error(f"Could not extract {source}: {e}")
+                page_texts = []
+            pages = [(page_num + 1, text) for page_num, text in enumerate(page_texts) if text.strip()]
+            if not pages:
+                progress(f"[{number}/{len(pdf_paths)}] {source}: no extractable text, skipped")
+                continue
+            store.add_pages(source, pages)
+            files.append({
+                "name": source,
+                "sha256": hash_pdf_bytes(pdf_bytes),
+                "pages": len(page_texts),
+                "text_pages": len(pages),
+            })
+            progress(f"[{number}/{len(pdf_paths)}] {source}: {len(pages)} pages")
+    finally:
+        extractor.shutdown()
+    if not files:
+        raise ValueError(f"None of the PDFs under {source_dir} contain extractable text")
+
+    output_dir = os.path.abspath(output_dir)
+    staging_dir = f"{output_dir}.building-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    try:
+        pages_path = os.path.join(staging_dir, PAGES_FILE)
+        store.save(pages_path)
+        # Index the saved store so chunk records are numbered as they are on disk
+        saved_store = DocumentStore.open_mmap(pages_path)
+        try:
+            index = BM25Index.from_store(saved_store)
+            index.save(staging_dir)
+            chunk_count = len(index)
+            del index
+        finally:
+            saved_store.close()
+
+        manifest = {
+            "format": CORPUS_FORMAT,
+            "version": corpus_version(files),
+            "name": name or os.path.basename(os.path.normpath(source_dir)),
+            "built_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "chunk_chars": DEFAULT_CHUNK_CHARS,
+            "chunk_overlap": DEFAULT_CHUNK_OVERLAP,
+            "pages": sum(entry["text_pages"] for entry in files),
+            "chunks": chunk_count,
+            "files": files,
+        }
+        # Written last: a directory without a manifest is never opened
+        with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(output_dir):
+            # Servers that already mapped the old files keep reading them safely
+            previous_dir = f"{output_dir}.previous"
+            shutil.rmtree(previous_dir, ignore_errors=True)
+            os.replace(output_dir, previous_dir)
+        os.replace(staging_dir, output_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    progress(f"Built corpus {manifest['version']}: {len(files)} files, {manifest['pages']} pages, "
+             f"{chunk_count} chunks in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != CORPUS_FORMAT:
+        raise ValueError(
+            f"{path} has corpus format {manifest.get('format')}, expected {CORPUS_FORMAT}; "
+            f"rebuild it with python corpus.py build"
+        )
+    return manifest
+
+
+class Corpus:
+    """A built corpus opened read-only, with page text and postings memory-mapped"""
+
+    def __init__(self, path: str, manifest: dict, store: DocumentStore, index):
+        self.path = path
+        self.manifest = manifest
+        self.store = store
+        self.index = index
+
+    @classmethod
+    def open(cls, path: str) -> "Corpus":
+        # Deferred so NumPy is only imported when a corpus is configured
+        from retrieval import BM25Index
+
+        manifest = read_manifest(path)
+        store = DocumentStore.open_mmap(os.path.join(path, PAGES_FILE))
+        try:
+            index = BM25Index.load(path, store)
+        except Exception:
+            store.close()
+            raise
+        return cls(path, manifest, store, index)
+
+    @property
+    def name(self) -> str:
+        return self.manifest["name"]
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    @property
+    def files(self) -> List[dict]:
+        return self.manifest["files"]
+
+    def search(self, query: str, top_k: int = 5) -> list:
+        return self.index.search(query, top_k=top_k)
+
+
+_corpus = None
+_corpus_opened = False
+_corpus_lock = threading.Lock()
+_preload_started = False
+
+
+def get_corpus() -> Optional[Corpus]:
+    """The corpus at CHATJEE_CORPUS_PATH, opened once per process; None if unset or unreadable"""
+    global _corpus, _corpus_opened
+    if not _corpus_opened:
+        with _corpus_lock:
+            if not _corpus_opened:
+                if CORPUS_PATH:
+                    started = time.perf_counter()
+                    try:
+                        _corpus = Corpus.open(CORPUS_PATH)
+                        logger.info(
+                            f"Opened corpus {_corpus.name} ({_corpus.version}): {len(_corpus.files)} files, "
+                            f"{_corpus.manifest['chunks']} chunks in {(time.perf_counter() - started) * 1000:.0f} ms"
+                        )
+                    except Exception as e:
+                        logger.error(f"Could not open corpus at {CORPUS_PATH}: {e}")
+                _corpus_opened = True
+    return _corpus
+
+
+def preload_corpus() -> None:
+    """Open the corpus on a background thread so the first grounded question does not wait"""
+    global _preload_started
+    if CORPUS_PATH and not _preload_started:
+        _preload_started = True
+        threading.Thread(target=get_corpus, name="chatjee-corpus", daemon=True).start()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index a directory of PDFs into a corpus directory")
+    build.add_argument("source_dir", help="directory searched recursively for PDF files")
+    build.add_argument("output_dir", help="corpus directory to create or replace")
+    build.add_argument("--name", help="display name (defaults to the source directory name)")
+    info = commands.add_parser("info", help="describe a built corpus")
+    info.add_argument("path", help="corpus directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        if args.command == "build":
+            build_corpus(args.source_dir, args.output_dir, name=args.name)
+        else:
+            manifest = read_manifest(args.path)
+            print(f"{manifest['name']} (version {manifest['version']}, built {manifest['built_at']})")
+            print(f"{len(manifest['files'])} files, {manifest['pages']} pages, {manifest['chunks']} chunks")
+            for entry in manifest["files"]:
+                print(f"  {entry['name']}: {entry['text_pages']}/{entry['pages']} pages")
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set to a file path to keep logins across restarts and share them between workers
+CREDENTIAL_DB_PATH = os.getenv("CHATJEE_CREDENTIAL_DB")
+# How long a browser login handle stays usable without being seen; every use
+# pushes the expiry back by this much
+LOGIN_TTL_SECONDS = int(os.getenv("CHATJEE_LOGIN_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+class CredentialStore:
+    """Per-user OAuth credentials held in memory.
+
+    Credentials are keyed by user identity (the Google account email). Browser
+    sessions find their user through an opaque login handle, so no session ever
+    reads another user's token.
+    """
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+        self._credentials: Dict[str, str] = {}
+        self._logins: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+
+    # Storage primitives, overridden by persistent backends
+
+    def _load(self, user_key: str) -> Optional[str]:
+        with self._lock:
+            return self._credentials.get(user_key)
+
+    def _store(self, user_key: str, token_json: str) -> None:
+        with self._lock:
+            self._credentials[user_key] = token_json
+
+    def _remove(self, user_key: str) -> None:
+        with self._lock:
+            self._credentials.pop(user_key, None)
+
+    def _load_login(self, handle: str) -> Optional[tuple]:
+        with self._lock:
+            return self._logins.get(handle)
+
+    def _store_login(self, handle: str, user_key: str, expires_at: float) -> None:
+        with self._lock:
+            self._logins[handle] = (user_key, expires_at)
+
+    def _remove_login(self, handle: str) -> None:
+        with self._lock:
+            self._logins.pop(handle, None)
+
+    def _prune_logins(self, now: float) -> None:
+        with self._lock:
+            for handle in [handle for handle, (_, expires_at) in self._logins.items() if expires_at < now]:
+                del self._logins[handle]
+
+    # Public API
+
+    def get(self, user_key: str):
+        """Stored google.oauth2 Credentials for user_key, or None"""
+        from google.oauth2.credentials import Credentials
+
+        token_json = self._load(user_key)
+        if not token_json:
+            return None
+        try:
+            return Credentials.from_authorized_user_info(json.loads(token_json), self.scopes)
+        except ValueError as e:
+            logger.warning(f"Dropping unreadable credentials for {user_key}: {e}")
+            self._remove(user_key)
+            return None
+
+    def save(self, user_key: str, creds) -> None:
+        self._store(user_key, creds.to_json())
+
+    def delete(self, user_key: str) -> None:
+        self._remove(user_key)
+
+    def get_valid(self, user_key: str):
+        """Credentials for user_key, refreshed if expired.
+
+        Refreshes are serialized per user and re-checked under the lock, so
+        concurrent sessions of one user trigger a single token refresh.
+        """
+        creds = self.get(user_key)
+        if creds is None or creds.valid:
+            return creds
+
+        with self._user_lock(user_key):
+            creds = self.get(user_key)
+            if creds is None or creds.valid:
+                return creds
+            if not (creds.expired and creds.refresh_token):
+                self.delete(user_key)
+                return None
+            from google.auth.transport.requests import Request
+
+            try:
+                creds.refresh(Request())
+            except Exception as e:
+                logger.warning(f"Token refresh failed for {user_key}: {e}")
+                self.delete(user_key)
+                return None
+            self.save(user_key, creds)
+            return creds
+
+    def create_login(self, user_key: str) -> str:
+        now = time.time()
+        # New logins are rare enough to sweep expired ones as they come in
+        self._prune_logins(now)
+        handle = secrets.token_urlsafe(32)
+        self._store_login(handle, user_key, now + LOGIN_TTL_SECONDS)
+        return handle
+
+    def resolve_login(self, handle: str) -> Optional[str]:
+        """User key for a live login handle, renewing its expiry"""
+        login = self._load_login(handle)
+        if login is None:
+            return None
+        user_key, expires_at = login
+        now = time.time()
+        if expires_at < now:
+            self._remove_login(handle)
+            return None
+        self._store_login(handle, user_key, now + LOGIN_TTL_SECONDS)
+        return user_key
+
+    def revoke_login(self, handle: str) -> None:
+        self._remove_login(handle)
+
+    def _user_lock(self, user_key: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_key, threading.Lock())
+
+
+class SqliteCredentialStore(CredentialStore):
+    """Credential store persisted in SQLite (WAL mode) for multi-worker deployments"""
+
+    def __init__(self, scopes, path: str):
+        super().__init__(scopes)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS credentials ("
+            "user_key TEXT PRIMARY KEY, token_json TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS logins ("
+            "handle TEXT PRIMARY KEY, user_key TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _load(self, user_key: str) -> Optional[str]:
+        row = self._execute("SELECT token_json FROM credentials WHERE user_key = ?", (user_key,))
+        return row[0] if row else None
+
+    def _store(self, user_key: str, token_json: str) -> None:
+        self._execute(
+            "INSERT INTO credentials (user_key, token_json, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_key) DO UPDATE SET token_json = excluded.token_json, "
+            "updated_at = excluded.updated_at",
+            (user_key, token_json, time.time()),
+        )
+
+    def _remove(self, user_key: str) -> None:
+        self._execute("DELETE FROM credentials WHERE user_key = ?", (user_key,))
+
+    def _load_login(self, handle: str) -> Optional[tuple]:
+        return self._execute("SELECT user_key, expires_at FROM logins WHERE handle = ?", (handle,))
+
+    def _store_login(self, handle: str, user_key: str, expires_at: float) -> None:
+        self._execute("INSERT OR REPLACE INTO logins (handle, user_key, expires_at) VALUES (?, ?, ?)",
+                      (handle, user_key, expires_at))
+
+    def _remove_login(self, handle: str) -> None:
+        self._execute("DELETE FROM logins WHERE handle = ?", (handle,))
+
+    def _prune_logins(self, now: float) -> None:
+        self._execute("DELETE FROM logins WHERE expires_at < ?", (now,))
+
+
+_credential_store = None
+_credential_store_lock = threading.Lock()
+
+
+def get_credential_store(scopes) -> CredentialStore:
+    """Process-wide store; SQLite-backed when CHATJEE_CREDENTIAL_DB is set"""
+    global _credential_store
+    if _credential_store is None:
+        with _credential_store_lock:
+            if _credential_store is None:
+                if CREDENTIAL_DB_PATH:
+                    _credential_store = SqliteCredentialStore(scopes, CREDENTIAL_DB_PATH)
+                else:
+                    _credential_store = CredentialStore(scopes)
+    return _credential_store
@@ -0,0 +1,235 @@
+import bisect
+import hashlib
+import itertools
+import json
+import mmap
+import struct
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FILE_MAGIC = b"CJDOCS01"
+# header JSON length, page count, text buffer length
+_FILE_HEADER = struct.Struct("<QQQ")
+
+_versions = itertools.count(1)
+
+
+class PageRecord:
+    """Where one page's text lives in the store buffer"""
+    __slots__ = ("source", "page", "start", "end")
+
+    def __init__(self, source: str, page: int, start: int, end: int):
+        self.source = source
+        self.page = page
+        self.start = start
+        self.end = end
+
+
+class DocumentStore:
+    """Page texts of the uploaded PDFs packed into one UTF-8 buffer.
+
+    Each page is a (source, page, start, end) record into the buffer, so a
+    session holds one compact byte string instead of per-page strings plus a
+    concatenated copy. Pages are read through memoryview slices; only
+    page_text() decodes. A saved store can be reopened memory-mapped, in
+    which case the text stays in the page cache instead of the heap.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._records: List[PageRecord] = []
+        # source -> record indices ordered by page number
+        self._sources: Dict[str, List[int]] = {}
+        self._page_index: Dict[Tuple[str, int], int] = {}
+        self._mmap = None
+        self._lock = threading.RLock()
+        self._fingerprint = None
+        self._fingerprint_version = None
+        self.version = next(_versions)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __bool__(self) -> bool:
+        return bool(self._records)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def read_only(self) -> bool:
+        return self._mmap is not None
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return list(self._sources)
+
+    def add_page(self, source: str, page: int, text: str) -> None:
+        """Append one page; a page added again replaces the earlier text"""
+        data = text.encode("utf-8")
+        with self._lock:
+            if self.read_only:
+                raise ValueError("Memory-mapped document stores are read-only")
+            start = len(self._buffer)
+            self._buffer += data
+            record = PageRecord(source, page, start, start + len(data))
+            existing = self._page_index.get((source, page))
+            if existing is not None:
+                self._records[existing] = record
+            else:
+                index = len(self._records)
+                self._records.append(record)
+                self._page_index[(source, page)] = index
+                order = self._sources.setdefault(source, [])
+                if not order or self._records[order[-1]].page < page:
+                    order.append(index)
+                else:
+                    pages = [self._records[i].page for i in order]
+                    order.insert(bisect.bisect(pages, page), index)
+            self.version = next(_versions)
+
+    def add_pages(self, source: str, pages) -> None:
+        """Add (page number, text) pairs for one file"""
+        with self._lock:
+            for page, text in pages:
+                self.add_page(source, page, text)
+
+    def record(self, index: int) -> PageRecord:
+        return self._records[index]
+
+    def page_indices(self, source: Optional[str] = None) -> List[int]:
+        """Record indices in document order: files as added, pages by number"""
+        with self._lock:
+            if source is not None:
+                return list(self._sources.get(source, ()))
+            return [index for order in self._sources.values() for index in order]
+
+    def page_bytes(self, index: int) -> memoryview:
+        """UTF-8 bytes of one page without copying.
+
+        A store that is still growing cannot add pages while the view is
+        alive, so release it (or use it in a with block) promptly.
+        """
+        record = self._records[index]
+        return memoryview(self._buffer)[record.start:record.end]
+
+    def page_text(self, index: int) -> str:
+        record = self._records[index]
+        with self._lock:
+            # Views are released straight away so the buffer can keep growing
+            with memoryview(self._buffer) as view, view[record.start:record.end] as part:
+                return str(part, "utf-8")
+
+    def get_page(self, source: str, page: int) -> Optional[str]:
+        index = self._page_index.get((source, page))
+        return None if index is None else self.page_text(index)
+
+    def iter_pages(self, source: Optional[str] = None) -> Iterator[Tuple[str, int, str]]:
+        """(source, page number, text) in document order"""
+        for index in self.page_indices(source):
+            record = self._records[index]
+            yield record.source, record.page, self.page_text(index)
+
+    def iter_files(self) -> Iterator[Tuple[str, Iterator[Tuple[int, str]]]]:
+        """(source, [(page number, text), ...]) per file"""
+        for source in self.sources():
+            yield source, ((page, text) for _, page, text in self.iter_pages(source))
+
+    def render(self, max_chars: Optional[int] = None) -> str:
+        """The legacy single-string form with file banners and page markers"""
+        parts = []
+        length = 0
+        for source in self.sources():
+            parts.append(f"\n\n{'='*50}\n📄 Content from {source}\n{'='*50}\n")
+            for _, page, text in self.iter_pages(source):
+                parts.append(f"\n--- Page {page} ---\n{text}\n")
+                length += len(parts[-1])
+                if max_chars is not None and length >= max_chars:
+                    return "".join(parts)[:max_chars]
+        return "".join(parts)
+
+    def fingerprint(self) -> str:
+        """SHA-256 over file names and page texts, independent of arrival order"""
+        with self._lock:
+            if self._fingerprint_version != self.version:
+                digest = hashlib.sha256()
+                for source in sorted(self._sources):
+                    digest.update(source.encode("utf-8") + b"\0")
+                    for index in self._sources[source]:
+                        record = self._records[index]
+                        digest.update(b"%d\0" % record.page)
+                        with memoryview(self._buffer) as view, view[record.start:record.end] as part:
+                            digest.update(part)
+                        digest.update(b"\0")
+                self._fingerprint = digest.hexdigest()
+                self._fingerprint_version = self.version
+            return self._fingerprint
+
+    def save(self, path: str) -> None:
+        """Write the live pages, compacted, in a form open_mmap() can map"""
+        with self._lock:
+            sources = self.sources()
+            source_ids = {source: number for number, source in enumerate(sources)}
+            records = array("q")
+            parts = []
+            offset = 0
+            for index in self.page_indices():
+                record = self._records[index]
+                size = record.end - record.start
+                records.extend((source_ids[record.source], record.page, offset, offset + size))
+                parts.append(self._buffer[record.start:record.end])
+                offset += size
+            header = json.dumps({"sources": sources}).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(FILE_MAGIC)
+            f.write(_FILE_HEADER.pack(len(header), len(records) // 4, offset))
+            f.write(header)
+            f.write(records.tobytes())
+            for part in parts:
+                f.write(part)
+
+    @classmethod
+    def open_mmap(cls, path: str) -> "DocumentStore":
+        """Read-only store over a saved file; page text is paged in on demand"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if mapped[:len(FILE_MAGIC)] != FILE_MAGIC:
+                raise ValueError(f"{path} is not a document store file")
+            position = len(FILE_MAGIC)
+            header_len, page_count, buffer_len = _FILE_HEADER.unpack_from(mapped, position)
+            position += _FILE_HEADER.size
+            sources = json.loads(mapped[position:position + header_len].decode("utf-8"))["sources"]
+            position += header_len
+            records = array("q")
+            records.frombytes(mapped[position:position + page_count * 32])
+            position += page_count * 32
+            if position + buffer_len > len(mapped):
+                raise ValueError(f"{path} is truncated")
+        except Exception:
+            mapped.close()
+            raise
+
+        store = cls()
+        store._mmap = mapped
+        store._buffer = memoryview(mapped)[position:position + buffer_len]
+        for number in range(page_count):
+            source_id, page, start, end = records[number * 4:number * 4 + 4]
+            source = sources[source_id]
+            store._page_index[(source, page)] = number
+            store._sources.setdefault(source, []).append(number)
+            store._records.append(PageRecord(source, page, start, end))
+        return store
+
+    def close(self) -> None:
+        """Release a memory-mapped file; the store must not be used afterwards"""
+        if self._mmap is not None:
+            self._buffer.release()
+            self._mmap.close()
+            self._mmap = None
+            self._buffer = bytearray()
+            self._records = []
+            self._sources = {}
+            self._page_index = {}
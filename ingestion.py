@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from pdf_cache import get_pdf_cache, hash_pdf_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INGEST_WORKERS = int(os.getenv("CHATJEE_INGEST_WORKERS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Receives (file name, [(1-based page number, text), ...]) as pages are ready
+PagesReadyCallback = Callable[[str, List[Tuple[int, str]]], None]
+
+
+class IngestionJob:
+    """Status of one uploaded PDF moving through background extraction"""
+
+    def __init__(self, file_name: str, content_hash: str = ""):
+        self.job_id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.content_hash = content_hash
+        self.status = QUEUED
+        self.pages_done = 0
+        self.pages_total = 0
+        self.text_pages = 0
+        self.error = None
+        self.from_cache = False
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @classmethod
+    def already_done(cls, file_name: str, content_hash: str, text_pages: int) -> "IngestionJob":
+        """A finished job for a file whose pages were available without extraction"""
+        job = cls(file_name, content_hash)
+        job.status = DONE
+        job.from_cache = True
+        job.pages_total = job.pages_done = job.text_pages = text_pages
+        job.finished_at = job.submitted_at
+        return job
+
+    @property
+    def finished(self) -> bool:
+        """True once the job succeeded or failed and its on_done callback has run"""
+        return self.finished_at is not None
+
+    @property
+    def progress(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return self.pages_done / self.pages_total if self.pages_total else 0.0
+
+
+class IngestionQueue:
+    """Background worker pool that extracts uploaded PDFs off the script thread.
+
+    Extraction results are handed to a per-job callback batch by batch so a
+    session can start using early pages while the rest are still parsing.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_INGEST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="chatjee-ingest")
+
+    def submit(self, file_name: str, pdf_bytes: bytes, on_pages: PagesReadyCallback,
+               on_done: Optional[Callable[[IngestionJob], None]] = None,
+               content_hash: Optional[str] = None) -> IngestionJob:
+        """Queue one PDF; on_done is called with the job once it has finished or failed"""
+        job = IngestionJob(file_name, content_hash or hash_pdf_bytes(pdf_bytes))
+        self._executor.submit(self._run, job, pdf_bytes, on_pages, on_done)
+        return job
+
+    def _run(self, job: IngestionJob, pdf_bytes: bytes, on_pages: PagesReadyCallback,
+             on_done: Optional[Callable[[IngestionJob], None]] = None) -> None:
+        job.status = RUNNING
+        try:
+            # Deferred so PyPDF2 is only imported once someone uploads a file
+            from pdf_extraction import get_pdf_extractor
+
+            pdf_cache = get_pdf_cache()
+            content_hash = job.content_hash
+            page_texts = pdf_cache.get(content_hash)
+
+            if page_texts is not None:
+                job.from_cache = True
+                job.pages_total = job.pages_done = len(page_texts)
+                self._deliver(job, on_pages, list(enumerate(page_texts)))
+            else:
+                def report_progress(done_pages: int, total_pages: int):
+                    job.pages_done = done_pages
+                    job.pages_total = total_pages
+
+                def report_pages(_doc_index: int, page_results: List[Tuple[int, str]]):
+                    self._deliver(job, on_pages, page_results)
+
+                page_texts = get_pdf_extractor().extract(pdf_bytes, report_progress, report_pages)
+                if page_texts is None:
+                    raise ValueError("PDF appears to be empty or corrupted")
+                pdf_cache.put(content_hash, page_texts)
+
+            if not job.text_pages:
+                raise ValueError("No text could be extracted. It might be image-based")
+            job.status = DONE
+        except Exception as e:
+            logger.error(f"Ingestion of {job.file_name} failed: {e}")
+            job.error = str(e)
+            job.status = FAILED
+        # Only now is the job finished: pollers that see it finished can rely on
+        # whatever on_done did, e.g. publishing the document to the library
+        try:
+            if on_done is not None:
+                on_done(job)
+        except Exception as e:
+            logger.error(f"Completion callback for {job.file_name} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    @staticmethod
+    def _deliver(job: IngestionJob, on_pages: PagesReadyCallback,
+                 page_results: List[Tuple[int, str]]) -> None:
+        pages = [(page_num + 1, text) for page_num, text in page_results if text.strip()]
+        if pages:
+            job.text_pages += len(pages)
+            on_pages(job.file_name, pages)
+
+
+_ingestion_queue = None
+_ingestion_queue_lock = threading.Lock()
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Process-wide queue so all sessions share one set of ingestion workers"""
+    global _ingestion_queue
+    if _ingestion_queue is None:
+        with _ingestion_queue_lock:
+            if _ingestion_queue is None:
+                _ingestion_queue = IngestionQueue()
+    return _ingestion_queue
+
+
+def summarize_jobs(jobs: List[IngestionJob]) -> Optional[str]:
+    """One-line status for a set of jobs, or None when there are none"""
+    if not jobs:
+        return None
+    done = sum(1 for job in jobs if job.status == DONE)
+    failed = sum(1 for job in jobs if job.status == FAILED)
+    active = len(jobs) - done - failed
+    parts = [f"{done}/{len(jobs)} ready"]
+    if active:
+        parts.append(f"{active} in progress")
+    if failed:
+        parts.append(f"{failed} failed")
+    return ", ".join(parts)
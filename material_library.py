@@ -0,0 +1,362 @@
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from document_store import DocumentStore
+
+logger = logging.getLogger(__name__)
+
+# Documents nobody references any more are kept this long, most recent first,
+# so a popular module uploaded again later is ready instantly
+DEFAULT_IDLE_DOCUMENTS = int(os.getenv("CHATJEE_LIBRARY_IDLE_DOCUMENTS", "200"))
+DEFAULT_IDLE_MB = int(os.getenv("CHATJEE_LIBRARY_IDLE_MB", "256"))
+
+
+class LibraryDocument:
+    """One processed PDF: its page text and search index.
+
+    Once published to the library the document is complete and shared by
+    every session that uploaded the same bytes; until then it belongs to
+    the session ingesting it.
+    """
+
+    def __init__(self, content_hash: str):
+        self.content_hash = content_hash
+        self.store = DocumentStore()
+        self.index = None
+        # While ingesting, one small index per batch of pages; the complete
+        # document gets a single index instead
+        self._batch_indexes = []
+        self.refs = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    @property
+    def nbytes(self) -> int:
+        indexes = [self.index] if self.index is not None else self._batch_indexes
+        return self.store.nbytes + sum(index.nbytes for index in indexes)
+
+    def add_pages(self, pages, final: bool = False) -> None:
+        """Add (page number, text) pairs and index just those pages.
+
+        With final set these are the document's last pages, and the whole
+        document is indexed once instead.
+        """
+        # Deferred so NumPy is only imported once someone uploads a file
+        from retrieval import BM25Index
+
+        with self._lock:
+            first = len(self.store)
+            self.store.add_pages(self.content_hash, pages)
+            if final:
+                self._build_index()
+            elif len(self.store) > first:
+                self._batch_indexes.append(BM25Index.from_store(self.store, range(first, len(self.store))))
+
+    def build_index(self) -> None:
+        """Replace the per-batch indexes with one over the complete document"""
+        with self._lock:
+            if self.index is None:
+                self._build_index()
+
+    def _build_index(self) -> None:
+        from retrieval import BM25Index
+
+        self.index = BM25Index.from_store(self.store)
+        self._batch_indexes = []
+
+    def search_terms(self, terms, top_k: int = 5) -> list:
+        """Best (chunk, score) pairs; batches still being ingested are scored
+        with their own term statistics"""
+        with self._lock:
+            indexes = [self.index] if self.index is not None else list(self._batch_indexes)
+        hits = [hit for index in indexes for hit in index.search_terms(terms, top_k=top_k)]
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:top_k]
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        for _, page, text in self.store.iter_pages():
+            yield page, text
+
+
+class MaterialLibrary:
+    """Processed documents shared across sessions, keyed by PDF content hash.
+
+    Sessions hold counted references. Referenced documents are never
+    evicted; unreferenced ones go to an idle LRU bounded by count and size.
+    """
+
+    def __init__(self, max_idle_documents: int = DEFAULT_IDLE_DOCUMENTS,
+                 max_idle_mb: int = DEFAULT_IDLE_MB):
+        self.max_idle_documents = max_idle_documents
+        self.max_idle_bytes = max_idle_mb * 1024 * 1024
+        self._documents = {}
+        self._idle: "OrderedDict[str, LibraryDocument]" = OrderedDict()
+        self._idle_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.evictions = 0
+
+    def acquire(self, content_hash: str) -> Optional[LibraryDocument]:
+        """A reference to the published document for content_hash, or None"""
+        with self._lock:
+            document = self._documents.get(content_hash)
+            if document is None:
+                return None
+            self._take(document)
+            self.hits += 1
+            return document
+
+    def publish(self, document: LibraryDocument) -> LibraryDocument:
+        """Share a fully ingested document and take a reference to it.
+
+        If another session published the same PDF first, that copy is
+        returned instead and the caller should drop its own.
+        """
+        with self._lock:
+            existing = self._documents.get(document.content_hash)
+            if existing is not None:
+                self._take(existing)
+                return existing
+            document.refs = 1
+            self._documents[document.content_hash] = document
+            return document
+
+    def release(self, document: LibraryDocument) -> None:
+        with self._lock:
+            if self._documents.get(document.content_hash) is not document or document.refs <= 0:
+                return
+            document.refs -= 1
+            if document.refs == 0:
+                self._idle[document.content_hash] = document
+                self._idle_bytes += document.nbytes
+                self._evict()
+
+    def _take(self, document: LibraryDocument) -> None:
+        if document.refs == 0 and self._idle.pop(document.content_hash, None) is not None:
+            self._idle_bytes -= document.nbytes
+        document.refs += 1
+
+    def _evict(self) -> None:
+        while self._idle and (len(self._idle) > self.max_idle_documents
+                              or self._idle_bytes > self.max_idle_bytes):
+            content_hash, document = self._idle.popitem(last=False)
+            self._idle_bytes -= document.nbytes
+            del self._documents[content_hash]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Forget idle documents; referenced ones stay with their sessions"""
+        with self._lock:
+            for content_hash in self._idle:
+                del self._documents[content_hash]
+            self._idle.clear()
+            self._idle_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            documents = list(self._documents.values())
+            idle = len(self._idle)
+        return {
+            "documents": len(documents),
+            "referenced": len(documents) - idle,
+            "references": sum(document.refs for document in documents),
+            "bytes": sum(document.nbytes for document in documents),
+            # Memory the same documents would take with one copy per session
+            "bytes_saved": sum(document.nbytes * max(0, document.refs - 1) for document in documents),
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+class NamedChunk:
+    """A shared document's chunk seen under one student's file name"""
+    __slots__ = ("name", "chunk")
+
+    def __init__(self, name: str, chunk):
+        self.name = name
+        self.chunk = chunk
+
+    @property
+    def source(self) -> str:
+        return self.name
+
+    @property
+    def page(self) -> int:
+        return self.chunk.page
+
+    @property
+    def text(self) -> str:
+        return self.chunk.text
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} — Page {self.page}"
+
+
+def _release_all(library: MaterialLibrary, documents: List[LibraryDocument]) -> None:
+    for document in documents:
+        library.release(document)
+    documents.clear()
+
+
+class MaterialSet:
+    """The documents one session has loaded, under the student's own file names.
+
+    Files still being ingested are private to the session; publish() hands
+    them to the shared library once complete. References are released by
+    release(), or when the session object is garbage collected.
+    """
+
+    def __init__(self, library: Optional["MaterialLibrary"] = None):
+        self._library = library or get_material_library()
+        self._entries: "OrderedDict[str, LibraryDocument]" = OrderedDict()
+        self._shared: List[LibraryDocument] = []
+        self._lock = threading.RLock()
+        self._finalizer = weakref.finalize(self, _release_all, self._library, self._shared)
+
+    def __bool__(self) -> bool:
+        with self._lock:
+            return any(len(document) for document in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def version(self) -> tuple:
+        """Changes whenever a file is added, replaced or receives pages"""
+        with self._lock:
+            return tuple((name, id(document), document.store.version) for name, document in self._entries.items())
+
+    def attach_shared(self, name: str, content_hash: str) -> Optional[LibraryDocument]:
+        """Use the library's copy of a PDF if there is one"""
+        document = self._library.acquire(content_hash)
+        if document is not None:
+            self._set(name, document, shared=True)
+        return document
+
+    def add_pending_pages(self, name: str, content_hash: str, pages) -> None:
+        """Pages of a file this session is still ingesting"""
+        with self._lock:
+            document = self._entries.get(name)
+            if document is None or document.content_hash != content_hash or document in self._shared:
+                document = LibraryDocument(content_hash)
+                self._set(name, document, shared=False)
+        document.add_pages(pages)
+
+    def publish(self, name: str) -> None:
+        """Hand a fully ingested file to the library, switching to the shared copy if one exists"""
+        with self._lock:
+            document = self._entries.get(name)
+            if document is None or document in self._shared or not len(document):
+                return
+            document.build_index()
+            self._set(name, self._library.publish(document), shared=True)
+
+    def add_complete(self, name: str, content_hash: str, pages) -> LibraryDocument:
+        """A file whose pages are all known up front, shared straight away"""
+        document = self.attach_shared(name, content_hash)
+        if document is None:
+            document = LibraryDocument(content_hash)
+            document.add_pages(pages, final=True)
+            if len(document):
+                self._set(name, self._library.publish(document), shared=True)
+        return document
+
+    def _set(self, name: str, document: LibraryDocument, shared: bool) -> None:
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous is not None and previous in self._shared:
+                self._shared.remove(previous)
+                self._library.release(previous)
+            self._entries[name] = document
+            if shared:
+                self._shared.append(document)
+
+    def release(self) -> None:
+        """Drop every file and give shared documents back to the library"""
+        with self._lock:
+            self._entries.clear()
+            _release_all(self._library, self._shared)
+
+    def refs(self) -> List[Tuple[str, str]]:
+        """(file name, content hash) of the files shared through the library"""
+        with self._lock:
+            return [(name, document.content_hash) for name, document in self._entries.items()
+                    if document in self._shared]
+
+    def names(self) -> List[str]:
+        """File names in the order they were uploaded"""
+        with self._lock:
+            return list(self._entries)
+
+    def page_count(self, name: str) -> int:
+        document = self._entries.get(name)
+        return len(document) if document is not None else 0
+
+    def iter_files(self) -> Iterator[Tuple[str, Iterable[Tuple[int, str]]]]:
+        """(file name, [(page number, text), ...]) per file"""
+        with self._lock:
+            entries = list(self._entries.items())
+        for name, document in entries:
+            yield name, document.iter_pages()
+
+    def render(self, max_chars: Optional[int] = None) -> str:
+        """The legacy single-string form with file banners and page markers"""
+        parts = []
+        length = 0
+        for name, pages in self.iter_files():
+            parts.append(f"\n\n{'='*50}\n📄 Content from {name}\n{'='*50}\n")
+            for page, text in pages:
+                parts.append(f"\n--- Page {page} ---\n{text}\n")
+                length += len(parts[-1])
+                if max_chars is not None and length >= max_chars:
+                    return "".join(parts)[:max_chars]
+        return "".join(parts)
+
+    def fingerprint(self) -> str:
+        """Hash of the loaded content; sessions with the same PDFs share it whatever the file names"""
+        with self._lock:
+            documents = list(self._entries.values())
+        digest = hashlib.sha256()
+        for fingerprint in sorted(document.store.fingerprint() for document in documents):
+            digest.update(fingerprint.encode("ascii"))
+        return digest.hexdigest()
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[NamedChunk, float]]:
+        """Best chunks across every file, labelled with this student's file names.
+
+        Each document keeps its own index, so scores use per-document term
+        statistics; that is close enough to rank a handful of files.
+        """
+        from retrieval import tokenize
+
+        with self._lock:
+            entries = list(self._entries.items())
+        terms = set(tokenize(query))
+        hits = []
+        for name, document in entries:
+            hits.extend((score, name, chunk) for chunk, score in document.search_terms(terms, top_k=top_k))
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [(NamedChunk(name, chunk), score) for score, name, chunk in hits[:top_k]]
+
+
+_material_library = None
+_material_library_lock = threading.Lock()
+
+
+def get_material_library() -> MaterialLibrary:
+    """Process-wide library shared by every Streamlit session"""
+    global _material_library
+    if _material_library is None:
+        with _material_library_lock:
+            if _material_library is None:
+                _material_library = MaterialLibrary()
+    return _material_library
@@ -0,0 +1,190 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Set CHATJEE_METRICS_PORT to serve Prometheus text at http://host:port/metrics
+METRICS_PORT = int(os.getenv("CHATJEE_METRICS_PORT", "0") or 0)
+# Recent observations kept per series for percentile estimates
+RESERVOIR_SIZE = int(os.getenv("CHATJEE_METRICS_RESERVOIR", "2048"))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram that also keeps recent samples for percentiles"""
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [bucket counts..., +Inf count], sum, samples
+        self._series: Dict[Labels, dict] = {}
+
+    def _get_series(self, labels: Labels) -> dict:
+        series = self._series.get(labels)
+        if series is None:
+            series = {
+                "counts": [0] * (len(self.buckets) + 1),
+                "sum": 0.0,
+                "samples": deque(maxlen=RESERVOIR_SIZE),
+            }
+            self._series[labels] = series
+        return series
+
+    def observe(self, value: float, count: int = 1, **labels) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(key)
+            series["counts"][index] += count
+            series["sum"] += value * count
+            series["samples"].extend([value] * min(count, RESERVOIR_SIZE))
+
+    def summary(self) -> List[dict]:
+        """Count, mean and p50/p90/p99 of recent samples for each label set"""
+        rows = []
+        with self._lock:
+            items = [(labels, sum(s["counts"]), s["sum"], sorted(s["samples"])) for labels, s in self._series.items()]
+        for labels, count, total, samples in items:
+            row = {"metric": self.name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "count": count,
+                   "mean": total / count if count else 0.0}
+            for pct in (50, 90, 99):
+                row[f"p{pct}"] = samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+            rows.append(row)
+        return rows
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(s["counts"]), s["sum"]) for labels, s in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class MetricsRegistry:
+    """Named histograms plus gauges read from other components at export time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[Labels, float]]]] = {}
+
+    def histogram(self, name: str, help_text: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help_text, buckets)
+            return self._histograms[name]
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], Dict[Labels, float]]) -> None:
+        """read() returns {labels: value}; exceptions are logged and the gauge skipped"""
+        with self._lock:
+            self._gauges[name] = (help_text, read)
+
+    def summary(self) -> List[dict]:
+        with self._lock:
+            histograms = list(self._histograms.values())
+        return [row for histogram in histograms for row in histogram.summary()]
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            histograms = list(self._histograms.values())
+            gauges = list(self._gauges.items())
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        for name, (help_text, read) in gauges:
+            try:
+                values = read()
+            except Exception as e:
+                logger.warning(f"Metrics gauge {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in values.items())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Hot-path spans of one chat turn
+PDF_PAGE_SECONDS = registry.histogram("chatjee_pdf_page_extract_seconds", "PyPDF2 text extraction time per page")
+PROMPT_BUILD_SECONDS = registry.histogram("chatjee_prompt_build_seconds", "Retrieval and prompt assembly time")
+PROMPT_TOKENS = registry.histogram("chatjee_prompt_tokens", "Estimated prompt size in tokens", TOKEN_BUCKETS)
+MODEL_FIRST_TOKEN_SECONDS = registry.histogram("chatjee_model_first_token_seconds", "Time until the model's first text")
+MODEL_TOTAL_SECONDS = registry.histogram("chatjee_model_total_seconds", "Total model call time")
+POSTPROCESS_SECONDS = registry.histogram("chatjee_postprocess_seconds", "Response clean-up and formatting time")
+RENDER_SECONDS = registry.histogram("chatjee_render_seconds", "Streamlit rendering time")
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    """Observe the wall-clock duration of the with-block"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the app log
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> bool:
+    """Serve /metrics on a daemon thread once per process; no-op when port is 0"""
+    global _server
+    if not port:
+        return False
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on port {port}: {e}")
+            return False
+        threading.Thread(target=_server.serve_forever, name="chatjee-metrics", daemon=True).start()
+        logger.info(f"Metrics available at http://0.0.0.0:{port}/metrics")
+        return True
@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from prompt_builder import estimate_tokens
+
+# Set CHATJEE_MODEL_ROUTING=0 to send everything to the pro model
+ROUTING_ENABLED = os.getenv("CHATJEE_MODEL_ROUTING", "1").lower() not in ("0", "false", "no")
+PRO_MODEL_NAME = os.getenv("CHATJEE_MODEL", "models/gemini-1.5-pro")
+FAST_MODEL_NAME = os.getenv("CHATJEE_FAST_MODEL", "models/gemini-1.5-flash")
+# Questions scoring at least this many difficulty points go to the pro model
+PRO_SCORE_THRESHOLD = int(os.getenv("CHATJEE_PRO_SCORE_THRESHOLD", "2"))
+
+# USD per 1K tokens (input, output); override to match the current price list
+ROUTE_PRICES = {
+    "fast": (
+        float(os.getenv("CHATJEE_FAST_INPUT_COST_PER_1K", "0.000075")),
+        float(os.getenv("CHATJEE_FAST_OUTPUT_COST_PER_1K", "0.0003")),
+    ),
+    "pro": (
+        float(os.getenv("CHATJEE_PRO_INPUT_COST_PER_1K", "0.00125")),
+        float(os.getenv("CHATJEE_PRO_OUTPUT_COST_PER_1K", "0.005")),
+    ),
+}
+
+_HARD_WORDS = re.compile(
+    r"\b(solve|derive|derivation|prove|proof|calculate|compute|evaluate|integrate|integral|"
+    r"differentiate|derivative|find the|how many|how much|numerical|step[- ]by[- ]step|"
+    r"show that|determine|equilibrium constant|maximum|minimum)\b",
+    re.IGNORECASE,
+)
+_EASY_WORDS = re.compile(
+    r"\b(tips?|strateg(y|ies)|plan|schedule|motivat\w*|syllabus|books?|resources|"
+    r"what is|define|definition|meaning|list|difference between|hello|hi|thanks?)\b",
+    re.IGNORECASE,
+)
+# Questions that point at the uploaded material rather than general knowledge
+_MATERIAL_WORDS = re.compile(
+    r"\b(pdf|uploaded|document|my notes|this paper|question\s*\d+|q\.?\s*\d+|page\s*\d+)\b",
+    re.IGNORECASE,
+)
+_EQUATION = re.compile(r"\d\s*[-+*/^=]\s*[\d(a-z]|[a-z]\s*[\^=]\s*\d|\\(frac|int|sqrt|sum)|[∫√∑πθ∆Δ±≤≥]", re.IGNORECASE)
+_UNITS = re.compile(r"\b\d+(\.\d+)?\s*(m/s|km|kg|g|m|cm|mm|s|ms|n|j|kj|w|v|a|mol|k|°c|l|ml|atm|pa|hz|ohm|Ω)\b", re.IGNORECASE)
+_NUMBER = re.compile(r"\d+(\.\d+)?")
+_YEAR = re.compile(r"^(19|20)\d\d$")
+
+
+@dataclass
+class Route:
+    name: str
+    model_name: str
+    score: int
+    reasons: List[str]
+
+
+def score_question(question: str, has_materials: bool = False) -> Tuple[int, List[str]]:
+    """Difficulty points from local heuristics, with the reasons behind them"""
+    score = 0
+    reasons = []
+    words = question.split()
+
+    if len(words) > 40:
+        score += 2
+        reasons.append("long question")
+    elif len(words) > 20:
+        score += 1
+        reasons.append("medium length")
+
+    if _EQUATION.search(question):
+        score += 2
+        reasons.append("equation")
+    if _UNITS.search(question):
+        score += 2
+        reasons.append("numeric quantities")
+    # Years ("JEE Main 2023") are not quantities to compute with
+    if len([m for m in _NUMBER.finditer(question) if not _YEAR.match(m.group())]) >= 2:
+        score += 1
+        reasons.append("several numbers")
+
+    hard = _HARD_WORDS.search(question)
+    if hard:
+        score += 2
+        reasons.append("problem solving")
+    if _MATERIAL_WORDS.search(question):
+        # Grounding an answer in a specific uploaded question needs the stronger model
+        score += 2
+        reasons.append("refers to uploaded material")
+    elif has_materials and len(words) > 8:
+        score += 1
+        reasons.append("may need uploaded material")
+    if _EASY_WORDS.search(question) and not hard:
+        score -= 1
+        reasons.append("conceptual")
+
+    return score, reasons
+
+
+class RouteStats:
+    """Per-route request, latency, token and cost counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = {}
+
+    def record(self, route: str, seconds: float, prompt_tokens: int, reply_tokens: int,
+               failed: bool = False) -> None:
+        input_price, output_price = ROUTE_PRICES.get(route, (0.0, 0.0))
+        cost = prompt_tokens / 1000 * input_price + reply_tokens / 1000 * output_price
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                "requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0,
+                "prompt_tokens": 0, "reply_tokens": 0, "cost_usd": 0.0,
+            })
+            stats["requests"] += 1
+            stats["errors"] += int(failed)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["reply_tokens"] += reply_tokens
+            stats["cost_usd"] += cost
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for route, stats in self._routes.items():
+                result[route] = dict(stats)
+                result[route]["avg_seconds"] = stats["total_seconds"] / stats["requests"] if stats["requests"] else 0.0
+            return result
+
+
+class ModelRouter:
+    """Chooses the fast or pro Gemini model for each question"""
+
+    def __init__(self, fast_model: str = FAST_MODEL_NAME, pro_model: str = PRO_MODEL_NAME,
+                 enabled: bool = ROUTING_ENABLED, threshold: int = PRO_SCORE_THRESHOLD):
+        self.fast_model = fast_model
+        self.pro_model = pro_model
+        self.enabled = enabled
+        self.threshold = threshold
+        self.stats = RouteStats()
+
+    def route(self, question: str, has_materials: bool = False) -> Route:
+        score, reasons = score_question(question, has_materials)
+        if not self.enabled:
+            return Route("pro", self.pro_model, score, reasons + ["routing disabled"])
+        if score >= self.threshold:
+            return Route("pro", self.pro_model, score, reasons)
+        return Route("fast", self.fast_model, score, reasons)
+
+    def record(self, route: Route, seconds: float, prompt: str, reply: str, failed: bool = False) -> None:
+        self.stats.record(route.name, seconds, estimate_tokens(prompt), estimate_tokens(reply), failed)
+
+
+_model_router = None
+_model_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    global _model_router
+    if _model_router is None:
+        with _model_router_lock:
+            if _model_router is None:
+                _model_router = ModelRouter()
+    return _model_router
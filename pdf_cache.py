@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Defaults can be overridden per deployment through environment variables
+DEFAULT_MAX_ENTRIES = int(os.getenv("CHATJEE_PDF_CACHE_ENTRIES", "64"))
+DEFAULT_MAX_MB = int(os.getenv("CHATJEE_PDF_CACHE_MB", "256"))
+DEFAULT_CACHE_DIR = os.getenv("CHATJEE_PDF_CACHE_DIR")
+DEFAULT_MAX_DISK_FILES = int(os.getenv("CHATJEE_PDF_CACHE_DISK_FILES", "1000"))
+
+
+def hash_pdf_bytes(data: bytes) -> str:
+    """SHA-256 of the raw uploaded bytes, used as the cache key"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _pages_size(pages: List[str]) -> int:
+    return sum(len(page) for page in pages)
+
+
+class PdfTextCache:
+    """Per-page extracted PDF text keyed by content hash, shared across sessions.
+
+    Entries live in an in-memory LRU bounded by total text size. When a cache
+    directory is configured, entries are also written to disk so they survive
+    restarts and can be shared between worker processes.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_mb: int = DEFAULT_MAX_MB,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 max_disk_files: int = DEFAULT_MAX_DISK_FILES):
+        self._memory = LRUCache(max_entries=max_entries, max_bytes=max_mb * 1024 * 1024,
+                                sizeof=_pages_size)
+        self.cache_dir = cache_dir
+        self.max_disk_files = max_disk_files
+        self._disk_lock = threading.Lock()
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"PDF disk cache disabled, cannot create {self.cache_dir}: {e}")
+                self.cache_dir = None
+
+    def get(self, content_hash: str) -> Optional[List[str]]:
+        pages = self._memory.get(content_hash)
+        if pages is not None:
+            return pages
+
+        pages = self._read_disk(content_hash)
+        if pages is not None:
+            self._memory.put(content_hash, pages)
+        return pages
+
+    def put(self, content_hash: str, pages: List[str]) -> None:
+        self._memory.put(content_hash, pages)
+        self._write_disk(content_hash, pages)
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._memory),
+            "bytes": self._memory.total_bytes,
+            "hits": self._memory.hits,
+            "misses": self._memory.misses,
+        }
+
+    def _disk_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _read_disk(self, content_hash: str) -> Optional[List[str]]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(content_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+            # Touch the file so disk eviction follows access order too
+            os.utime(path, None)
+            return pages
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable PDF cache entry {content_hash}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, content_hash: str, pages: List[str]) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            # Write to a temp file and rename so readers never see partial JSON
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(pages, f, ensure_ascii=False)
+            os.replace(tmp_path, self._disk_path(content_hash))
+        except OSError as e:
+            logger.warning(f"Could not write PDF cache entry {content_hash}: {e}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        with self._disk_lock:
+            try:
+                entries = [
+                    os.path.join(self.cache_dir, name)
+                    for name in os.listdir(self.cache_dir)
+                    if name.endswith(".json")
+                ]
+                if len(entries) <= self.max_disk_files:
+                    return
+                entries.sort(key=os.path.getmtime)
+                for path in entries[:len(entries) - self.max_disk_files]:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"PDF disk cache eviction failed: {e}")
+
+
+_pdf_cache = None
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> PdfTextCache:
+    """Process-wide cache instance shared by every Streamlit session"""
+    global _pdf_cache
+    if _pdf_cache is None:
+        with _pdf_cache_lock:
+            if _pdf_cache is None:
+                _pdf_cache = PdfTextCache()
+    return _pdf_cache
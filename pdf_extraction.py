@@ -0,0 +1,210 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+from metrics import PDF_PAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("CHATJEE_PDF_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Small documents are cheaper to parse inline than to ship to a worker
+DEFAULT_MIN_PAGES_FOR_POOL = int(os.getenv("CHATJEE_PDF_MIN_POOL_PAGES", "24"))
+DEFAULT_PAGES_PER_TASK = int(os.getenv("CHATJEE_PDF_PAGES_PER_TASK", "16"))
+# "spawn" keeps workers independent of Streamlit's server threads
+POOL_START_METHOD = os.getenv("CHATJEE_PDF_START_METHOD", "spawn")
+
+ProgressCallback = Callable[[int, int], None]
+# Receives (document index, [(page_index, text), ...]) as batches finish
+PagesCallback = Callable[[int, List[Tuple[int, str]]], None]
+
+
+def count_pages(pdf_bytes: bytes) -> int:
+    return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def extract_page_range(pdf_bytes: bytes, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) and return (page_index, text) pairs.
+
+    Runs inside pool workers, so it re-opens the PDF from bytes rather than
+    receiving unpicklable PyPDF2 page objects.
+    """
+    pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+    results = []
+    for page_num in range(start, end):
+        try:
+            page_text = pdf_reader.pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
+            page_text = ""
+        results.append((page_num, page_text))
+    return results
+
+
+def timed_extract_page_range(pdf_bytes: bytes, start: int, end: int) -> Tuple[List[Tuple[int, str]], float]:
+    """extract_page_range plus the seconds it took, measured where the work runs"""
+    started = time.perf_counter()
+    return extract_page_range(pdf_bytes, start, end), time.perf_counter() - started
+
+
+def _record_page_timing(page_results: List[Tuple[int, str]], seconds: float) -> None:
+    if page_results:
+        PDF_PAGE_SECONDS.observe(seconds / len(page_results), count=len(page_results))
+
+
+def split_page_ranges(page_count: int, pages_per_task: int, max_tasks: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, capping the number of tasks so the
+    PDF bytes are not copied to workers more often than needed"""
+    if page_count <= 0:
+        return []
+    task_count = max(1, min(max_tasks, -(-page_count // pages_per_task)))
+    step = -(-page_count // task_count)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+class ParallelPdfExtractor:
+    """Fans PDF pages out across a shared process pool and reassembles them in order"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS,
+                 min_pages_for_pool: int = DEFAULT_MIN_PAGES_FOR_POOL,
+                 pages_per_task: int = DEFAULT_PAGES_PER_TASK):
+        self.max_workers = max_workers
+        self.min_pages_for_pool = min_pages_for_pool
+        self.pages_per_task = pages_per_task
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def extract_many(self, documents: List[bytes],
+                     progress_callback: Optional[ProgressCallback] = None,
+                     pages_callback: Optional[PagesCallback] = None) -> List[Optional[List[str]]]:
+        """Extract per-page text for several PDFs at once.
+
+        Returns one entry per document: the list of page texts in page order,
+        or None when the PDF has no pages. Progress is reported as
+        (pages_done, pages_total) from the calling thread, and pages_callback
+        sees each batch of extracted pages as soon as it is available.
+        """
+        results: List[Optional[List[str]]] = [None] * len(documents)
+        page_counts = []
+        for doc_index, pdf_bytes in enumerate(documents):
+            try:
+                page_count = count_pages(pdf_bytes)
+            except Exception as e:
+                # A corrupt upload should not sink the rest of the batch
+                logger.error(f"Could not open PDF #{doc_index + 1}: {e}")
+                page_count = 0
+            page_counts.append(page_count)
+            if page_count:
+                results[doc_index] = [""] * page_count
+
+        total_pages = sum(page_counts)
+        done_pages = 0
+        pooled = []
+
+        for doc_index, pdf_bytes in enumerate(documents):
+            page_count = page_counts[doc_index]
+            if not page_count:
+                continue
+            if self.max_workers > 1 and page_count >= self.min_pages_for_pool:
+                pooled.append(doc_index)
+                continue
+            page_results, seconds = timed_extract_page_range(pdf_bytes, 0, page_count)
+            self._collect(results, doc_index, page_results, seconds, pages_callback)
+            done_pages += page_count
+            if progress_callback:
+                progress_callback(done_pages, total_pages)
+
+        if pooled:
+            tasks = [
+                (doc_index, start, end)
+                for doc_index in pooled
+                for start, end in split_page_ranges(page_counts[doc_index], self.pages_per_task,
+                                                    self.max_workers * 2)
+            ]
+            try:
+                self._extract_pooled(documents, tasks, results, done_pages, total_pages,
+                                     progress_callback, pages_callback)
+            except BrokenProcessPool as e:
+                logger.error(f"PDF worker pool failed, extracting {len(tasks)} remaining range(s) serially: {e}")
+                self._reset_pool()
+                # tasks now holds only the ranges no worker delivered
+                done_pages = total_pages - sum(end - start for _, start, end in tasks)
+                for doc_index, start, end in tasks:
+                    page_results, seconds = timed_extract_page_range(documents[doc_index], start, end)
+                    self._collect(results, doc_index, page_results, seconds, pages_callback)
+                    done_pages += len(page_results)
+                    if progress_callback:
+                        progress_callback(done_pages, total_pages)
+
+        return results
+
+    def extract(self, pdf_bytes: bytes,
+                progress_callback: Optional[ProgressCallback] = None,
+                pages_callback: Optional[PagesCallback] = None) -> Optional[List[str]]:
+        return self.extract_many([pdf_bytes], progress_callback, pages_callback)[0]
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+
+    @staticmethod
+    def _collect(results, doc_index: int, page_results: List[Tuple[int, str]], seconds: float,
+                 pages_callback: Optional[PagesCallback]) -> None:
+        _record_page_timing(page_results, seconds)
+        for page_num, page_text in page_results:
+            results[doc_index][page_num] = page_text
+        if pages_callback:
+            pages_callback(doc_index, page_results)
+
+    def _extract_pooled(self, documents, tasks, results,
+                        done_pages, total_pages, progress_callback, pages_callback) -> None:
+        """Run (doc_index, start, end) tasks on the pool, removing each from tasks once delivered"""
+        pool = self._get_pool()
+        futures = {}
+        for task in tasks:
+            doc_index, start, end = task
+            futures[pool.submit(timed_extract_page_range, documents[doc_index], start, end)] = task
+
+        for future in as_completed(futures):
+            task = futures[future]
+            page_results, seconds = future.result()
+            tasks.remove(task)
+            self._collect(results, task[0], page_results, seconds, pages_callback)
+            done_pages += len(page_results)
+            if progress_callback:
+                progress_callback(done_pages, total_pages)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                )
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_pdf_extractor() -> ParallelPdfExtractor:
+    """Process-wide extractor so every session shares one worker pool"""
+    global _extractor
+    if _extractor is None:
+        with _extractor_lock:
+            if _extractor is None:
+                _extractor = ParallelPdfExtractor()
+    return _extractor
@@ -0,0 +1,203 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("CHATJEE_PROMPT_TOKEN_BUDGET", "6000"))
+# Conversation lines kept verbatim before older ones are folded into the summary
+DEFAULT_HISTORY_KEEP_LINES = int(os.getenv("CHATJEE_HISTORY_KEEP_LINES", "12"))
+DEFAULT_SUMMARY_MAX_TOKENS = int(os.getenv("CHATJEE_SUMMARY_MAX_TOKENS", "400"))
+
+SYSTEM_PREAMBLE = "You are Chat Jee, an expert AI tutor specialized in JEE (Joint Entrance Examination) preparation."
+
+INSTRUCTIONS = """**Instructions:**
+- Provide clear, detailed, and step-by-step explanations
+- Use proper formatting with headings, bullet points, and code blocks where appropriate
+- Include relevant examples and practice problems
+- Be encouraging and supportive
+- If solving numerical problems, show all steps clearly
+- For conceptual questions, provide intuitive explanations
+- Reference JEE syllabus and previous year questions when relevant
+- When you use the study material excerpts, cite them by their [file — Page N] label
+
+**Response Format:**
+- Use markdown formatting for better readability
+- Include emojis to make responses more engaging
+- Structure your response with clear sections
+- Provide additional resources or practice suggestions when helpful
+"""
+
+STUDENT_PREFIX = "Student: "
+BOT_PREFIX = "Chat Jee: "
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English/LaTeX)"""
+    return (len(text) + 3) // 4
+
+
+def model_token_counter(load_model: Callable[[], object]) -> Callable[[str], int]:
+    """Token counter backed by the model's own tokenizer endpoint.
+
+    load_model is only called on first use so building a counter does not
+    import the SDK. Each count is a network round trip, so results are
+    memoized and any failure falls back to the local estimate.
+    """
+    counts = {}
+
+    def count(text: str) -> int:
+        if text not in counts:
+            if len(counts) > 1024:
+                counts.clear()
+            try:
+                counts[text] = load_model().count_tokens(text).total_tokens
+            except Exception as e:
+                logger.warning(f"Model token count failed, using estimate: {e}")
+                return estimate_tokens(text)
+        return counts[text]
+
+    return count
+
+
+@dataclass
+class PromptBudget:
+    """Token allowance for one prompt, split between its sections"""
+    total_tokens: int = DEFAULT_TOKEN_BUDGET
+    materials_share: float = 0.55
+    history_share: float = 0.30
+
+    def split(self, fixed_tokens: int) -> Tuple[int, int]:
+        """Return (materials, history) token allowances after fixed sections"""
+        available = max(0, self.total_tokens - fixed_tokens)
+        shares = self.materials_share + self.history_share
+        materials = int(available * self.materials_share / shares) if shares else 0
+        return materials, available - materials
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    text = re.sub(r"[#*`>_]+", "", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.search(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rsplit(" ", 1)[0] + "…"
+    return sentence
+
+
+def summarize_exchanges(lines: List[str]) -> List[str]:
+    """Fold history lines into one short summary line per exchange.
+
+    Uses a local extractive rule instead of an extra model call: keep the
+    student's question and the opening sentence of the answer.
+    """
+    summary_lines = []
+    question = None
+    for line in lines:
+        if line.startswith(STUDENT_PREFIX):
+            question = _first_sentence(line[len(STUDENT_PREFIX):], 120)
+        elif line.startswith(BOT_PREFIX):
+            answer = _first_sentence(line[len(BOT_PREFIX):], 160)
+            if question:
+                summary_lines.append(f"- Asked: {question} → Covered: {answer}")
+            else:
+                summary_lines.append(f"- Covered: {answer}")
+            question = None
+    if question:
+        summary_lines.append(f"- Asked: {question}")
+    return summary_lines
+
+
+class PromptBuilder:
+    """Assembles the tutor prompt within a token budget"""
+
+    def __init__(self, budget: Optional[PromptBudget] = None,
+                 token_counter: Callable[[str], int] = estimate_tokens,
+                 history_keep_lines: int = DEFAULT_HISTORY_KEEP_LINES,
+                 summary_max_tokens: int = DEFAULT_SUMMARY_MAX_TOKENS):
+        self.budget = budget or PromptBudget()
+        self.count_tokens = token_counter
+        self.history_keep_lines = history_keep_lines
+        self.summary_max_tokens = summary_max_tokens
+
+    def compact_history(self, history: List[str], summary: str) -> Tuple[List[str], str]:
+        """Move the oldest exchanges out of history and into the running summary"""
+        if len(history) <= self.history_keep_lines:
+            return history, summary
+
+        cut = len(history) - self.history_keep_lines
+        # Never split a question from its answer
+        if history[cut].startswith(BOT_PREFIX):
+            cut += 1
+        older, recent = history[:cut], history[cut:]
+
+        summary_lines = summary.splitlines() if summary else []
+        summary_lines.extend(summarize_exchanges(older))
+        # Keep the summary itself bounded: the oldest topics fall off first
+        while summary_lines and self.count_tokens("\n".join(summary_lines)) > self.summary_max_tokens:
+            summary_lines.pop(0)
+        return recent, "\n".join(summary_lines)
+
+    def build(self, question: str, materials: str = "", history: Optional[List[str]] = None,
+              summary: str = "") -> str:
+        history = history or []
+        question_block = f"**Current Student Question:** {question}"
+        fixed_tokens = self.count_tokens(SYSTEM_PREAMBLE + question_block + INSTRUCTIONS)
+        materials_tokens, history_tokens = self.budget.split(fixed_tokens)
+
+        materials = self._fit_materials(materials, materials_tokens)
+        # Unused material allowance goes to the conversation
+        history_tokens += materials_tokens - self.count_tokens(materials)
+        summary, recent = self._fit_history(summary, history, history_tokens)
+
+        sections = [SYSTEM_PREAMBLE]
+        if materials:
+            sections.append("📚 **Relevant Excerpts from Study Materials:**\n" + materials)
+        if summary:
+            sections.append("**Earlier in this session:**\n" + summary)
+        sections.append("**Previous Conversation Context:**\n" + "\n".join(recent))
+        sections.append(question_block)
+        sections.append(INSTRUCTIONS)
+        return "\n\n".join(sections)
+
+    def _fit_materials(self, materials: str, max_tokens: int) -> str:
+        if not materials or self.count_tokens(materials) <= max_tokens:
+            return materials
+        # Retrieved excerpts are separated by blank lines; drop whole excerpts
+        kept = []
+        used = 0
+        for index, excerpt in enumerate(materials.split("\n\n[")):
+            excerpt = "[" + excerpt if index else excerpt
+            cost = self.count_tokens(excerpt)
+            if used + cost > max_tokens:
+                break
+            kept.append(excerpt)
+            used += cost
+        if not kept:
+            return materials[:max_tokens * 4]
+        return "\n\n".join(kept)
+
+    def _fit_history(self, summary: str, history: List[str], max_tokens: int) -> Tuple[str, List[str]]:
+        remaining = max_tokens
+        if summary:
+            summary_tokens = self.count_tokens(summary)
+            if summary_tokens > remaining // 2:
+                summary = ""
+            else:
+                remaining -= summary_tokens
+
+        recent = []
+        # Newest turns are the most useful, so fill from the end
+        for line in reversed(history):
+            cost = self.count_tokens(line)
+            if cost > remaining:
+                if not recent and remaining > 0:
+                    # A long latest answer is still worth its opening
+                    recent.append(line[:remaining * 4] + "…")
+                break
+            recent.append(line)
+            remaining -= cost
+        recent.reverse()
+        return summary, recent
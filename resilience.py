@@ -0,0 +1,294 @@
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+from admission import get_admission_controller
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Error classes, from the exception's type name and status code
+RATE_LIMITED = "rate_limited"
+UNAVAILABLE = "unavailable"
+DEADLINE = "deadline"
+FATAL = "fatal"
+RETRYABLE = (RATE_LIMITED, UNAVAILABLE, DEADLINE)
+
+# google.api_core exception names, matched by name so the SDK stays a lazy import
+_NAME_CLASSES = {
+    "ResourceExhausted": RATE_LIMITED,
+    "TooManyRequests": RATE_LIMITED,
+    "ServiceUnavailable": UNAVAILABLE,
+    "InternalServerError": UNAVAILABLE,
+    "BadGateway": UNAVAILABLE,
+    "GatewayTimeout": DEADLINE,
+    "DeadlineExceeded": DEADLINE,
+    "RetryError": DEADLINE,
+    "ConnectionError": UNAVAILABLE,
+    "ConnectionResetError": UNAVAILABLE,
+    "RemoteDisconnected": UNAVAILABLE,
+    "TimeoutError": DEADLINE,
+    "ReadTimeout": DEADLINE,
+}
+_CODE_CLASSES = {429: RATE_LIMITED, 500: UNAVAILABLE, 502: UNAVAILABLE, 503: UNAVAILABLE, 504: DEADLINE}
+
+
+def classify_error(error: BaseException) -> str:
+    """Map an exception from the model API to one of the error classes above"""
+    for cls in type(error).__mro__:
+        if cls.__name__ in _NAME_CLASSES:
+            return _NAME_CLASSES[cls.__name__]
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in _CODE_CLASSES:
+        return _CODE_CLASSES[code]
+    message = str(error)
+    if "429" in message or "quota" in message.lower():
+        return RATE_LIMITED
+    if "503" in message or "unavailable" in message.lower():
+        return UNAVAILABLE
+    return FATAL
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated transient failures, then probes for recovery"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            # A probe that never reported back (e.g. an abandoned stream) expires
+            probing = self._probe_started is not None and now - self._probe_started < self.reset_timeout
+            if now - self.opened_at < self.reset_timeout or probing:
+                raise CircuitOpenError("The AI service is failing repeatedly; not retrying for now")
+            # Half-open: let a single request through to test the API
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probe_started is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._probe_started = None
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # Total time budget for one call including every retry and backoff
+    deadline_seconds: float = 90.0
+    # Rate-limit errors back off from a larger base delay
+    rate_limit_multiplier: float = 4.0
+    # Backoffs at least this long hand the admission slot to other users meanwhile
+    release_slot_after: float = 1.0
+
+    def backoff(self, attempt: int, error_class: str) -> float:
+        """Full-jitter exponential backoff for the given 0-based attempt"""
+        base = self.base_delay * (self.rate_limit_multiplier if error_class == RATE_LIMITED else 1.0)
+        return random.uniform(0, min(self.max_delay, base * (2 ** attempt)))
+
+
+def _seconds_left(deadline: float) -> float:
+    return max(deadline - time.monotonic(), 0.0)
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="chatjee-hedge")
+    return _hedge_executor
+
+
+class ResilientCaller:
+    """Runs model calls with classified retries, a deadline and a circuit breaker.
+
+    Hedging is off unless hedge_after is set: a duplicate request is then sent
+    when the first has not answered within hedge_after seconds and whichever
+    finishes first wins. Duplicates spend extra quota, so enable with care.
+
+    The deadline bounds each attempt as well as the retry loop: fn gets the
+    seconds left before it, to use as its request timeout.
+
+    Retries and hedges are requests too: with a rate_limiter (the admission
+    controller) each one takes a rate token first, so a failing or slow API
+    never sees more than the configured requests per minute. Given the
+    user_id whose admission slot the call holds, long backoffs give that
+    slot up and queue for it again, so other students are not blocked by
+    a sleeping retry.
+    """
+
+    def __init__(self, policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 hedge_after: Optional[float] = None,
+                 rate_limiter=None):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_after = hedge_after if hedge_after and hedge_after > 0 else None
+        self.rate_limiter = rate_limiter
+        self.retries = 0
+        self.hedges = 0
+
+    def call(self, fn: Callable[[float], T], user_id: Optional[str] = None) -> T:
+        deadline = time.monotonic() + self.policy.deadline_seconds
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                result = self._call_hedged(fn, deadline) if self.hedge_after else fn(_seconds_left(deadline))
+            except Exception as e:
+                attempt = self._handle_failure(e, attempt, deadline, user_id)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def iter_stream(self, open_stream: Callable[[float], Iterable[T]],
+                    user_id: Optional[str] = None) -> Iterator[T]:
+        """Yield chunks from a streaming call, retrying only before the first chunk.
+
+        Once text has reached the caller a retry would repeat it, so later
+        failures are raised as-is.
+        """
+        deadline = time.monotonic() + self.policy.deadline_seconds
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            yielded = False
+            try:
+                for chunk in open_stream(_seconds_left(deadline)):
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                if yielded:
+                    self._record_outcome(e)
+                    raise
+                attempt = self._handle_failure(e, attempt, deadline, user_id)
+                continue
+            self.breaker.record_success()
+            return
+
+    def _handle_failure(self, error: Exception, attempt: int, deadline: float,
+                        user_id: Optional[str]) -> int:
+        """Sleep before the next attempt, or re-raise when retrying is pointless"""
+        error_class = classify_error(error)
+        self._record_outcome(error)
+        if error_class not in RETRYABLE:
+            raise error
+
+        attempt += 1
+        if attempt >= self.policy.max_attempts or self.breaker.state == "open":
+            raise error
+        delay = self.policy.backoff(attempt - 1, error_class)
+        if _seconds_left(deadline) <= delay:
+            raise error
+
+        self.retries += 1
+        logger.warning(f"Model call failed ({error_class}: {error}); retry {attempt} in {delay:.2f}s")
+        if self.rate_limiter is None:
+            time.sleep(delay)
+        elif user_id is not None and delay >= self.policy.release_slot_after:
+            if not self.rate_limiter.pause(user_id, delay, _seconds_left(deadline) - delay):
+                raise error
+        else:
+            time.sleep(delay)
+            if not self.rate_limiter.take_token(_seconds_left(deadline)):
+                raise error
+        return attempt
+
+    def _record_outcome(self, error: Exception) -> None:
+        if classify_error(error) in RETRYABLE:
+            self.breaker.record_failure()
+        else:
+            # The API answered (e.g. a bad request), so it is not degraded
+            self.breaker.record_success()
+
+    def _call_hedged(self, fn: Callable[[float], T], deadline: float) -> T:
+        executor = _get_hedge_executor()
+        pending = {executor.submit(fn, _seconds_left(deadline))}
+        done, pending = wait(pending, timeout=self.hedge_after)
+        # No rate token to spare means no duplicate: keep waiting on the first
+        if not done and (self.rate_limiter is None or self.rate_limiter.take_token()):
+            self.hedges += 1
+            pending.add(executor.submit(fn, _seconds_left(deadline)))
+
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def stats(self) -> dict:
+        return {"retries": self.retries, "hedges": self.hedges, "circuit": self.breaker.state}
+
+
+_resilient_caller = None
+_resilient_caller_lock = threading.Lock()
+
+
+def get_resilient_caller() -> ResilientCaller:
+    """Process-wide caller, so every session shares one circuit breaker"""
+    global _resilient_caller
+    if _resilient_caller is None:
+        with _resilient_caller_lock:
+            if _resilient_caller is None:
+                policy = RetryPolicy(
+                    max_attempts=int(os.getenv("CHATJEE_RETRY_ATTEMPTS", "4")),
+                    base_delay=float(os.getenv("CHATJEE_RETRY_BASE_DELAY", "0.5")),
+                    max_delay=float(os.getenv("CHATJEE_RETRY_MAX_DELAY", "8")),
+                    deadline_seconds=float(os.getenv("CHATJEE_GEMINI_DEADLINE", "90")),
+                    release_slot_after=float(os.getenv("CHATJEE_RETRY_RELEASE_SLOT_AFTER", "1")),
+                )
+                breaker = CircuitBreaker(
+                    failure_threshold=int(os.getenv("CHATJEE_BREAKER_FAILURES", "5")),
+                    reset_timeout=float(os.getenv("CHATJEE_BREAKER_RESET_SECONDS", "30")),
+                )
+                hedge_after = float(os.getenv("CHATJEE_HEDGE_AFTER_SECONDS", "0"))
+                _resilient_caller = ResilientCaller(policy, breaker, hedge_after,
+                                                    rate_limiter=get_admission_controller())
+    return _resilient_caller
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import re
+import threading
+from typing import List, Optional
+
+from caching import LRUCache
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("CHATJEE_RESPONSE_CACHE_ENTRIES", "512"))
+DEFAULT_TTL_SECONDS = float(os.getenv("CHATJEE_RESPONSE_CACHE_TTL", "3600"))
+# How many recent history lines take part in the cache key
+DEFAULT_HISTORY_TURNS = int(os.getenv("CHATJEE_RESPONSE_CACHE_HISTORY", "2"))
+
+NO_MATERIALS = "none"
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, whitespace and trailing punctuation so trivially different
+    spellings of the same question share an entry"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def fingerprint_text(text: str) -> str:
+    if not text:
+        return NO_MATERIALS
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Finished answers keyed by normalized question, materials and recent history"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 history_turns: int = DEFAULT_HISTORY_TURNS):
+        self.history_turns = history_turns
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def make_key(self, question: str, materials_fingerprint: str, history: List[str]) -> str:
+        recent = history[-self.history_turns:] if self.history_turns else []
+        key_source = "\x1f".join([normalize_question(question), materials_fingerprint, *recent])
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def put(self, key: str, answer: str) -> None:
+        self._entries.put(key, answer)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self._entries.hits,
+            "misses": self._entries.misses,
+        }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache instance shared by every Streamlit session"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = ResponseCache()
+    return _response_cache
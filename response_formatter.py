@@ -0,0 +1,281 @@
+import re
+from typing import Dict, List, Tuple
+
+# Everything is compiled once at import. The text is scanned once to split it
+# into prose and fenced code; prose then goes through a few C-level
+# substitutions and code is copied verbatim. Fences are located with str.find and only then
+# checked by a regex anchored at that line, and each substitution is skipped
+# when a substring test shows it has nothing to do.
+_FENCE_LINE = re.compile(r"[ \t]*(`{3,}|~{3,})[ \t]*[\w+#.-]*[ \t]*(?=\n|$)")
+_CLOSING_FENCE = re.compile(r"(`{3,}|~{3,})[ \t]*(?=\n|$)")
+_TRAILING_SPACE = re.compile(r"[ \t]+(?=\n)")
+_BLANK_RUNS = re.compile(r"\n{3,}")
+_LEADING_BLANK_LINES = re.compile(r"^(?:[ \t]*\n)+")
+# \[ \] and \( \) LaTeX delimiters, but not the "\\[2pt]" line-break spacing
+_DISPLAY_DELIMITER = re.compile(r"(?<!\\)\\[\[\]]")
+_INLINE_MATH = re.compile(r"(?<!\\)\\\((.+?)(?<!\\)\\\)")
+_CODE_SPAN = re.compile(r"(`[^`\n]*`)")
+_DISPLAY_MATH = re.compile(r"\$\$.*?\$\$", re.DOTALL)
+_MATH_BLANK_LINES = re.compile(r"\n[ \t]*(?=\n)")
+
+Block = Tuple[str, str, str]  # ("text" | "code" | "open_code", content, fence)
+
+
+def _find_marker(text: str, pos: int, next_at: Dict[str, int]) -> int:
+    """Earliest ``` or ~~~ at or after pos.
+
+    next_at remembers where each marker was last found, so a marker missing
+    from the rest of the text is not searched for again on every block.
+    """
+    best = -1
+    for marker in ("```", "~~~"):
+        index = next_at.get(marker, pos)
+        if 0 <= index < pos:
+            index = text.find(marker, pos)
+            next_at[marker] = index
+        elif marker not in next_at:
+            index = text.find(marker, pos)
+            next_at[marker] = index
+        if index >= 0 and (best < 0 or index < best):
+            best = index
+    return best
+
+
+def _find_opening(text: str, pos: int, next_at: Dict[str, int]):
+    """Next line that is only a fence (plus an optional language tag)"""
+    while True:
+        index = _find_marker(text, pos, next_at)
+        if index < 0:
+            return None
+        line_start = text.rfind("\n", 0, index) + 1
+        if line_start >= pos:
+            opening = _FENCE_LINE.match(text, line_start)
+            if opening and opening.start(1) == index:
+                return opening
+        pos = index + 3
+
+
+def _find_closing(text: str, pos: int, fence: str):
+    """Next fence of the same kind and at least the same length that ends its
+    line, either alone or glued to the last code line ("x = 1```")"""
+    marker = fence[:3]
+    while True:
+        index = text.find(marker, pos)
+        if index < 0:
+            return None
+        line_start = text.rfind("\n", 0, index) + 1
+        closing = _CLOSING_FENCE.match(text, index)
+        if closing and closing.group(1)[0] == fence[0] and len(closing.group(1)) >= len(fence) \
+                and (index == line_start or text[index - 1] != fence[0]):
+            return line_start, closing
+        pos = index + 3
+
+
+def _split_blocks(text: str) -> List[Block]:
+    """Partition text into prose and fenced code blocks in one left-to-right scan"""
+    blocks = []
+    pos = 0
+    length = len(text)
+    next_at: Dict[str, int] = {}
+    while pos < length:
+        opening = _find_opening(text, pos, next_at)
+        if opening is None:
+            blocks.append(("text", text[pos:], ""))
+            break
+        if opening.start() > pos:
+            blocks.append(("text", text[pos:opening.start()], ""))
+        fence = opening.group(1)
+        body_start = opening.end() + 1
+        found = _find_closing(text, body_start, fence) if body_start <= length else None
+        if found is None:
+            blocks.append(("open_code", text[opening.start():], fence))
+            return blocks
+        line_start, closing = found
+        header = text[opening.start():opening.end()].rstrip()
+        body = text[body_start:line_start]
+        last_line = text[line_start:closing.start()].rstrip()
+        if last_line.strip():
+            # Put a glued closing fence on its own line
+            body += last_line + "\n"
+        blocks.append(("code", f"{header}\n{body}{closing.group(1)}", fence))
+        pos = closing.end()
+    return blocks
+
+
+def _convert_delimiters(text: str) -> str:
+    if "\\[" in text or "\\]" in text:
+        text = _DISPLAY_DELIMITER.sub("$$", text)
+    if "\\(" in text:
+        text = _INLINE_MATH.sub(r"$\1$", text)
+    return text
+
+
+def _convert_math(text: str) -> str:
+    """Rewrite LaTeX delimiters to the $ / $$ form Streamlit's markdown renders"""
+    if "`" not in text:
+        return _convert_delimiters(text)
+    # Leave inline code spans untouched
+    parts = _CODE_SPAN.split(text)
+    for index in range(0, len(parts), 2):
+        parts[index] = _convert_delimiters(parts[index])
+    return "".join(parts)
+
+
+def _drop_math_blank_lines(match) -> str:
+    block = match.group()
+    return _MATH_BLANK_LINES.sub("", block) if "\n" in block else block
+
+
+def _format_text(text: str) -> str:
+    if " \n" in text or "\t\n" in text:
+        text = _TRAILING_SPACE.sub("", text)
+    if "\\" in text:
+        text = _convert_math(text)
+    if "$$" in text and "\n" in text:
+        # Blank lines inside display math break KaTeX rendering
+        text = _DISPLAY_MATH.sub(_drop_math_blank_lines, text)
+    if "\n\n\n" in text:
+        text = _BLANK_RUNS.sub("\n\n", text)
+    return text
+
+
+def _format_parts(text: str) -> Tuple[List[str], str, bool, int]:
+    """Formatted blocks, the fence of a code block left open at the end ("" if
+    none), whether it ends inside display math, and where the open code block
+    starts in text (-1 if none).
+
+    $$ pairs never span a code block, so only the last prose block can leave
+    display math open.
+    """
+    parts = []
+    open_fence = ""
+    open_math = False
+    open_at = -1
+    for kind, content, fence in _split_blocks(text):
+        open_math = False
+        if kind == "text":
+            content = _format_text(content)
+            open_math = content.count("$$") % 2 == 1
+        elif kind == "open_code":
+            open_fence = fence
+            open_at = len(text) - len(content)
+            content = content.rstrip("\n")
+        parts.append(content)
+    return parts, open_fence, open_math, open_at
+
+
+def _format(text: str) -> Tuple[str, str, bool]:
+    parts, open_fence, open_math, _ = _format_parts(text)
+    return "".join(parts), open_fence, open_math
+
+
+def _close_code(formatted: str, open_fence: str) -> str:
+    return f"{formatted.rstrip()}\n{open_fence}" if open_fence else formatted
+
+
+def format_response(text: str) -> str:
+    """Format a complete answer: trim whitespace, collapse blank lines, tidy code and math"""
+    formatted, open_fence, _ = _format(text.replace("\r\n", "\n"))
+    return _close_code(formatted, open_fence).strip()
+
+
+class ResponseFormatter:
+    """Incremental formatter for streamed answers.
+
+    Text is committed a paragraph at a time: once a blank line is seen outside
+    code and math, everything before it is formatted for good and never
+    scanned again. A cut is only made where format_response() would also
+    treat the blank line as a paragraph break, so the final result equals
+    format_response() of the whole answer however it was chunked.
+
+    An open code block has no cut until it closes, so the text before it is
+    formatted once when it opens and new chunks are only searched for the
+    closing fence. Inside open display math the paragraph is still
+    re-formatted on each preview; such blocks are short.
+    """
+
+    def __init__(self):
+        self._done_text = ""
+        self._tail = ""
+        self._held_cr = ""
+        self._search_from = 0
+        # While the tail ends in an unclosed code block: its fence, where its
+        # opening line starts, the formatted tail before it, and the line to
+        # resume looking for the closing fence from
+        self._code_fence = ""
+        self._code_at = 0
+        self._code_prefix = ""
+        self._code_scan = 0
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        # A trailing \r may be the first half of a \r\n split across chunks
+        chunk = self._held_cr + chunk
+        self._held_cr = "\r" if chunk.endswith("\r") else ""
+        self._tail += chunk[:len(chunk) - len(self._held_cr)].replace("\r\n", "\n")
+        while True:
+            if self._code_fence and not self._code_closed():
+                return
+            boundary = self._tail.rfind("\n\n", self._search_from)
+            if boundary <= 0:
+                return
+            parts, open_fence, open_math, open_at = _format_parts(self._tail[:boundary])
+            if open_fence:
+                # No cut inside a code block; wait for its closing fence
+                self._open_code(parts, open_fence, open_at)
+                continue
+            if open_math:
+                # Nor inside display math
+                self._search_from = boundary + 1
+                return
+            piece = _LEADING_BLANK_LINES.sub("", "".join(parts)).rstrip(" \t\n")
+            if piece:
+                self._done_text = f"{self._done_text}\n\n{piece}" if self._done_text else piece
+            self._tail = self._tail[boundary:]
+            self._search_from = 0
+            return
+
+    def _open_code(self, parts: List[str], fence: str, open_at: int) -> None:
+        self._code_fence = fence
+        self._code_at = open_at
+        self._code_prefix = "".join(parts[:-1])
+        self._code_scan = self._tail.find("\n", open_at) + 1
+
+    def _code_closed(self) -> bool:
+        """Look for the open code block's closing fence in the text added since the last look"""
+        found = _find_closing(self._tail, self._code_scan, self._code_fence)
+        if found is None or found[1].end() == len(self._tail):
+            # Only a complete line can close the block; the last one is searched again
+            self._code_scan = max(self._code_scan, self._tail.rfind("\n") + 1)
+            return False
+        self._code_fence = ""
+        self._search_from = found[0]
+        return True
+
+    def _render_tail(self, for_preview: bool) -> str:
+        if self._code_fence and _find_closing(self._tail, self._code_scan, self._code_fence) is None:
+            formatted = self._code_prefix + self._tail[self._code_at:].rstrip("\n")
+            open_fence, open_math = self._code_fence, False
+        else:
+            parts, open_fence, open_math, open_at = _format_parts(self._tail)
+            formatted = "".join(parts)
+            if open_fence and not self._code_fence and self._tail.find("\n", open_at) >= 0:
+                # A code block without blank lines never reaches feed's cut check
+                self._open_code(parts, open_fence, open_at)
+        formatted = _close_code(_LEADING_BLANK_LINES.sub("", formatted), open_fence).rstrip()
+        if for_preview and open_math and not open_fence:
+            formatted += "\n$$"
+        if self._done_text and formatted:
+            return f"{self._done_text}\n\n{formatted}".strip()
+        return (self._done_text or formatted).strip()
+
+    def preview(self) -> str:
+        """Formatted text so far, with open code or math blocks closed for display"""
+        return self._render_tail(for_preview=True)
+
+    def finish(self) -> str:
+        self._tail += self._held_cr
+        self._held_cr = ""
+        self._code_fence = ""
+        return self._render_tail(for_preview=False)
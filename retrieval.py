@@ -0,0 +1,298 @@
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CHUNK_CHARS = 1200
+DEFAULT_CHUNK_OVERLAP = 200
+
+# Files written by BM25Index.save(), next to each other in one directory
+INDEX_META_FILE = "bm25.json"
+INDEX_ARRAY_FILES = ("bm25_chunks.npy", "bm25_offsets.npy", "bm25_doc_ids.npy", "bm25_weights.npy")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it its me of on or
+please show that the their then there these this to was what when where which
+who why will with you your explain give tell about step steps
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms without common filler words"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+@dataclass
+class Chunk:
+    source: str
+    page: int
+    text: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.source} — Page {self.page}"
+
+
+class StoredChunk:
+    """A chunk that points into a DocumentStore page instead of copying its text"""
+    __slots__ = ("store", "index", "start", "end")
+
+    def __init__(self, store, index: int, start: int, end: int):
+        self.store = store
+        self.index = index
+        self.start = start
+        self.end = end
+
+    @property
+    def source(self) -> str:
+        return self.store.record(self.index).source
+
+    @property
+    def page(self) -> int:
+        return self.store.record(self.index).page
+
+    @property
+    def text(self) -> str:
+        return self.store.page_text(self.index)[self.start:self.end]
+
+    @property
+    def label(self) -> str:
+        return f"{self.source} — Page {self.page}"
+
+
+class StoredChunkArray:
+    """StoredChunks created on access from an (n, 3) array of (record, start, end),
+    so a saved index does not build an object per chunk when it is opened"""
+
+    def __init__(self, store, spans: np.ndarray):
+        self.store = store
+        self.spans = spans
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def __getitem__(self, position: int) -> StoredChunk:
+        index, start, end = self.spans[position].tolist()
+        return StoredChunk(self.store, index, start, end)
+
+
+class CsrPostings:
+    """Postings of every term packed into three flat arrays, term i owning
+    doc_ids[offsets[i]:offsets[i + 1]] and the matching weights"""
+
+    def __init__(self, offsets: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray):
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.weights[start:end]
+
+    def __iter__(self):
+        return (self[term_id] for term_id in range(len(self)))
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.doc_ids.nbytes + self.weights.nbytes
+
+
+def chunk_spans(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Tuple[int, int]]:
+    """(start, end) of overlapping windows over one page, preferring paragraph
+    and sentence boundaries, with surrounding whitespace trimmed"""
+    chunks = []
+    start = len(text) - len(text.lstrip())
+    length = len(text.rstrip())
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            window = text[start:end]
+            cut = max(window.rfind("\n\n"), window.rfind(". "), window.rfind("\n"))
+            if cut > chunk_chars // 2:
+                end = start + cut + 1
+        piece = text[start:end]
+        chunk_start = start + len(piece) - len(piece.lstrip())
+        chunk_end = start + len(piece.rstrip())
+        if chunk_end > chunk_start:
+            chunks.append((chunk_start, chunk_end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def chunk_page(source: str, page: int, text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+               overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Chunk]:
+    """Split one page into overlapping windows. Chunks never span pages so
+    citations stay exact."""
+    return [Chunk(source, page, text[start:end]) for start, end in chunk_spans(text, chunk_chars, overlap)]
+
+
+class BM25Index:
+    """In-memory Okapi BM25 index over text chunks, backed by NumPy postings"""
+
+    def __init__(self, chunks: List[Chunk], k1: float = 1.5, b: float = 0.75,
+                 texts: Optional[Iterable[str]] = None):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._build(texts if texts is not None else (chunk.text for chunk in chunks))
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[Tuple[str, int, str]], **kwargs) -> "BM25Index":
+        """Build from (source name, 1-based page number, page text) triples"""
+        chunks = []
+        for source, page, text in pages:
+            chunks.extend(chunk_page(source, page, text))
+        return cls(chunks, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, indices: Optional[Iterable[int]] = None, **kwargs) -> "BM25Index":
+        """Build over every page of a DocumentStore, or just the given record
+        indices; chunks reference the store's text"""
+        chunks = []
+        texts = []
+        for index in (store.page_indices() if indices is None else indices):
+            page_text = store.page_text(index)
+            for start, end in chunk_spans(page_text):
+                chunks.append(StoredChunk(store, index, start, end))
+                texts.append(page_text[start:end])
+        return cls(chunks, texts=texts, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the postings"""
+        if isinstance(self._postings, CsrPostings):
+            return self._postings.nbytes
+        return sum(doc_ids.nbytes + weights.nbytes for doc_ids, weights in self._postings)
+
+    def save(self, directory: str) -> None:
+        """Write the index next to its DocumentStore file for load().
+
+        Only indexes built with from_store() can be saved: chunks are stored
+        as (record, start, end) into that store, whose records must be
+        numbered as in the saved file (build over the reopened store).
+        """
+        spans = np.asarray([(chunk.index, chunk.start, chunk.end) for chunk in self.chunks],
+                           dtype=np.int64).reshape(-1, 3)
+        offsets = np.zeros(len(self._postings) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(doc_ids) for doc_ids, _ in self._postings])
+        if self._postings:
+            doc_ids = np.concatenate([doc_ids for doc_ids, _ in self._postings]).astype(np.int32)
+            weights = np.concatenate([weights for _, weights in self._postings]).astype(np.float32)
+        else:
+            doc_ids = np.zeros(0, dtype=np.int32)
+            weights = np.zeros(0, dtype=np.float32)
+        for name, array in zip(INDEX_ARRAY_FILES, (spans, offsets, doc_ids, weights)):
+            np.save(os.path.join(directory, name), array)
+        with open(os.path.join(directory, INDEX_META_FILE), "w", encoding="utf-8") as f:
+            # Term ids are positions in this list
+            json.dump({"k1": self.k1, "b": self.b, "terms": list(self._vocab)}, f)
+
+    @classmethod
+    def load(cls, directory: str, store) -> "BM25Index":
+        """Open a saved index over its DocumentStore with the arrays memory-mapped"""
+        with open(os.path.join(directory, INDEX_META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        spans, offsets, doc_ids, weights = (
+            np.load(os.path.join(directory, name), mmap_mode="r") for name in INDEX_ARRAY_FILES
+        )
+        if len(offsets) != len(meta["terms"]) + 1:
+            raise ValueError(f"Index in {directory} does not match its term list")
+        index = cls.__new__(cls)
+        index.chunks = StoredChunkArray(store, spans)
+        index.k1 = meta["k1"]
+        index.b = meta["b"]
+        index._vocab = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        index._postings = CsrPostings(offsets, doc_ids, weights)
+        return index
+
+    def _build(self, texts: Iterable[str]) -> None:
+        doc_count = len(self.chunks)
+        doc_lengths = np.zeros(doc_count, dtype=np.float32)
+        term_docs: Dict[str, List[int]] = {}
+        term_freqs: Dict[str, List[int]] = {}
+
+        for doc_id, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_docs.setdefault(token, []).append(doc_id)
+                term_freqs.setdefault(token, []).append(count)
+
+        avg_length = float(doc_lengths.mean()) if doc_count else 0.0
+        norms = self.k1 * (1 - self.b + self.b * doc_lengths / (avg_length or 1.0))
+
+        # Pre-compute each posting's full BM25 weight so a query is just a
+        # handful of scatter-adds
+        for term, docs in term_docs.items():
+            doc_ids = np.asarray(docs, dtype=np.int32)
+            tf = np.asarray(term_freqs[term], dtype=np.float32)
+            df = len(docs)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            weights = idf * tf * (self.k1 + 1) / (tf + norms[doc_ids])
+            self._vocab[term] = len(self._postings)
+            self._postings.append((doc_ids, weights.astype(np.float32)))
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[Chunk, float]]:
+        return self.search_terms(set(tokenize(query)), top_k)
+
+    def search_terms(self, terms, top_k: int = 5) -> List[Tuple[Chunk, float]]:
+        """search() for an already tokenized query, so several indexes can share one tokenization"""
+        if not len(self.chunks):
+            return []
+
+        postings = [self._postings[term_id] for term_id in map(self._vocab.get, terms) if term_id is not None]
+        if not postings:
+            return []
+        # One bincount over the concatenated postings instead of a scatter-add per term
+        if len(postings) == 1:
+            doc_ids, weights = postings[0]
+        else:
+            doc_ids = np.concatenate([doc_ids for doc_ids, _ in postings])
+            weights = np.concatenate([weights for _, weights in postings])
+        scores = np.bincount(doc_ids, weights, minlength=len(self.chunks))
+
+        matched = np.flatnonzero(scores)
+        if matched.size == 0:
+            return []
+        if matched.size > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.chunks[i], score) for i, score in zip(ranked.tolist(), scores[ranked].tolist())]
+
+
+def format_retrieved_chunks(results: List[Tuple[Chunk, float]], max_chars: int,
+                            source_order: Optional[List[str]] = None) -> str:
+    """Render search hits for the prompt within a size budget, in document order:
+    files as listed in source_order (others after them, by name), then by page"""
+    selected = []
+    used = 0
+    for chunk, _ in results:
+        # Read once: a stored chunk decodes its page on every access
+        text = chunk.text
+        if used + len(text) > max_chars and selected:
+            break
+        selected.append((chunk.source, chunk.page, chunk.label, text))
+        used += len(text)
+
+    rank = {source: position for position, source in enumerate(source_order or ())}
+    selected.sort(key=lambda item: (rank.get(item[0], len(rank)), item[0], item[1]))
+    return "\n\n".join(f"[{label}]\n{text}" for _, _, label, text in selected)
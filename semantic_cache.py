@@ -0,0 +1,100 @@
+import os
+import re
+import threading
+from typing import FrozenSet, Optional, Tuple
+
+from caching import LRUCache
+from retrieval import tokenize
+
+SEMANTIC_CACHE_ENABLED = os.getenv("CHATJEE_SEMANTIC_CACHE", "1") != "0"
+DEFAULT_MAX_ENTRIES = int(os.getenv("CHATJEE_SEMANTIC_CACHE_ENTRIES", "1024"))
+DEFAULT_TTL_SECONDS = float(os.getenv("CHATJEE_RESPONSE_CACHE_TTL", "3600"))
+
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# Questions that lean on the conversation ("explain it again") mean
+# something different in every chat, so they are never matched or stored
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|this|these|those|above|previous|again|same|more|else)\b", re.IGNORECASE
+)
+
+
+def question_numbers(question: str) -> Tuple[str, ...]:
+    """Numbers in a question; "2 kg" and "5 kg" versions must never share an answer"""
+    return tuple(sorted(NUMBER_PATTERN.findall(question)))
+
+
+def question_terms(question: str) -> FrozenSet[str]:
+    """Content words of a question, plurals folded.
+
+    Filler words are dropped, so "explain limits in calculus" and "what are
+    limits in calculus, step by step" give the same terms, while one
+    differing word ("upward" vs "downward") gives different ones.
+    """
+    return frozenset(token[:-1] if len(token) > 3 and token.endswith("s") else token
+                     for token in tokenize(question))
+
+
+def question_key(question: str) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+    return question_numbers(question), question_terms(question)
+
+
+def is_follow_up(question: str) -> bool:
+    return bool(FOLLOW_UP_PATTERN.search(question))
+
+
+class SemanticCache:
+    """Answers to earlier questions asked with the same numbers and content words.
+
+    Unlike the response cache, word order, filler words, plurals and
+    conversation history do not matter. Entries are scoped by materials
+    fingerprint, so an answer grounded in one set of PDFs is never served to
+    a student who uploaded different ones.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self._entries = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def get(self, question: str, materials_fingerprint: str) -> Optional[str]:
+        key = self._key(question, materials_fingerprint)
+        if key is None:
+            return None
+        return self._entries.get(key)
+
+    def put(self, question: str, materials_fingerprint: str, answer: str) -> None:
+        key = self._key(question, materials_fingerprint)
+        if answer and key is not None:
+            self._entries.put(key, answer)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self._entries.hits,
+            "misses": self._entries.misses,
+        }
+
+    @staticmethod
+    def _key(question: str, materials_fingerprint: str) -> Optional[tuple]:
+        if is_follow_up(question):
+            return None
+        numbers, terms = question_key(question)
+        if not terms:
+            return None
+        return materials_fingerprint, numbers, terms
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide cache instance shared by every Streamlit session"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+    return _semantic_cache
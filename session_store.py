@@ -0,0 +1,240 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Conversations survive restarts and are shared between workers through this
+# SQLite file; set it to "memory" (or empty) to keep them in process memory only
+SESSION_DB_PATH = os.getenv("CHATJEE_SESSION_DB", "chatjee_sessions.db")
+MEMORY_SESSION_DB = "memory"
+# Messages loaded into a browser session; older ones are read on demand
+SESSION_WINDOW_MESSAGES = int(os.getenv("CHATJEE_SESSION_WINDOW", "60"))
+# Without a database, at most this many messages per user are kept in memory
+MEMORY_MAX_MESSAGES = int(os.getenv("CHATJEE_SESSION_MEMORY_MESSAGES", "500"))
+# ... and for at most this many users; the least recently seen are forgotten
+MEMORY_MAX_USERS = int(os.getenv("CHATJEE_SESSION_MEMORY_USERS", "1000"))
+
+# Short messages are not worth the zlib header
+COMPRESS_MIN_BYTES = 128
+_RAW = b"r"
+_ZLIB = b"z"
+
+MaterialRef = Tuple[str, str]  # (file name, PDF content hash)
+
+
+def pack_text(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if len(data) < COMPRESS_MIN_BYTES:
+        return _RAW + data
+    return _ZLIB + zlib.compress(data, 6)
+
+
+def unpack_text(blob: bytes) -> str:
+    blob = bytes(blob)
+    if blob[:1] == _ZLIB:
+        return zlib.decompress(blob[1:]).decode("utf-8")
+    return blob[1:].decode("utf-8")
+
+
+@dataclass
+class SessionState:
+    """What a returning student needs besides the messages themselves"""
+    materials: List[MaterialRef] = field(default_factory=list)
+    summary: str = ""
+    cleared_after: int = 0
+
+
+class SessionStore:
+    """Per-user chat log held in memory.
+
+    Messages are appended once, compressed, and never rewritten; clearing a
+    chat only moves the user's cleared_after marker. Sessions read back a
+    recent window and page further back on demand. Only the max_users most
+    recently seen users are kept; use SqliteSessionStore to keep everyone.
+    """
+
+    def __init__(self, max_users: int = MEMORY_MAX_USERS):
+        self.max_users = max_users
+        self._messages: Dict[str, List[Tuple[int, str, bytes]]] = {}
+        self._states: Dict[str, SessionState] = {}
+        # Every user with messages or state, least recently seen first
+        self._users: "OrderedDict[str, None]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _touch(self, user_key: str) -> None:
+        """Mark user_key as just seen and forget the oldest users; caller holds the lock"""
+        self._users[user_key] = None
+        self._users.move_to_end(user_key)
+        while len(self._users) > self.max_users:
+            evicted, _ = self._users.popitem(last=False)
+            self._messages.pop(evicted, None)
+            self._states.pop(evicted, None)
+            logger.info(f"Forgot the in-memory chat of {evicted}: more than {self.max_users} users "
+                        f"(point CHATJEE_SESSION_DB at a file to keep every conversation)")
+
+    # Storage primitives, overridden by persistent backends
+
+    def _append(self, user_key: str, role: str, blob: bytes) -> int:
+        with self._lock:
+            message_id = self._next_id
+            self._next_id += 1
+            self._touch(user_key)
+            log = self._messages.setdefault(user_key, [])
+            log.append((message_id, role, blob))
+            if len(log) > MEMORY_MAX_MESSAGES:
+                del log[:len(log) - MEMORY_MAX_MESSAGES]
+            return message_id
+
+    def _load_before(self, user_key: str, after_id: int, before_id: Optional[int],
+                     limit: int) -> List[Tuple[int, str, bytes]]:
+        """Newest rows first with after_id < id < before_id"""
+        with self._lock:
+            if user_key in self._users:
+                self._touch(user_key)
+            log = list(self._messages.get(user_key, []))
+        rows = [row for row in log if row[0] > after_id and (before_id is None or row[0] < before_id)]
+        return rows[::-1][:limit]
+
+    def _load_state(self, user_key: str) -> Optional[SessionState]:
+        with self._lock:
+            if user_key in self._users:
+                self._touch(user_key)
+            return self._states.get(user_key)
+
+    def _store_state(self, user_key: str, state: SessionState) -> None:
+        with self._lock:
+            self._touch(user_key)
+            self._states[user_key] = state
+
+    # Public API
+
+    def append_message(self, user_key: str, role: str, content: str) -> int:
+        """Persist one chat message and return its id"""
+        return self._append(user_key, role, pack_text(content))
+
+    def recent_messages(self, user_key: str, limit: int = SESSION_WINDOW_MESSAGES,
+                        before_id: Optional[int] = None) -> List[Dict]:
+        """Up to limit messages since the last clear, oldest first"""
+        state = self.load_state(user_key)
+        rows = self._load_before(user_key, state.cleared_after, before_id, limit)
+        return [
+            {"role": role, "content": unpack_text(blob), "id": message_id}
+            for message_id, role, blob in reversed(rows)
+        ]
+
+    def has_messages_before(self, user_key: str, message_id: int) -> bool:
+        state = self.load_state(user_key)
+        return bool(self._load_before(user_key, state.cleared_after, message_id, 1))
+
+    def load_state(self, user_key: str) -> SessionState:
+        return self._load_state(user_key) or SessionState()
+
+    def save_state(self, user_key: str, materials: List[MaterialRef], summary: str) -> None:
+        state = self.load_state(user_key)
+        self._store_state(user_key, SessionState(list(materials), summary, state.cleared_after))
+
+    def clear_messages(self, user_key: str) -> None:
+        """Hide everything logged so far from future sessions of this user"""
+        state = self.load_state(user_key)
+        last = self._load_before(user_key, state.cleared_after, None, 1)
+        cleared_after = last[0][0] if last else state.cleared_after
+        self._store_state(user_key, SessionState(state.materials, "", cleared_after))
+
+
+class SqliteSessionStore(SessionStore):
+    """Session store persisted in SQLite (WAL mode) for restarts and multi-worker deployments"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY, user_key TEXT NOT NULL, role TEXT NOT NULL, "
+            "content BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_by_user ON messages (user_key, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_key TEXT PRIMARY KEY, materials_json TEXT NOT NULL, summary BLOB NOT NULL, "
+            "cleared_after INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _append(self, user_key: str, role: str, blob: bytes) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO messages (user_key, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_key, role, blob, time.time()),
+            )
+            return cursor.lastrowid
+
+    def _load_before(self, user_key: str, after_id: int, before_id: Optional[int],
+                     limit: int) -> List[Tuple[int, str, bytes]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE user_key = ? AND id > ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (user_key, after_id, before_id if before_id is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+
+    def _load_state(self, user_key: str) -> Optional[SessionState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT materials_json, summary, cleared_after FROM sessions WHERE user_key = ?",
+                (user_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            materials = [tuple(ref) for ref in json.loads(row[0])]
+        except ValueError as e:
+            logger.warning(f"Dropping unreadable material list for {user_key}: {e}")
+            materials = []
+        return SessionState(materials, unpack_text(row[1]), row[2])
+
+    def _store_state(self, user_key: str, state: SessionState) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (user_key, materials_json, summary, cleared_after, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT(user_key) DO UPDATE SET "
+                "materials_json = excluded.materials_json, summary = excluded.summary, "
+                "cleared_after = excluded.cleared_after, updated_at = excluded.updated_at",
+                (user_key, json.dumps(state.materials), pack_text(state.summary),
+                 state.cleared_after, time.time()),
+            )
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store; SQLite-backed unless CHATJEE_SESSION_DB opts out"""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = _open_session_store(SESSION_DB_PATH)
+    return _session_store
+
+
+def _open_session_store(path: Optional[str]) -> SessionStore:
+    if not path or path == MEMORY_SESSION_DB:
+        return SessionStore()
+    try:
+        return SqliteSessionStore(path)
+    except sqlite3.Error as e:
+        # A read-only or missing directory should not keep students out of the chat
+        logger.error(f"Could not open session database {path}, keeping chats in memory: {e}")
+        return SessionStore()
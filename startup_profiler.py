@@ -0,0 +1,108 @@
+import builtins
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Set CHATJEE_PROFILE_STARTUP=1 to log import and phase timings
+ENABLED = os.getenv("CHATJEE_PROFILE_STARTUP", "").lower() in ("1", "true", "yes")
+REPORT_TOP_IMPORTS = int(os.getenv("CHATJEE_PROFILE_TOP_IMPORTS", "15"))
+
+
+class StartupProfiler:
+    """Collects wall-clock timings for module imports and named startup phases"""
+
+    def __init__(self):
+        self.process_start = time.perf_counter()
+        self.imports = {}
+        self.phases = []
+        self._phase_names = set()
+        self.reported = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def install_import_hook(self) -> None:
+        """Time every first-time import from here on.
+
+        Only the outermost import of a chain is recorded, so each entry is the
+        inclusive cost of pulling that module (and its dependencies) in.
+        """
+        if self._original_import is not None:
+            return
+        original_import = builtins.__import__
+        self._original_import = original_import
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level != 0 or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+            depth = getattr(self._local, "depth", 0)
+            self._local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                self._local.depth = depth
+                if depth == 0:
+                    elapsed = time.perf_counter() - start
+                    with self._lock:
+                        self.imports[name] = self.imports.get(name, 0.0) + elapsed
+
+        builtins.__import__ = timed_import
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                # Streamlit reruns repeat every phase; only the first run is startup
+                first = name not in self._phase_names
+                if first:
+                    self._phase_names.add(name)
+                    self.phases.append((name, elapsed))
+            if first and self.reported:
+                # Lazy loads after the first run are reported as they happen
+                logger.info(f"[startup] {name}: {elapsed * 1000:.1f} ms")
+
+    def report(self) -> str:
+        with self._lock:
+            imports = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+            phases = list(self.phases)
+        lines = [f"Startup profile ({(time.perf_counter() - self.process_start) * 1000:.1f} ms since profiler load)"]
+        lines.append("Phases:")
+        lines.extend(f"  {name:<40} {seconds * 1000:9.1f} ms" for name, seconds in phases)
+        lines.append(f"Slowest imports (top {REPORT_TOP_IMPORTS} of {len(imports)}):")
+        lines.extend(
+            f"  {name:<40} {seconds * 1000:9.1f} ms"
+            for name, seconds in imports[:REPORT_TOP_IMPORTS]
+        )
+        return "\n".join(lines)
+
+    def log_report_once(self) -> None:
+        if self.reported:
+            return
+        self.reported = True
+        logger.info(self.report())
+
+
+profiler = StartupProfiler()
+
+if ENABLED:
+    profiler.install_import_hook()
+
+
+def phase(name: str):
+    """Context manager timing a named phase; a no-op unless profiling is on"""
+    return profiler.phase(name) if ENABLED else nullcontext()
+
+
+def log_report_once() -> None:
+    if ENABLED:
+        profiler.log_report_once()
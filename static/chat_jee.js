@@ -0,0 +1,88 @@
+// Runs inside a zero-height component iframe and installs Chat Jee's styles and
+// behaviour into the app page once per browser session. CHATJEE_ASSET_VERSION and
+// CHATJEE_CSS are defined by static_assets.py before this file.
+(function () {
+    const win = window.parent;
+    const doc = win.document;
+
+    // The loader itself has nothing to show; collapse its element container
+    if (window.frameElement) {
+        const host = window.frameElement.closest('.stElementContainer, .element-container');
+        (host || window.frameElement).style.display = 'none';
+    }
+
+    // Styles: replace only when the stylesheet content hash changes
+    const styleId = 'chatjee-styles-' + CHATJEE_ASSET_VERSION;
+    if (!doc.getElementById(styleId)) {
+        doc.querySelectorAll('style[id^="chatjee-styles-"]').forEach(function (old) {
+            old.remove();
+        });
+        const style = doc.createElement('style');
+        style.id = styleId;
+        style.textContent = CHATJEE_CSS;
+        doc.head.appendChild(style);
+    }
+
+    if (win.__chatJeeScriptsInstalled) {
+        return;
+    }
+    win.__chatJeeScriptsInstalled = true;
+
+    // Auto-scroll to bottom function
+    function scrollToBottom() {
+        win.scrollTo({
+            top: doc.body.scrollHeight,
+            behavior: 'smooth'
+        });
+    }
+
+    // Scroll to bottom when new messages appear
+    const observer = new win.MutationObserver(function (mutations) {
+        mutations.forEach(function (mutation) {
+            if (mutation.type === 'childList' && mutation.addedNodes.length > 0) {
+                // Check if new message was added
+                const newNodes = Array.from(mutation.addedNodes);
+                if (newNodes.some(node => node.querySelector && node.querySelector('.message'))) {
+                    setTimeout(scrollToBottom, 100);
+                }
+            }
+        });
+    });
+
+    // Start observing
+    observer.observe(doc.body, {
+        childList: true,
+        subtree: true
+    });
+
+    // Handle keyboard shortcuts
+    doc.addEventListener('keydown', function (e) {
+        // Ctrl+Enter to send message
+        if (e.ctrlKey && e.key === 'Enter') {
+            const sendButton = doc.querySelector('button[kind="primaryFormSubmit"], button[kind="primary"]');
+            if (sendButton && !sendButton.disabled) {
+                sendButton.click();
+            }
+        }
+
+        // Escape to clear input
+        if (e.key === 'Escape') {
+            const textarea = doc.querySelector('textarea');
+            if (textarea) {
+                // Go through the native setter so React sees the change
+                const setValue = Object.getOwnPropertyDescriptor(
+                    win.HTMLTextAreaElement.prototype, 'value'
+                ).set;
+                setValue.call(textarea, '');
+                textarea.dispatchEvent(new win.Event('input', { bubbles: true }));
+                textarea.focus();
+            }
+        }
+    });
+
+    // Focus on input when the app first loads
+    const textarea = doc.querySelector('textarea');
+    if (textarea) {
+        textarea.focus();
+    }
+})();
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionTimeout
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's RerunException, which is not an Exception"""
+
+
+def controller(max_concurrent=1, requests_per_minute=60000, burst=1000, queue_timeout=5):
+    return AdmissionController(max_concurrent=max_concurrent, requests_per_minute=requests_per_minute,
+                               burst=burst, queue_timeout=queue_timeout)
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_concurrency_is_bounded():
+    gate = controller(max_concurrent=2)
+    gate.acquire("a")
+    gate.acquire("b")
+    with pytest.raises(AdmissionTimeout):
+        gate.acquire("c", timeout=0.05)
+    gate.release()
+    gate.acquire("c", timeout=0.5)
+    assert gate.active == 2
+
+
+def test_timeout_message_shows_sub_second_timeouts():
+    gate = controller()
+    gate.acquire("a")
+    with pytest.raises(AdmissionTimeout, match="0.05s"):
+        gate.acquire("b", timeout=0.05)
+    assert gate.waiting == 0
+
+
+def test_waiting_users_are_served_round_robin():
+    gate = controller()
+    gate.acquire("holder")
+    order = []
+    threads = []
+
+    def ask(user_id):
+        with gate.admit(user_id):
+            order.append(user_id)
+
+    # One student queues three questions before a second student queues one
+    for user_id in ("busy", "busy", "busy", "other"):
+        thread = threading.Thread(target=ask, args=(user_id,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: gate.waiting == len(threads))
+    gate.release()
+    for thread in threads:
+        thread.join(2)
+    assert order[:2] == ["busy", "other"]
+    assert gate.active == 0
+
+
+def test_interrupted_wait_leaves_no_ticket_behind():
+    gate = controller()
+    gate.acquire("holder")
+
+    def on_wait(position):
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        gate.acquire("student", on_wait=on_wait)
+    assert gate.waiting == 0
+    gate.release()
+    assert gate.active == 0
+    # The queue keeps working for everyone else
+    gate.acquire("next", timeout=0.5)
+    assert gate.active == 1
+
+
+def test_interrupted_wait_releases_a_slot_granted_meanwhile():
+    gate = controller()
+    gate.acquire("holder")
+    calls = []
+
+    def on_wait(position):
+        calls.append(position)
+        # The slot frees up, and is granted to us, while the callback runs
+        gate.release()
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        gate.acquire("student", on_wait=on_wait)
+    assert calls == [1]
+    assert gate.active == 0
+    assert gate.waiting == 0
+
+
+def test_rate_limit_paces_admissions():
+    gate = controller(max_concurrent=10, requests_per_minute=600, burst=1)
+    gate.acquire("a")
+    started = time.monotonic()
+    gate.acquire("b")
+    # 600/min is one token every 0.1 s
+    assert time.monotonic() - started >= 0.05
+
+
+def test_pause_hands_the_slot_to_a_waiting_user():
+    gate = controller(max_concurrent=1)
+    gate.acquire("a")
+    served = threading.Event()
+
+    def other():
+        gate.acquire("b")
+        served.set()
+        gate.release()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    wait_until(lambda: gate.waiting == 1)
+    assert gate.pause("a", 0.01, timeout=1.0)
+    thread.join()
+    assert served.is_set() and gate.active == 1
+
+
+def test_pause_that_times_out_stays_balanced():
+    gate = controller(max_concurrent=1, requests_per_minute=0, burst=1)
+    gate.acquire("a")
+    assert not gate.pause("a", 0.0, timeout=0.01)
+    assert gate.active == 1
+    gate.release()
+    assert gate.active == 0
@@ -0,0 +1,49 @@
+import time
+
+import credential_store
+from credential_store import CredentialStore, SqliteCredentialStore
+
+
+def make_stores(tmp_path):
+    return [CredentialStore([]), SqliteCredentialStore([], str(tmp_path / "credentials.db"))]
+
+
+def test_login_handles_resolve_to_their_user(tmp_path):
+    for store in make_stores(tmp_path):
+        first = store.create_login("a@example.com")
+        second = store.create_login("b@example.com")
+        assert first != second
+        assert store.resolve_login(first) == "a@example.com"
+        assert store.resolve_login(second) == "b@example.com"
+        assert store.resolve_login("unknown") is None
+
+
+def test_revoked_login_no_longer_resolves(tmp_path):
+    for store in make_stores(tmp_path):
+        handle = store.create_login("a@example.com")
+        store.revoke_login(handle)
+        assert store.resolve_login(handle) is None
+
+
+def test_resolving_a_login_pushes_its_expiry_back(tmp_path, monkeypatch):
+    for store in make_stores(tmp_path):
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        handle = store.create_login("a@example.com")
+        now[0] += credential_store.LOGIN_TTL_SECONDS * 0.9
+        assert store.resolve_login(handle) == "a@example.com"
+        # Past the original expiry, but seen recently
+        now[0] += credential_store.LOGIN_TTL_SECONDS * 0.9
+        assert store.resolve_login(handle) == "a@example.com"
+        now[0] += credential_store.LOGIN_TTL_SECONDS + 1
+        assert store.resolve_login(handle) is None
+
+
+def test_expired_logins_are_pruned(tmp_path, monkeypatch):
+    for store in make_stores(tmp_path):
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        stale = store.create_login("a@example.com")
+        now[0] += credential_store.LOGIN_TTL_SECONDS + 1
+        store.create_login("b@example.com")
+        assert store._load_login(stale) is None
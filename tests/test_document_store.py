@@ -0,0 +1,46 @@
+import pytest
+
+from document_store import DocumentStore
+
+PAGES = {
+    "physics.pdf": [(1, "Torque equals force times lever arm."), (2, "Angular momentum is conserved — always.")],
+    "chemistry.pdf": [(3, "Enthalpy of combustion is negative for exothermic reactions.")],
+}
+
+
+def filled_store():
+    store = DocumentStore()
+    for source, pages in PAGES.items():
+        store.add_pages(source, pages)
+    return store
+
+
+def test_pages_round_trip_by_source_and_number():
+    store = filled_store()
+    assert len(store) == 3
+    assert store.sources() == ["physics.pdf", "chemistry.pdf"]
+    assert store.get_page("physics.pdf", 2) == "Angular momentum is conserved — always."
+    assert store.get_page("physics.pdf", 9) is None
+    assert [page for _, page, _ in store.iter_pages("physics.pdf")] == [1, 2]
+
+
+def test_fingerprint_follows_content():
+    assert filled_store().fingerprint() == filled_store().fingerprint()
+    other = filled_store()
+    other.add_page("extra.pdf", 1, "More text")
+    assert other.fingerprint() != filled_store().fingerprint()
+
+
+def test_saved_store_reopens_memory_mapped(tmp_path):
+    path = str(tmp_path / "pages.cjdocs")
+    store = filled_store()
+    store.save(path)
+    mapped = DocumentStore.open_mmap(path)
+    try:
+        assert mapped.read_only
+        assert list(mapped.iter_pages()) == list(store.iter_pages())
+        assert mapped.fingerprint() == store.fingerprint()
+        with pytest.raises(ValueError):
+            mapped.add_page("new.pdf", 1, "text")
+    finally:
+        mapped.close()
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from Gemine_AI import ManagedModel
+
+
+class FakeModel:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        if not stream:
+            return "".join(self.chunks)
+        return self._stream()
+
+    def _stream(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise RuntimeError("stream broke")
+            yield chunk
+
+
+def managed(fake):
+    # Skips __init__, which builds a real GenerativeModel
+    model = ManagedModel.__new__(ManagedModel)
+    model.model_name = "fake"
+    model.request_timeout = 1
+    model._model = fake
+    model._lock = threading.Lock()
+    model.calls = model.errors = 0
+    model.total_seconds = 0.0
+    return model
+
+
+def test_stream_is_recorded_when_exhausted():
+    model = managed(FakeModel(["a", "b"]))
+    stream = model.generate_content("q", stream=True)
+    assert model.stats()["calls"] == 0
+    assert list(stream) == ["a", "b"]
+    assert model.stats()["calls"] == 1
+    assert model.stats()["errors"] == 0
+
+
+def test_stream_failure_is_recorded_as_an_error():
+    model = managed(FakeModel(["a", "b", "c"], fail_after=1))
+    with pytest.raises(RuntimeError):
+        list(model.generate_content("q", stream=True))
+    assert model.stats()["calls"] == 1
+    assert model.stats()["errors"] == 1
+
+
+def test_abandoned_stream_is_recorded_once():
+    model = managed(FakeModel(["a", "b", "c"]))
+    stream = iter(model.generate_content("q", stream=True))
+    next(stream)
+    stream.close()
+    assert model.stats()["calls"] == 1
+    assert model.stats()["errors"] == 0
+
+
+def test_plain_call_is_recorded_immediately():
+    model = managed(FakeModel(["a", "b"]))
+    assert model.generate_content("q") == "ab"
+    assert model.stats()["calls"] == 1
@@ -0,0 +1,50 @@
+import threading
+import time
+
+from ingestion import DONE, FAILED, IngestionQueue
+
+
+def test_job_is_finished_only_after_on_done(monkeypatch):
+    import ingestion
+
+    class Cache:
+        def get(self, content_hash):
+            return ["page one", "", "page three"]
+
+    monkeypatch.setattr(ingestion, "get_pdf_cache", lambda: Cache())
+    release = threading.Event()
+    delivered = []
+    seen = []
+
+    def on_done(job):
+        seen.append((job.status, job.finished))
+        release.wait(2.0)
+
+    queue = IngestionQueue(max_workers=1)
+    job = queue.submit("notes.pdf", b"%PDF", lambda name, pages: delivered.extend(pages),
+                       on_done=on_done, content_hash="hash")
+    while not seen:
+        time.sleep(0.005)
+    assert seen == [(DONE, False)]
+    assert not job.finished
+    release.set()
+    queue._executor.shutdown(wait=True)
+    assert job.finished and job.text_pages == 2
+    assert delivered == [(1, "page one"), (3, "page three")]
+
+
+def test_failed_job_still_calls_on_done(monkeypatch):
+    import ingestion
+
+    class Cache:
+        def get(self, content_hash):
+            return ["   "]
+
+    monkeypatch.setattr(ingestion, "get_pdf_cache", lambda: Cache())
+    statuses = []
+    queue = IngestionQueue(max_workers=1)
+    job = queue.submit("scan.pdf", b"%PDF", lambda name, pages: None,
+                       on_done=lambda job: statuses.append(job.status), content_hash="hash")
+    queue._executor.shutdown(wait=True)
+    assert statuses == [FAILED]
+    assert job.finished and "image-based" in job.error
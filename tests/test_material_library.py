@@ -0,0 +1,105 @@
+import gc
+
+from material_library import LibraryDocument, MaterialLibrary, MaterialSet
+
+PAGES = [(1, "Torque is the rotational analogue of force."), (2, "Angular momentum is conserved.")]
+
+
+def published(library, content_hash, pages=PAGES):
+    document = LibraryDocument(content_hash)
+    document.add_pages(pages)
+    return library.publish(document)
+
+
+def test_publish_shares_the_first_copy():
+    library = MaterialLibrary()
+    first = published(library, "h1")
+    second = published(library, "h1")
+    assert second is first
+    assert first.refs == 2
+    assert library.acquire("h1") is first
+    assert library.acquire("missing") is None
+
+
+def test_referenced_documents_are_never_evicted():
+    library = MaterialLibrary(max_idle_documents=0)
+    document = published(library, "h1")
+    library.clear()
+    assert library.acquire("h1") is document
+    library.release(document)
+    library.release(document)
+    # Idle with no room left: evicted
+    assert library.acquire("h1") is None
+    assert library.stats["evictions"] == 1
+
+
+def test_idle_documents_are_evicted_least_recent_first():
+    library = MaterialLibrary(max_idle_documents=2)
+    documents = [published(library, f"h{index}") for index in range(3)]
+    for document in documents:
+        library.release(document)
+    assert library.acquire("h0") is None
+    assert library.acquire("h2") is documents[2]
+    assert library.stats["referenced"] == 1
+
+
+def test_clear_keeps_referenced_documents():
+    library = MaterialLibrary()
+    kept = published(library, "kept")
+    library.release(published(library, "idle"))
+    library.clear()
+    assert library.acquire("idle") is None
+    assert library.acquire("kept") is kept
+
+
+def test_material_set_release_hands_references_back():
+    library = MaterialLibrary()
+    materials = MaterialSet(library)
+    document = materials.add_complete("notes.pdf", "h1", PAGES)
+    assert MaterialSet(library).add_complete("copy.pdf", "h1", PAGES) is document
+    assert materials.refs() == [("notes.pdf", "h1")]
+    materials.release()
+    assert not materials
+    gc.collect()
+    assert document.refs == 0
+    assert library.stats["referenced"] == 0
+
+
+def test_material_set_is_released_when_collected():
+    library = MaterialLibrary()
+    materials = MaterialSet(library)
+    document = materials.add_complete("notes.pdf", "h1", PAGES)
+    del materials
+    gc.collect()
+    assert document.refs == 0
+
+
+def test_pending_pages_stay_private_until_published():
+    library = MaterialLibrary()
+    materials = MaterialSet(library)
+    materials.add_pending_pages("notes.pdf", "h1", PAGES[:1])
+    materials.add_pending_pages("notes.pdf", "h1", PAGES[1:])
+    assert materials.page_count("notes.pdf") == 2
+    assert library.acquire("h1") is None
+    materials.publish("notes.pdf")
+    assert library.acquire("h1") is not None
+    assert materials.refs() == [("notes.pdf", "h1")]
+
+
+def test_pending_batches_are_searchable_and_indexed_once_on_publish():
+    materials = MaterialSet(MaterialLibrary())
+    materials.add_pending_pages("notes.pdf", "h1", PAGES[:1])
+    materials.add_pending_pages("notes.pdf", "h1", PAGES[1:])
+    assert materials.search("angular momentum", top_k=1)[0][0].page == 2
+    materials.publish("notes.pdf")
+    document = materials._entries["notes.pdf"]
+    assert len(document.index) == 2 and not document._batch_indexes
+    assert materials.search("torque", top_k=1)[0][0].page == 1
+
+
+def test_search_labels_chunks_with_the_session_file_name():
+    library = MaterialLibrary()
+    materials = MaterialSet(library)
+    materials.add_complete("my notes.pdf", "h1", PAGES)
+    results = materials.search("angular momentum conserved", top_k=1)
+    assert results[0][0].label == "my notes.pdf — Page 2"
@@ -0,0 +1,36 @@
+from caching import LRUCache
+from pdf_cache import PdfTextCache, hash_pdf_bytes
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_lru_byte_budget():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.put("a", "x" * 6)
+    cache.put("b", "x" * 6)
+    assert "a" not in cache
+    assert cache.total_bytes == 6
+    # Larger than the whole budget: not stored at all
+    cache.put("c", "x" * 11)
+    assert "c" not in cache and "b" in cache
+
+
+def test_pdf_cache_survives_memory_clear_on_disk(tmp_path):
+    cache = PdfTextCache(cache_dir=str(tmp_path))
+    cache.put("hash", ["page one", "page two"])
+    cache.clear()
+    assert cache.get("hash") == ["page one", "page two"]
+    assert PdfTextCache(cache_dir=None).get("hash") is None
+
+
+def test_hash_depends_only_on_bytes():
+    assert hash_pdf_bytes(b"%PDF-1") == hash_pdf_bytes(b"%PDF-1")
+    assert hash_pdf_bytes(b"%PDF-1") != hash_pdf_bytes(b"%PDF-2")
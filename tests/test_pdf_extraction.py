@@ -0,0 +1,55 @@
+import io
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from PyPDF2 import PdfWriter
+
+from pdf_extraction import ParallelPdfExtractor
+
+
+def _blank_pdf(page_count):
+    writer = PdfWriter()
+    for _ in range(page_count):
+        writer.add_blank_page(width=72, height=72)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class _BreakingPool:
+    """Runs the first few tasks inline, then fails the rest like a crashed worker"""
+
+    def __init__(self, good_tasks):
+        self.good_tasks = good_tasks
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        future = Future()
+        if self.submitted < self.good_tasks:
+            future.set_result(fn(*args))
+        else:
+            future.set_exception(BrokenProcessPool("worker died"))
+        self.submitted += 1
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_broken_pool_delivers_each_page_once():
+    extractor = ParallelPdfExtractor(max_workers=2, min_pages_for_pool=1, pages_per_task=2)
+    pool = _BreakingPool(good_tasks=3)
+    extractor._get_pool = lambda: pool
+    delivered = []
+    progress = []
+
+    results = extractor.extract_many(
+        [_blank_pdf(8), _blank_pdf(5)],
+        progress_callback=lambda done, total: progress.append((done, total)),
+        pages_callback=lambda doc_index, pages: delivered.extend((doc_index, p) for p, _ in pages),
+    )
+
+    assert sorted(delivered) == [(0, p) for p in range(8)] + [(1, p) for p in range(5)]
+    assert [len(r) for r in results] == [8, 5]
+    assert progress[-1] == (13, 13)
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController
+from resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, RetryPolicy
+
+
+class ServiceUnavailable(Exception):
+    """Named like the google.api_core error so it classifies as retryable"""
+
+
+def flaky(failures, result="ok"):
+    calls = []
+
+    def fn(timeout):
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise ServiceUnavailable("503 unavailable")
+        return result
+
+    return fn, calls
+
+
+def fast_policy(**kwargs):
+    return RetryPolicy(base_delay=0.0, max_delay=0.0, **kwargs)
+
+
+def test_retries_until_success():
+    fn, calls = flaky(2)
+    caller = ResilientCaller(fast_policy())
+    assert caller.call(fn) == "ok"
+    assert len(calls) == 3
+    assert caller.retries == 2
+
+
+def test_fatal_errors_are_not_retried():
+    calls = []
+
+    def fn(timeout):
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        ResilientCaller(fast_policy()).call(fn)
+    assert len(calls) == 1
+
+
+def test_each_retry_takes_a_rate_token():
+    limiter = AdmissionController(requests_per_minute=0, burst=2)
+    fn, calls = flaky(5)
+    caller = ResilientCaller(fast_policy(max_attempts=10, deadline_seconds=0.2), rate_limiter=limiter)
+    with pytest.raises(ServiceUnavailable):
+        caller.call(fn)
+    # The first attempt came through admission; only two tokens were left for retries
+    assert len(calls) == 3
+
+
+def test_hedge_is_skipped_without_a_rate_token():
+    limiter = AdmissionController(requests_per_minute=0, burst=0)
+    calls = []
+
+    def slow(timeout):
+        calls.append(1)
+        time.sleep(0.1)
+        return "ok"
+
+    caller = ResilientCaller(hedge_after=0.01, rate_limiter=limiter)
+    assert caller.call(slow) == "ok"
+    assert caller.hedges == 0
+    assert len(calls) == 1
+
+
+def test_hedge_takes_a_rate_token():
+    limiter = AdmissionController(requests_per_minute=0, burst=1)
+    release = threading.Event()
+    calls = []
+
+    def fn(timeout):
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(1.0)
+            return "slow"
+        return "fast"
+
+    caller = ResilientCaller(hedge_after=0.01, rate_limiter=limiter)
+    assert caller.call(fn) == "fast"
+    release.set()
+    assert caller.hedges == 1
+    assert not limiter.take_token()
+
+
+def test_each_attempt_is_timed_out_at_the_deadline():
+    timeouts = []
+
+    def fn(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) == 1:
+            time.sleep(0.05)
+            raise ServiceUnavailable("503 unavailable")
+        return "ok"
+
+    caller = ResilientCaller(fast_policy(deadline_seconds=1.0))
+    assert caller.call(fn) == "ok"
+    assert 0.9 < timeouts[0] <= 1.0
+    assert timeouts[1] <= 0.95
+
+
+def test_long_backoff_hands_the_admission_slot_to_others():
+    limiter = AdmissionController(max_concurrent=1, requests_per_minute=0, burst=3)
+    limiter.acquire("a")
+    served = threading.Event()
+
+    def other():
+        limiter.acquire("b")
+        served.set()
+        limiter.release()
+
+    def fn(timeout):
+        if not served.is_set():
+            threading.Thread(target=other).start()
+            while limiter.waiting == 0:
+                time.sleep(0.005)
+            raise ServiceUnavailable("503 unavailable")
+        return "ok"
+
+    caller = ResilientCaller(fast_policy(release_slot_after=0.0), rate_limiter=limiter)
+    assert caller.call(fn, user_id="a") == "ok"
+    assert served.is_set()
+    assert limiter.active == 1
+
+
+def test_circuit_opens_and_probes_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    breaker.allow()
+    # Only one probe at a time while half-open
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
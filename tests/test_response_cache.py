@@ -0,0 +1,22 @@
+import time
+
+from caching import LRUCache
+from response_cache import ResponseCache
+
+
+def test_lru_ttl_expiry():
+    cache = LRUCache(ttl_seconds=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.misses == 1 and len(cache) == 0
+
+
+def test_response_cache_key_folds_spelling_but_not_context():
+    cache = ResponseCache(history_turns=1)
+    key = cache.make_key("What is torque?", "m1", ["turn 1", "turn 2"])
+    assert cache.make_key("  what is   TORQUE ", "m1", ["other", "turn 2"]) == key
+    assert cache.make_key("What is torque?", "m2", ["turn 1", "turn 2"]) != key
+    assert cache.make_key("What is torque?", "m1", ["turn 1", "turn 3"]) != key
+    cache.put(key, "answer")
+    assert cache.get(key) == "answer"
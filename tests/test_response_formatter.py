@@ -0,0 +1,80 @@
+import pytest
+
+from response_formatter import ResponseFormatter, format_response
+
+SAMPLES = [
+    "Intro.\n\n```python\nx = 1```\n\nAfter the code.\n\nLast line.",
+    "```py\nprint(1)\n\nprint(2)```\n\n\n\nDone.",
+    "Energy:\n\\[\nE = mc^2\n\n\\]\n\nSo \\(E\\) grows with mass.",
+    "$$ a\n```py\ny = 1```\n\n$$\n\nb\n\n$$ tail",
+    "Start $$x\n\n$$ end\n\n```\ncode\n```\n\n$$\n\n$$",
+    "Text  \n\n\n\n- item\t\n\n```\nopen code\n\nstill code",
+    "Line\r\n\r\nNext\r\n\r\n```js\nlet a = 1;\r\n```\r\n",
+    "~~~\nnot ``` closed\n~~~\n\n`inline` and \\(x^2\\)\n\n\\[y\\]",
+]
+
+
+def stream(text, chunks):
+    formatter = ResponseFormatter()
+    for chunk in chunks:
+        formatter.feed(chunk)
+        formatter.preview()
+    return formatter.finish()
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_any_two_chunk_split_matches_batch(text):
+    expected = format_response(text)
+    for cut in range(len(text) + 1):
+        assert stream(text, [text[:cut], text[cut:]]) == expected, cut
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_char_by_char_matches_batch(text):
+    assert stream(text, list(text)) == format_response(text)
+
+
+@pytest.mark.parametrize("text", SAMPLES + ["Intro.\n\n```py\na = 1\nb = 2\n\nc = 3\n``` \n\nAfter."])
+def test_streamed_previews_match_one_shot_previews(text):
+    formatter = ResponseFormatter()
+    for cut in range(1, len(text) + 1):
+        formatter.feed(text[cut - 1])
+        one_shot = ResponseFormatter()
+        one_shot.feed(text[:cut])
+        assert formatter.preview() == one_shot.preview(), cut
+
+
+def test_open_code_block_is_not_reformatted_per_chunk():
+    formatter = ResponseFormatter()
+    formatter.feed("Intro \\(x\\).\n\n```py\n")
+    formatter.preview()
+    formatter._code_prefix = "cached "
+    formatter.feed("y = 1\n\nz = 2\n")
+    assert formatter.preview() == "Intro $x$.\n\ncached ```py\ny = 1\n\nz = 2\n```"
+    formatter.feed("```\n")
+    assert formatter.finish() == "Intro $x$.\n\n```py\ny = 1\n\nz = 2\n```"
+
+
+def test_glued_closing_fence_gets_its_own_line():
+    assert format_response("```py\nx = 1```\nafter") == "```py\nx = 1\n```\nafter"
+
+
+def test_blank_lines_inside_display_math_are_dropped():
+    assert format_response("\\[\na\n\nb\n\\]") == "$$\na\nb\n$$"
+
+
+def test_open_code_block_is_closed():
+    assert format_response("```py\nx = 1\n\n") == "```py\nx = 1\n```"
+
+
+def test_preview_closes_open_math():
+    formatter = ResponseFormatter()
+    formatter.feed("Para.\n\n$$\nx")
+    assert formatter.preview() == "Para.\n\n$$\nx\n$$"
+    assert formatter.finish() == "Para.\n\n$$\nx"
+
+
+def test_paragraphs_are_committed_while_streaming():
+    formatter = ResponseFormatter()
+    formatter.feed("First.\n\nSecond.\n\nThird")
+    assert formatter._done_text == "First.\n\nSecond."
@@ -0,0 +1,39 @@
+import pytest
+
+from document_store import DocumentStore
+from retrieval import BM25Index, Chunk, format_retrieved_chunks
+
+PAGES = {
+    "physics.pdf": [(1, "Torque equals force times lever arm."), (2, "Angular momentum is conserved — always.")],
+    "chemistry.pdf": [(3, "Enthalpy of combustion is negative for exothermic reactions.")],
+}
+
+
+def saved_store(directory):
+    path = str(directory / "pages.cjdocs")
+    store = DocumentStore()
+    for source, pages in PAGES.items():
+        store.add_pages(source, pages)
+    store.save(path)
+    return DocumentStore.open_mmap(path)
+
+
+def test_bm25_index_saves_and_loads_as_csr(tmp_path):
+    mapped = saved_store(tmp_path)
+    try:
+        built = BM25Index.from_store(mapped)
+        built.save(str(tmp_path))
+        loaded = BM25Index.load(str(tmp_path), mapped)
+        for query in ("angular momentum", "exothermic combustion enthalpy", "torque force", "nothing here"):
+            expected = [(chunk.label, pytest.approx(score, rel=1e-5)) for chunk, score in built.search(query)]
+            assert [(chunk.label, score) for chunk, score in loaded.search(query)] == expected
+        assert loaded.search("angular momentum")[0][0].text == "Angular momentum is conserved — always."
+    finally:
+        mapped.close()
+
+
+def test_retrieved_chunks_follow_upload_order_then_page():
+    results = [(Chunk("b.pdf", 3, "b3"), 3.0), (Chunk("a.pdf", 2, "a2"), 2.0),
+               (Chunk("b.pdf", 1, "b1"), 1.5), (Chunk("z.pdf", 1, "z1"), 1.0)]
+    rendered = format_retrieved_chunks(results, 100, source_order=["b.pdf", "a.pdf"])
+    assert [block.split("\n")[1] for block in rendered.split("\n\n")] == ["b1", "b3", "a2", "z1"]
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from semantic_cache import SemanticCache
+
+SCOPE = "materials"
+
+
+def cache_with(question, answer="cached", **kwargs):
+    cache = SemanticCache(**kwargs)
+    cache.put(question, SCOPE, answer)
+    return cache
+
+
+def test_paraphrase_with_same_content_words_hits():
+    cache = cache_with("Explain limits of functions in calculus")
+    assert cache.get("What are limits of functions in calculus, step by step?", SCOPE) == "cached"
+    assert cache.get("explain the limit of functions in calculus", SCOPE) == "cached"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Why does a ball thrown vertically with initial velocity accelerate upward near the surface of the earth?",
+     "Why does a ball thrown vertically with initial velocity accelerate downward near the surface of the earth?"),
+    ("In the Haber process for ammonia synthesis, is the forward reaction exothermic or endothermic?",
+     "In the Haber process for ammonia synthesis, is the forward reaction exothermic?"),
+])
+def test_one_word_difference_misses(cached, asked):
+    assert cache_with(cached).get(asked, SCOPE) is None
+
+
+def test_different_numbers_miss():
+    cache = cache_with("Force on a 2 kg block at 3 m/s^2")
+    assert cache.get("Force on a 5 kg block at 3 m/s^2", SCOPE) is None
+
+
+def test_other_materials_and_follow_ups_miss():
+    cache = cache_with("Define entropy")
+    assert cache.get("Define entropy", "other materials") is None
+    assert cache.get("Define entropy again", SCOPE) is None
+
+
+def test_expired_entries_miss():
+    cache = cache_with("Define entropy", ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert cache.get("Define entropy", SCOPE) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_entries=2)
+    for topic in ("entropy", "enthalpy", "momentum"):
+        cache.put(f"Define {topic}", SCOPE, topic)
+    assert cache.get("Define entropy", SCOPE) is None
+    assert cache.get("Define momentum", SCOPE) == "momentum"
+    assert cache.stats["entries"] == 2
@@ -0,0 +1,70 @@
+import pytest
+
+from session_store import SessionStore, SqliteSessionStore, _open_session_store, pack_text, unpack_text
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return SessionStore()
+    return SqliteSessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_pack_round_trips_short_and_long_text():
+    for text in ("hi", "long answer " * 100):
+        assert unpack_text(pack_text(text)) == text
+    assert len(pack_text("long answer " * 100)) < len("long answer " * 100)
+
+
+def test_recent_window_and_paging(store):
+    ids = [store.append_message("u", "user", f"m{index}") for index in range(5)]
+    window = store.recent_messages("u", limit=2)
+    assert [message["content"] for message in window] == ["m3", "m4"]
+    assert store.has_messages_before("u", window[0]["id"])
+    older = store.recent_messages("u", limit=10, before_id=window[0]["id"])
+    assert [message["content"] for message in older] == ["m0", "m1", "m2"]
+    assert not store.has_messages_before("u", ids[0])
+
+
+def test_users_do_not_see_each_other(store):
+    store.append_message("a", "user", "from a")
+    store.append_message("b", "user", "from b")
+    assert [message["content"] for message in store.recent_messages("a")] == ["from a"]
+
+
+def test_clear_hides_earlier_messages_but_keeps_materials(store):
+    store.append_message("u", "user", "old")
+    store.save_state("u", [("notes.pdf", "abc")], "summary")
+    store.clear_messages("u")
+    store.append_message("u", "user", "new")
+    assert [message["content"] for message in store.recent_messages("u")] == ["new"]
+    state = store.load_state("u")
+    assert state.materials == [("notes.pdf", "abc")]
+    assert state.summary == ""
+
+
+def test_memory_store_forgets_least_recently_seen_user():
+    store = SessionStore(max_users=2)
+    store.append_message("a", "user", "from a")
+    store.save_state("b", [], "b summary")
+    store.recent_messages("a")
+    store.append_message("c", "user", "from c")
+    assert store.load_state("b").summary == ""
+    assert [message["content"] for message in store.recent_messages("a")] == ["from a"]
+    assert [message["content"] for message in store.recent_messages("c")] == ["from c"]
+    assert "b" not in store._states
+
+
+def test_reading_an_unknown_user_stores_nothing():
+    store = SessionStore(max_users=1)
+    store.append_message("a", "user", "from a")
+    store.recent_messages("stranger")
+    assert [message["content"] for message in store.recent_messages("a")] == ["from a"]
+
+
+def test_store_is_sqlite_unless_memory_is_asked_for(tmp_path):
+    assert isinstance(_open_session_store(str(tmp_path / "sessions.db")), SqliteSessionStore)
+    for path in ("memory", ""):
+        assert type(_open_session_store(path)) is SessionStore
+    # An unopenable path degrades to memory instead of failing every request
+    assert type(_open_session_store(str(tmp_path / "missing" / "sessions.db"))) is SessionStore
@@ -0,0 +1,20 @@
+import logging
+
+from startup_profiler import StartupProfiler
+
+
+def test_repeated_phases_are_recorded_and_logged_once(caplog):
+    profiler = StartupProfiler()
+    for _ in range(3):
+        with profiler.phase("main"):
+            pass
+    profiler.log_report_once()
+    with caplog.at_level(logging.INFO, logger="startup_profiler"):
+        for _ in range(3):
+            with profiler.phase("main"):
+                pass
+            with profiler.phase("load model"):
+                pass
+    assert [name for name, _ in profiler.phases] == ["main", "load model"]
+    assert sum("load model" in record.getMessage() for record in caplog.records) == 1
+    assert not any("main" in record.getMessage() for record in caplog.records)